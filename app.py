@@ -2,21 +2,192 @@
 Flask Web服务器
 提供REST API和Web界面
 """
-from flask import Flask, jsonify, request, render_template
+import atexit
+import json
+import os
+import time
+import uuid
+from typing import Callable, Dict, Hashable, Optional
+from flask import Flask, Response, g, jsonify, make_response, request, render_template
 from flask_cors import CORS
-from mvcc_system import MVCCSystem
+from werkzeug.local import LocalProxy
+import metrics
+from response_cache import ResponseCache
+from workspace import WorkspacePool
 
 app = Flask(__name__)
 CORS(app)
 
-# 创建MVCC系统实例
-mvcc_system = MVCCSystem()
+WORKSPACE_COOKIE = 'mvcc_workspace'
+DEFAULT_WORKSPACE = 'default'
+MAX_PAGE_LIMIT = 1000  # 分页接口每页最多返回的条数
+# ASGI模式在WSGI environ中设置此键：请求在单写者线程中执行，不能阻塞等待行锁
+NONBLOCKING_LOCKS_ENVIRON_KEY = 'mvcc.nonblocking_locks'
+
+# 工作区池：每个学习者拥有独立的MVCC系统，空闲或超出上限的工作区休眠到实例目录下
+# 设置MVCC_DATA_DIR环境变量时，每个工作区以该目录下的子目录持久化（Redo日志与检查点），服务重启后恢复
+workspace_pool = WorkspacePool(hibernate_dir=os.path.join(app.instance_path, 'workspaces'),
+                               data_dir=os.environ.get('MVCC_DATA_DIR') or None)
+atexit.register(workspace_pool.close)
+
+# 当前请求所属工作区的MVCC系统
+mvcc_system = LocalProxy(lambda: g.workspace.system)
+
+REQUEST_DURATION = metrics.histogram(
+    'mvcc_http_request_duration_seconds', 'HTTP request latency by endpoint',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    labelnames=('endpoint', 'method'))
+metrics.REGISTRY.add_collector(workspace_pool.collect_metrics)
+
+# 按版本缓存的JSON响应体（版本包含变更日志实例标识，不同工作区的条目互不冲突）
+response_cache = ResponseCache()
+metrics.REGISTRY.add_collector(response_cache.collect_metrics)
+
+VERSIONED_RESPONSES = metrics.counter(
+    'mvcc_http_versioned_responses_total', 'Responses of ETag endpoints by how they were served',
+    labelnames=('result',))
+_NOT_MODIFIED = VERSIONED_RESPONSES.labels('not_modified')
+_CACHE_HIT = VERSIONED_RESPONSES.labels('cache_hit')
+_RENDERED = VERSIONED_RESPONSES.labels('rendered')
+
+
+def get_workspace_id() -> str:
+    """
+    确定当前请求的工作区
+    依次使用X-Workspace-Id请求头、workspace查询参数、浏览器Cookie，都没有时使用默认工作区
+    """
+    return (request.headers.get('X-Workspace-Id')
+            or request.args.get('workspace')
+            or request.cookies.get(WORKSPACE_COOKIE)
+            or DEFAULT_WORKSPACE)
+
+
+def lock_waits_block() -> bool:
+    """当前请求能否在线程中阻塞等待行锁（ASGI模式下不能，改为进入等待队列后由调用方重试）"""
+    return not request.environ.get(NONBLOCKING_LOCKS_ENVIRON_KEY)
+
+
+def get_event_since() -> Optional[int]:
+    """事件流的续传起点：浏览器自动重连时携带的Last-Event-ID优先于首次连接时的since参数"""
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    return since
+
+
+def versioned_json(version: Optional[str], key: Hashable, build: Callable[[], Optional[Dict]]):
+    """
+    带ETag的JSON响应
+    version为计算响应之前读取的状态版本：与If-None-Match相同时直接返回304，不计算响应；
+    否则按 (key, version) 查找缓存的响应体，未命中时调用build计算、序列化并缓存
+    响应体可能比version新（计算期间状态发生了变化），此时客户端下一次请求版本不匹配，只会多取一次
+    version为None（实体不存在）或build返回None时不缓存；build返回None时返回None，由调用方返回404
+    """
+    if version is not None and request.if_none_match.contains_weak(version):
+        _NOT_MODIFIED.inc()
+        response = app.response_class(status=304)
+    else:
+        body = response_cache.get((key, version)) if version is not None else None
+        if body is not None:
+            _CACHE_HIT.inc()
+        else:
+            result = build()
+            if result is None:
+                return None
+            body = jsonify(result).get_data()
+            if version is not None:
+                response_cache.put((key, version), body)
+            _RENDERED.inc()
+        response = app.response_class(body, mimetype='application/json')
+    if version is not None:
+        response.set_etag(version)
+        response.cache_control.no_cache = True  # 浏览器每次都带If-None-Match重新验证
+    return response
+
+
+def get_page_limit(default: int, minimum: int = 0) -> int:
+    """分页接口的每页条数：limit查询参数，限制在minimum到MAX_PAGE_LIMIT之间"""
+    return min(max(request.args.get('limit', default, type=int), minimum), MAX_PAGE_LIMIT)
+
+
+def stream_page(result: Dict, key: str, id_field: str, limit: int) -> Response:
+    """
+    流式输出一页列表结果，每条记录产出后立即序列化，不构造整页的响应
+    result[key]为逐条产出记录的生成器，其余字段先输出；最多取limit + 1条，多出的一条只用于判断是否还有下一页，
+    有下一页时next_cursor为本页最后一条记录的id_field，作为下一页请求的after参数，否则为null
+    """
+    items = result.pop(key)
+
+    def generate():
+        # 客户端提前断开（响应被close）或序列化出错时也要关闭记录生成器，释放其持有的闩锁与登记的ReadView
+        try:
+            head = json.dumps(result, ensure_ascii=False)
+            yield head[:-1] + f', "{key}": ['
+            count, cursor = 0, None
+            for item in items:
+                if count == limit:
+                    cursor = last_id
+                    break
+                yield (',' if count else '') + json.dumps(item, ensure_ascii=False)
+                last_id = item[id_field]
+                count += 1
+        finally:
+            items.close()
+        yield '], "next_cursor": ' + json.dumps(cursor) + '}'
+
+    return Response(generate(), mimetype='application/json')
+
+
+@app.before_request
+def start_timer():
+    """记录请求开始时间（先于取得工作区，等待与恢复工作区的耗时也计入请求延迟）"""
+    g.request_start = time.perf_counter()
+
+
+@app.before_request
+def acquire_workspace():
+    """API请求开始时取得工作区，请求期间不会被淘汰"""
+    if not request.path.startswith('/api/') or request.path == '/api/workspaces':
+        return None
+    workspace_id = get_workspace_id()
+    if not workspace_pool.is_valid_id(workspace_id):
+        return jsonify({'success': False, 'error': f'Invalid workspace id: {workspace_id}'}), 400
+    g.workspace = workspace_pool.acquire(workspace_id)
+    return None
+
+
+@app.teardown_request
+def release_workspace(exc):
+    """请求结束时归还工作区（流式响应持有的是具体的系统对象，归还后仍可继续读取）"""
+    workspace = g.pop('workspace', None)
+    if workspace is not None:
+        workspace_pool.release(workspace)
+    started = g.pop('request_start', None)
+    if started is not None:
+        # 标签只取路由端点名（而非URL），取值个数固定
+        REQUEST_DURATION.labels(request.endpoint or '<unmatched>', request.method).observe(
+            time.perf_counter() - started)
 
 
 @app.route('/')
 def index():
-    """主页"""
-    return render_template('index.html')
+    """主页，首次访问时为浏览器分配独立的工作区"""
+    response = make_response(render_template('index.html'))
+    if not request.cookies.get(WORKSPACE_COOKIE):
+        response.set_cookie(WORKSPACE_COOKIE, uuid.uuid4().hex, httponly=True, samesite='Lax')
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus格式的监控指标"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/api/workspaces', methods=['GET'])
+def get_workspaces():
+    """获取工作区池状态"""
+    return jsonify(workspace_pool.get_status())
 
 
 @app.route('/api/transaction/begin', methods=['POST'])
@@ -48,8 +219,22 @@ def rollback_transaction():
 
 @app.route('/api/transaction/<int:trx_id>', methods=['GET'])
 def get_transaction(trx_id):
-    """获取事务信息"""
-    result = mvcc_system.get_transaction_info(trx_id)
+    """获取事务信息（支持If-None-Match条件请求）"""
+    response = versioned_json(mvcc_system.get_entity_version('transaction', trx_id), ('transaction', trx_id),
+                              lambda: mvcc_system.get_transaction_info(trx_id))
+    if response is not None:
+        return response
+    return jsonify({'error': 'Transaction not found'}), 404
+
+
+@app.route('/api/transaction/<int:trx_id>/operations', methods=['GET'])
+def get_transaction_operations(trx_id):
+    """
+    分页获取事务的操作历史
+    offset为起始序号（默认从保留的最早记录开始），limit为每页条数（默认50，最多1000）
+    """
+    offset = request.args.get('offset', type=int)
+    result = mvcc_system.get_transaction_operations(trx_id, offset, get_page_limit(50))
     if result:
         return jsonify(result)
     return jsonify({'error': 'Transaction not found'}), 404
@@ -72,7 +257,7 @@ def update_data():
     trx_id = data.get('trx_id')
     row_id = data.get('row_id')
     row_data = data.get('data', {})
-    result = mvcc_system.update_data(trx_id, row_id, row_data)
+    result = mvcc_system.update_data(trx_id, row_id, row_data, data.get('lock_wait_timeout'), lock_waits_block())
     return jsonify(result)
 
 
@@ -82,7 +267,7 @@ def delete_data():
     data = request.get_json()
     trx_id = data.get('trx_id')
     row_id = data.get('row_id')
-    result = mvcc_system.delete_data(trx_id, row_id)
+    result = mvcc_system.delete_data(trx_id, row_id, data.get('lock_wait_timeout'), lock_waits_block())
     return jsonify(result)
 
 
@@ -106,59 +291,205 @@ def read_data_with_path():
     return jsonify(result)
 
 
+@app.route('/api/data/scan', methods=['POST'])
+def scan_data():
+    """
+    快照范围扫描
+    使用同一个ReadView按row_id顺序返回所有可见的行，结果以流式JSON输出
+    """
+    data = request.get_json()
+    trx_id = data.get('trx_id')
+    result = mvcc_system.scan(trx_id, data.get('start_row_id'), data.get('end_row_id'), data.get('limit'))
+    if not result['success']:
+        return jsonify(result)
+
+    def generate():
+        yield '{"success": true, "read_view": ' + json.dumps(result['read_view']) + ', "rows": ['
+        for index, row in enumerate(result['rows']):
+            yield (',' if index else '') + json.dumps(row, ensure_ascii=False)
+        yield ']}'
+
+    return Response(generate(), mimetype='application/json')
+
+
+@app.route('/api/index', methods=['GET'])
+def get_indexes():
+    """获取所有二级索引"""
+    return jsonify(mvcc_system.get_indexes())
+
+
+@app.route('/api/index/create', methods=['POST'])
+def create_index():
+    """在列上创建二级索引"""
+    data = request.get_json()
+    result = mvcc_system.create_index(data.get('column'))
+    return jsonify(result)
+
+
+@app.route('/api/index/lookup', methods=['POST'])
+def index_lookup():
+    """
+    通过二级索引查询可见行
+    传value为等值查询，传low / high为范围查询
+    """
+    data = request.get_json()
+    if 'value' in data:
+        low = high = data['value']
+    else:
+        low, high = data.get('low'), data.get('high')
+    result = mvcc_system.index_lookup(data.get('trx_id'), data.get('column'), low, high, data.get('limit'))
+    return jsonify(result)
+
+
+@app.route('/api/batch', methods=['POST'])
+def execute_batch():
+    """批量执行MVCC操作"""
+    data = request.get_json()
+    operations = data.get('operations', [])
+    stop_on_error = data.get('stop_on_error', True)
+    result = mvcc_system.execute_batch(operations, stop_on_error, lock_waits_block())
+    return jsonify(result)
+
+
 @app.route('/api/row/<int:row_id>', methods=['GET'])
 def get_row(row_id):
-    """获取数据行信息"""
-    result = mvcc_system.get_row_info(row_id)
-    if result:
-        return jsonify(result)
+    """获取数据行信息（支持If-None-Match条件请求）"""
+    response = versioned_json(mvcc_system.get_entity_version('row', row_id), ('row', row_id),
+                              lambda: mvcc_system.get_row_info(row_id))
+    if response is not None:
+        return response
     return jsonify({'error': 'Row not found'}), 404
 
 
-@app.route('/api/system/state', methods=['GET'])
-def get_system_state():
-    """获取系统状态"""
-    result = mvcc_system.get_system_state()
+@app.route('/api/rows', methods=['GET'])
+def list_rows():
+    """
+    分页列出数据行（按row_id顺序，流式输出）
+    after为游标（上一页的next_cursor），start_row_id / end_row_id为row_id范围，
+    changed_since只列出该序列号之后变更过的行，version_chains=1时附带每行的版本链，limit默认100
+    """
+    result = mvcc_system.list_rows(request.args.get('after', type=int),
+                                   request.args.get('start_row_id', type=int),
+                                   request.args.get('end_row_id', type=int),
+                                   request.args.get('changed_since', type=int),
+                                   request.args.get('version_chains', '').lower() in ('1', 'true'))
+    return stream_page(result, 'rows', 'row_id', get_page_limit(100, 1))
 
-    # 修正DB_ROLL_PTR的显示值
-    # 内部实现：row.roll_pointer指向当前版本的Undo日志
-    # 展示逻辑：DB_ROLL_PTR应该显示上一个版本的Undo日志
-    for row in result['rows']:
-        row['display_roll_pointer'] = _get_display_roll_pointer(row['row_id'], row['roll_pointer'])
 
-    return jsonify(result)
+@app.route('/api/transactions', methods=['GET'])
+def list_transactions():
+    """
+    分页列出事务（按trx_id顺序，流式输出）
+    after为游标，status为逗号分隔的状态（active、committed、aborted），limit默认100
+    """
+    status = request.args.get('status')
+    result = mvcc_system.list_transactions(request.args.get('after', type=int),
+                                           status.split(',') if status else None)
+    if not result['success']:
+        return jsonify(result)
+    return stream_page(result, 'transactions', 'trx_id', get_page_limit(100, 1))
 
 
-def _get_display_roll_pointer(row_id, internal_roll_pointer):
+@app.route('/api/undo_logs', methods=['GET'])
+def list_undo_logs():
+    """
+    分页列出Undo日志（按undo_id顺序，流式输出）
+    after为游标，trx_id / row_id只列出该事务产生的、该行Undo链上的Undo日志，limit默认100
     """
-    获取用于展示的DB_ROLL_PTR值
+    result = mvcc_system.list_undo_logs(request.args.get('after', type=int),
+                                        request.args.get('trx_id', type=int),
+                                        request.args.get('row_id', type=int))
+    return stream_page(result, 'undo_logs', 'undo_id', get_page_limit(100, 1))
+
 
-    InnoDB语义：DB_ROLL_PTR指向上一个版本
-    - INSERT后：显示NULL（没有上一个版本）
-    - UPDATE后：显示上一个版本的Undo日志ID
+@app.route('/api/system/state', methods=['GET'])
+def get_system_state():
     """
-    if internal_roll_pointer is None:
-        return None
+    获取系统状态
+    带since参数时只返回该序列号之后的增量变更
+    返回全局状态版本作为ETag，状态未变化时If-None-Match请求直接返回304
+    增量响应的ETag附带since：换了since的请求内容不同，不能用另一个since取得的ETag得到304
+    """
+    since = request.args.get('since', type=int)
+    version = mvcc_system.get_state_version()
+    if since is not None:
+        version = f'{version}-since{since}'
 
-    # 获取当前roll_pointer指向的Undo日志
-    undo_log = mvcc_system.undo_log_manager.get_undo_log(internal_roll_pointer)
-    if not undo_log:
-        return None
+    def build():
+        if since is None:
+            result = mvcc_system.get_system_state()
+        else:
+            result = mvcc_system.get_state_delta(since)
 
-    # 如果是INSERT类型，显示NULL（因为INSERT没有上一个版本）
-    if undo_log.log_type.value == 'INSERT':
-        return None
+        # 修正DB_ROLL_PTR的显示值
+        # 内部实现：row.roll_pointer指向当前版本的Undo日志
+        # 展示逻辑：DB_ROLL_PTR应该显示上一个版本的Undo日志
+        mvcc_system.add_display_roll_pointers(result)
+        return result
 
-    # 如果是UPDATE/DELETE类型，显示Undo日志的roll_pointer（指向上一个版本）
-    return undo_log.roll_pointer
+    return versioned_json(version, ('state', since), build)
+
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """
+    MVCC事件流（Server-Sent Events）
+    通过since参数或Last-Event-ID请求头从指定序列号之后续传
+    """
+    since = get_event_since()
+    event_bus = mvcc_system.event_bus
+    subscriber = event_bus.subscribe(since, mvcc_system.journal.seq)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                message = subscriber.get(timeout=15)
+                # 超时发送注释行作为心跳，及时发现已断开的连接
+                yield message if message is not None else ': keepalive\n\n'
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/api/system/purge', methods=['POST'])
+def purge_system():
+    """执行一轮purge"""
+    data = request.get_json(silent=True) or {}
+    batch_size = data.get('batch_size')
+    result = mvcc_system.purge(batch_size)
+    return jsonify(result)
+
+
+@app.route('/api/system/locks', methods=['GET'])
+def get_lock_status():
+    """获取行锁、锁等待与死锁统计"""
+    return jsonify(mvcc_system.get_lock_status())
 
 
 @app.route('/api/system/reset', methods=['POST'])
 def reset_system():
-    """重置系统"""
+    """重置当前工作区的系统，不影响其他工作区"""
     mvcc_system.reset()
     return jsonify({'success': True})
 
 
+@app.route('/api/system/snapshot', methods=['GET'])
+def export_snapshot():
+    """导出当前工作区的二进制快照，可保存后导入到其他工作区"""
+    headers = {'Content-Disposition': f'attachment; filename=mvcc-{g.workspace.workspace_id}.snap'}
+    return Response(mvcc_system.export_snapshot(), mimetype='application/octet-stream', headers=headers)
+
+
+@app.route('/api/system/snapshot', methods=['POST'])
+def import_snapshot():
+    """导入快照（请求体为导出的二进制内容），替换当前工作区的全部状态"""
+    result = mvcc_system.load_snapshot(request.get_data())
+    return jsonify(result)
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    # MVCCSystem内部有闩锁保护，可以在多线程模式下处理并发请求
+    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
@@ -0,0 +1,328 @@
+"""
+ASGI服务模块
+以asyncio方式提供与app.py相同的REST接口与流式接口：uvicorn asgi:app --port 5001
+
+- 事件循环只负责连接与收发；所有引擎调用（app.py中的Flask视图）通过单写者命令队列在一个专用线程中
+  按到达顺序执行，事件循环不会被引擎调用阻塞，引擎内部的闩锁也不再有竞争
+- 事件流（/api/events）在事件循环中原生实现：发布事件时唤醒对应的协程，
+  空闲的看板连接只占用一个协程，不占用线程
+- 其他流式响应（快照范围扫描）由写者线程按批取出，事件循环逐批发送
+- 写者线程中不能阻塞等待行锁（锁持有者的提交排在同一个队列后面）：更新 / 删除以不阻塞的方式加锁，
+  冲突时照常进入行锁的等待队列（参与死锁检测），请求在事件循环中等到有事务提交或回滚后重试，
+  由行锁管理器返回授予、死锁或超时的结果，重试不计为新的锁等待；
+  批量操作无法在中途让出写者线程，其中的lock_wait_timeout不生效，冲突时一律不等待
+"""
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Flask
+
+import metrics
+from app import NONBLOCKING_LOCKS_ENVIRON_KEY, app as flask_app, get_event_since, get_workspace_id, workspace_pool
+
+STREAM_BATCH_BYTES = 64 * 1024  # 流式响应每批从写者线程取出的字节数
+SSE_HEARTBEAT = 15  # 事件流心跳间隔（秒）
+LOCK_RETRY_INTERVAL = 0.05  # 等待行锁时即使没有收到提交 / 回滚通知也重试的间隔（秒）
+
+LOCK_WAIT_PATHS = {'/api/data/update', '/api/data/delete'}
+# 可能释放行锁的请求，完成后唤醒等待行锁的请求（更新 / 删除被选为死锁牺牲者时会回滚事务）
+LOCK_RELEASING_PATHS = {'/api/transaction/commit', '/api/transaction/rollback', '/api/batch',
+                        '/api/system/reset', '/api/system/snapshot'} | LOCK_WAIT_PATHS
+
+WRITER_QUEUE_WAIT = metrics.histogram(
+    'mvcc_writer_queue_seconds', 'Time engine commands wait in the single-writer queue',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+
+
+class CommandQueue:
+    """单写者命令队列：命令按提交顺序在同一个线程中执行，调用方在事件循环中等待结果"""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mvcc-writer')
+
+    async def call(self, fn: Callable, *args) -> Any:
+        submitted = time.perf_counter()
+
+        def run():
+            WRITER_QUEUE_WAIT.observe(time.perf_counter() - submitted)
+            return fn(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, run)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class WSGIResponse:
+    """
+    在写者线程中调用Flask应用得到的响应
+    响应体按批读取：普通响应在调用时的第一批就读完，流式响应由事件循环发送一批后再读取下一批
+    """
+
+    __slots__ = ('status', 'headers', 'iterable', 'iterator', 'closed')
+
+    def __init__(self, wsgi_app: Flask, environ: Dict[str, Any]):
+        self.status = 500
+        self.headers: List[Tuple[str, str]] = []
+        self.iterable = wsgi_app(environ, self._start_response)
+        self.iterator = iter(self.iterable)
+        self.closed = False
+
+    def _start_response(self, status: str, headers: List[Tuple[str, str]], exc_info=None):
+        self.status = int(status.split(' ', 1)[0])
+        self.headers = headers
+
+    def read_batch(self) -> bytes:
+        """读取下一批响应体，读完后关闭响应"""
+        chunks, size = [], 0
+        for chunk in self.iterator:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_BATCH_BYTES:
+                return b''.join(chunks)
+        self.close()
+        return b''.join(chunks)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if hasattr(self.iterable, 'close'):
+                self.iterable.close()
+
+
+def _call_wsgi(wsgi_app: Flask, environ: Dict[str, Any]) -> Tuple[WSGIResponse, bytes]:
+    """写者线程中执行：调用Flask应用并读取第一批响应体"""
+    response = WSGIResponse(wsgi_app, environ)
+    try:
+        return response, response.read_batch()
+    except BaseException:
+        response.close()
+        raise
+
+
+def build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """由ASGI的HTTP请求构造WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0] if client else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        NONBLOCKING_LOCKS_ENVIRON_KEY: True,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-length':
+            continue
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _encode_headers(headers: List[Tuple[str, str]]) -> List[Tuple[bytes, bytes]]:
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+def _subscribe_events(environ: Dict[str, Any]):
+    """
+    写者线程中执行：按请求确定工作区并订阅其事件总线，返回 (事件总线, 订阅者)，工作区ID无效时返回None
+    与app.py的事件流一样，订阅后立即归还工作区；有订阅者的工作区不会被淘汰
+    """
+    with flask_app.request_context(environ):
+        workspace_id = get_workspace_id()
+        since = get_event_since()
+    if not workspace_pool.is_valid_id(workspace_id):
+        return None
+    workspace = workspace_pool.acquire(workspace_id)
+    try:
+        system = workspace.system
+        return system.event_bus, system.event_bus.subscribe(since, system.journal.seq)
+    finally:
+        workspace_pool.release(workspace)
+
+
+class MVCCAsgiApp:
+    """ASGI应用：HTTP请求经单写者命令队列交给Flask应用处理，事件流在事件循环中原生处理"""
+
+    def __init__(self, wsgi_app: Flask):
+        self.wsgi_app = wsgi_app
+        self.commands = CommandQueue()
+        self.lock_released: Optional[asyncio.Event] = None  # 有请求可能释放了行锁时置位，随后换成新的Event
+        self.event_streams = 0  # 当前打开的事件流连接数
+        metrics.REGISTRY.add_collector(self.collect_metrics)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.commands.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        path, method = scope['path'], scope['method']
+        if path == '/api/events' and method == 'GET':
+            await self._stream_events(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        if method == 'POST' and path in LOCK_WAIT_PATHS:
+            response, chunk = await self._call_with_lock_retry(scope, body)
+        else:
+            response, chunk = await self.commands.call(_call_wsgi, self.wsgi_app, build_environ(scope, body))
+        if method == 'POST' and path in LOCK_RELEASING_PATHS:
+            self._notify_lock_released()
+        await self._send_response(send, response, chunk)
+
+    @staticmethod
+    async def _read_body(receive: Callable) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    async def _send_response(self, send: Callable, response: WSGIResponse, chunk: bytes):
+        try:
+            await send({'type': 'http.response.start', 'status': response.status,
+                        'headers': _encode_headers(response.headers)})
+            while True:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': not response.closed})
+                if response.closed:
+                    return
+                chunk = await self.commands.call(response.read_batch)
+        finally:
+            if not response.closed:
+                await self.commands.call(response.close)
+
+    # ---- 行锁等待 ----
+
+    def _notify_lock_released(self):
+        if self.lock_released is not None:
+            self.lock_released.set()
+            self.lock_released = None
+
+    async def _call_with_lock_retry(self, scope: Dict[str, Any], body: bytes) -> Tuple[WSGIResponse, bytes]:
+        """
+        更新 / 删除：行锁冲突时请求留在行锁的等待队列中，响应带有lock_waiting；
+        等待下一次可能释放行锁的请求完成（最多等待LOCK_RETRY_INTERVAL秒）后以相同的请求重试，
+        直到行锁管理器返回授予、死锁或超过lock_wait_timeout的超时结果
+        """
+        while True:
+            if self.lock_released is None:
+                self.lock_released = asyncio.Event()
+            released = self.lock_released  # 在执行之前取得，执行期间的提交也会触发重试
+            response, chunk = await self.commands.call(_call_wsgi, self.wsgi_app, build_environ(scope, body))
+            if not self._is_lock_waiting(response, chunk):
+                return response, chunk
+            try:
+                await asyncio.wait_for(released.wait(), LOCK_RETRY_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _is_lock_waiting(response: WSGIResponse, chunk: bytes) -> bool:
+        """仍在等待行锁的响应带有lock_waiting"""
+        if response.status != 200 or not response.closed:
+            return False
+        try:
+            result = json.loads(chunk)
+        except ValueError:
+            return False
+        return isinstance(result, dict) and result.get('lock_waiting') is True
+
+    # ---- 事件流 ----
+
+    async def _stream_events(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        """
+        MVCC事件流（Server-Sent Events），协议与app.py的/api/events相同
+        订阅者收到事件时通过call_soon_threadsafe唤醒本协程，空闲时每SSE_HEARTBEAT秒发送一次心跳
+        """
+        subscription = await self.commands.call(_subscribe_events, build_environ(scope, b''))
+        if subscription is None:
+            body = json.dumps({'success': False, 'error': 'Invalid workspace id'}).encode('utf-8')
+            await send({'type': 'http.response.start', 'status': 400,
+                        'headers': [(b'content-type', b'application/json')]})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        event_bus, subscriber = subscription
+
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        subscriber.notify = lambda: loop.call_soon_threadsafe(wakeup.set)
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        headers = [(b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+                   (b'x-accel-buffering', b'no'), (b'access-control-allow-origin', b'*')]
+        self.event_streams += 1
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while not disconnected.done():
+                wakeup.clear()
+                messages = []
+                message = subscriber.get(0)
+                while message is not None:
+                    messages.append(message)
+                    message = subscriber.get(0)
+                if not messages:
+                    waiter = asyncio.ensure_future(wakeup.wait())
+                    done, _ = await asyncio.wait({waiter, disconnected}, timeout=SSE_HEARTBEAT,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    waiter.cancel()
+                    if done:
+                        continue
+                    messages.append(': keepalive\n\n')
+                await send({'type': 'http.response.body', 'body': ''.join(messages).encode('utf-8'),
+                            'more_body': True})
+        except OSError:
+            pass  # 客户端已断开
+        finally:
+            self.event_streams -= 1
+            subscriber.notify = None
+            event_bus.unsubscribe(subscriber)
+            disconnected.cancel()
+
+    @staticmethod
+    async def _wait_disconnect(receive: Callable):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    def collect_metrics(self):
+        yield ('mvcc_event_streams', 'Open event stream connections (ASGI mode)', (), [((), self.event_streams)])
+
+
+app = MVCCAsgiApp(flask_app)
@@ -0,0 +1,4 @@
+"""
+InnoDB MVCC 可视化系统基准测试
+在仓库根目录通过 python -m benchmarks.<模块名> 运行
+"""
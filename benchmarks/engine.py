@@ -0,0 +1,317 @@
+"""
+引擎吞吐与延迟基准
+直接驱动MVCCSystem测量各条热路径，结果以JSON输出，便于跟踪data_row.py、transaction.py等模块的性能回归：
+- 插入 / 更新 / 读取吞吐
+- 读取延迟与Undo链长度的关系（ReadView早于所有更新，读取需沿Undo链回溯到最老版本）
+- 创建ReadView的开销与活跃事务数的关系
+- 回滚开销与事务修改行数的关系
+- get_system_state序列化开销与状态规模的关系
+- 多线程并发更新的总吞吐
+- scenarios/目录下各场景交错回放多份副本的吞吐（同时检查场景中的预期结果）
+- 可选：通过Flask测试客户端走HTTP接口的吞吐（--http）
+
+运行：python -m benchmarks.engine [--scale 0.1] [--http] [--only read_latency_vs_chain_length] [--output result.json]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, List, Optional
+
+from mvcc_system import MVCCSystem
+import scenario
+from scenario import latency_stats
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scenarios')
+
+CHAIN_LENGTHS = [0, 1, 10, 100, 1000]
+ACTIVE_TRX_COUNTS = [0, 10, 100, 1000]
+MODIFIED_ROW_COUNTS = [1, 10, 100, 1000]
+STATE_ROW_COUNTS = [100, 1000, 10000]
+PAGE_SIZE = 100  # 分页接口的默认每页行数
+THREAD_COUNTS = [1, 2, 4, 8]
+
+
+def _new_system() -> MVCCSystem:
+    # 基准中的写入互不冲突，不等待行锁
+    return MVCCSystem(lock_wait_timeout=0)
+
+
+def _row_data(rnd: random.Random, i: int) -> Dict:
+    return {'name': f'user{i}', 'balance': rnd.randint(0, 10000), 'city': rnd.choice(['Beijing', 'Shanghai'])}
+
+
+def _throughput(ops: int, seconds: float) -> Dict:
+    return {'ops': ops, 'seconds': round(seconds, 4), 'ops_per_sec': round(ops / seconds, 1) if seconds else None}
+
+
+def _timed(fn: Callable[[], None]) -> int:
+    start = time.perf_counter_ns()
+    fn()
+    return time.perf_counter_ns() - start
+
+
+def _populate(system: MVCCSystem, rows: int, rnd: random.Random, rows_per_trx: int = 100) -> List[int]:
+    """插入rows行并按每rows_per_trx行一个事务提交，返回row_id列表"""
+    row_ids = []
+    for start in range(0, rows, rows_per_trx):
+        trx_id = system.begin_transaction()['trx_id']
+        for i in range(start, min(rows, start + rows_per_trx)):
+            row_ids.append(system.insert_data(trx_id, _row_data(rnd, i))['row_id'])
+        system.commit_transaction(trx_id)
+    return row_ids
+
+
+def bench_insert_throughput(ops: int, rnd: random.Random) -> Dict:
+    """每个事务插入100行后提交"""
+    system = _new_system()
+    seconds = _timed(lambda: _populate(system, ops, rnd)) / 1e9
+    return _throughput(ops, seconds)
+
+
+def bench_update_throughput(ops: int, rnd: random.Random) -> Dict:
+    """在1000行上轮流更新一列，每个事务更新100行后提交"""
+    system = _new_system()
+    row_ids = _populate(system, 1000, rnd)
+
+    def run():
+        for start in range(0, ops, 100):
+            trx_id = system.begin_transaction()['trx_id']
+            for i in range(start, min(ops, start + 100)):
+                system.update_data(trx_id, row_ids[i % len(row_ids)], {'balance': i})
+            system.commit_transaction(trx_id)
+
+    return _throughput(ops, _timed(run) / 1e9)
+
+
+def bench_read_throughput(ops: int, rnd: random.Random) -> Dict:
+    """REPEATABLE READ事务在1000行上随机读取（每行有一个较新的已提交版本）"""
+    system = _new_system()
+    row_ids = _populate(system, 1000, rnd)
+    reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+    system.read_data(reader, row_ids[0])
+    writer = system.begin_transaction()['trx_id']
+    for row_id in row_ids:
+        system.update_data(writer, row_id, {'balance': -1})
+    system.commit_transaction(writer)
+    targets = [rnd.choice(row_ids) for _ in range(ops)]
+
+    def run():
+        for row_id in targets:
+            system.read_data(reader, row_id)
+
+    return _throughput(ops, _timed(run) / 1e9)
+
+
+def bench_read_latency_vs_chain_length(samples: int, rnd: random.Random) -> Dict:
+    """ReadView创建后再由其他事务提交chain_length次更新，读取需沿整条Undo链回溯"""
+    results = {}
+    for chain_length in CHAIN_LENGTHS:
+        system = _new_system()
+        row_id = _populate(system, 1, rnd)[0]
+        reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+        system.read_data(reader, row_id)
+        for i in range(chain_length):
+            writer = system.begin_transaction()['trx_id']
+            system.update_data(writer, row_id, {'balance': i})
+            system.commit_transaction(writer)
+        latencies = [_timed(lambda: system.read_data(reader, row_id)) for _ in range(samples)]
+        results[str(chain_length)] = latency_stats(latencies)
+    return results
+
+
+def bench_read_view_vs_active_trx(samples: int, rnd: random.Random) -> Dict:
+    """有N个活跃事务时创建ReadView（TransactionManager.create_read_view）的开销"""
+    results = {}
+    for active in ACTIVE_TRX_COUNTS:
+        system = _new_system()
+        for _ in range(active):
+            system.begin_transaction()
+        creator = system.begin_transaction()['trx_id']
+        create_read_view = system.transaction_manager.create_read_view
+        latencies = [_timed(lambda: create_read_view(creator)) for _ in range(samples)]
+        results[str(active)] = latency_stats(latencies)
+    return results
+
+
+def bench_rollback_vs_modified_rows(repeats: int, rnd: random.Random) -> Dict:
+    """事务更新N行后回滚的耗时"""
+    results = {}
+    for modified in MODIFIED_ROW_COUNTS:
+        system = _new_system()
+        row_ids = _populate(system, modified, rnd)
+        latencies = []
+        for _ in range(repeats):
+            trx_id = system.begin_transaction()['trx_id']
+            for row_id in row_ids:
+                system.update_data(trx_id, row_id, {'balance': -1})
+            latencies.append(_timed(lambda: system.rollback_transaction(trx_id)))
+        results[str(modified)] = latency_stats(latencies)
+    return results
+
+
+def bench_state_serialization_vs_size(repeats: int, rnd: random.Random) -> Dict:
+    """
+    get_system_state构建状态字典以及JSON编码的耗时（每行带一个UPDATE Undo日志），
+    以及分页接口取第一页（PAGE_SIZE行）并逐行编码的耗时
+    """
+    results = {}
+    for rows in STATE_ROW_COUNTS:
+        system = _new_system()
+        row_ids = _populate(system, rows, rnd)
+        trx_id = system.begin_transaction()['trx_id']
+        for row_id in row_ids:
+            system.update_data(trx_id, row_id, {'balance': 0})
+        system.commit_transaction(trx_id)
+        build, encode, page = [], [], []
+        size = 0
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            state = system.get_system_state()
+            middle = time.perf_counter_ns()
+            size = len(json.dumps(state))
+            encode.append(time.perf_counter_ns() - middle)
+            build.append(middle - start)
+            start = time.perf_counter_ns()
+            for row in islice(system.list_rows()['rows'], PAGE_SIZE):
+                json.dumps(row)
+            page.append(time.perf_counter_ns() - start)
+        results[str(rows)] = {'build': latency_stats(build), 'json': latency_stats(encode), 'json_bytes': size,
+                              'first_page': latency_stats(page)}
+    return results
+
+
+def bench_concurrent_updates(ops: int, rnd: random.Random) -> Dict:
+    """N个线程各自更新不相交的行（每个事务更新10行），总吞吐"""
+    results = {}
+    for threads in THREAD_COUNTS:
+        system = _new_system()
+        row_ids = _populate(system, threads * 100, rnd)
+        per_thread = max(10, ops // threads)
+
+        def worker(index: int):
+            own = row_ids[index * 100:(index + 1) * 100]
+            for start in range(0, per_thread, 10):
+                trx_id = system.begin_transaction()['trx_id']
+                for i in range(start, start + 10):
+                    system.update_data(trx_id, own[i % len(own)], {'balance': i})
+                system.commit_transaction(trx_id)
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        results[str(threads)] = _throughput(per_thread * threads, time.perf_counter() - start)
+    return results
+
+
+def bench_scenario_replay(copies: int, rnd: random.Random) -> Dict:
+    """以固定种子交错回放scenarios/下的每个场景，digest相同说明两次运行的行为一致"""
+    results = {}
+    seed = rnd.getrandbits(32)
+    for path in sorted(glob.glob(os.path.join(SCENARIO_DIR, '*.json'))):
+        result = scenario.replay(_new_system(), scenario.load_scenario(path), copies, seed)
+        results[result['scenario']] = {
+            key: result[key] for key in ('steps', 'failed', 'mismatch_count', 'seconds', 'ops_per_sec', 'digest')}
+    return results
+
+
+def bench_http(ops: int, rnd: random.Random) -> Dict:
+    """通过Flask测试客户端调用插入、更新、读取接口（包含请求解析、工作区获取与JSON编码的开销）"""
+    from app import app
+
+    client = app.test_client()
+    headers = {'X-Workspace-Id': f'benchmark-{rnd.getrandbits(32):08x}'}
+
+    def post(path: str, payload: Dict) -> Dict:
+        return client.post(path, json=payload, headers=headers).get_json()
+
+    results = {}
+    trx_id = post('/api/transaction/begin', {})['trx_id']
+    row_ids = []
+    start = time.perf_counter()
+    for i in range(ops):
+        row_ids.append(post('/api/data/insert', {'trx_id': trx_id, 'data': _row_data(rnd, i)})['row_id'])
+    results['insert'] = _throughput(ops, time.perf_counter() - start)
+    post('/api/transaction/commit', {'trx_id': trx_id})
+
+    trx_id = post('/api/transaction/begin', {})['trx_id']
+    start = time.perf_counter()
+    for i in range(ops):
+        post('/api/data/update', {'trx_id': trx_id, 'row_id': row_ids[i], 'data': {'balance': i}})
+    results['update'] = _throughput(ops, time.perf_counter() - start)
+    post('/api/transaction/commit', {'trx_id': trx_id})
+
+    trx_id = post('/api/transaction/begin', {'isolation_level': 'REPEATABLE_READ'})['trx_id']
+    start = time.perf_counter()
+    for i in range(ops):
+        post('/api/data/read', {'trx_id': trx_id, 'row_id': row_ids[i]})
+    results['read'] = _throughput(ops, time.perf_counter() - start)
+    post('/api/system/reset', {})
+    return results
+
+
+# 基准名称 -> (函数, 默认规模)，规模为操作数、样本数或重复次数，乘以--scale
+BENCHMARKS = {
+    'insert_throughput': (bench_insert_throughput, 20000),
+    'update_throughput': (bench_update_throughput, 20000),
+    'read_throughput': (bench_read_throughput, 20000),
+    'read_latency_vs_chain_length': (bench_read_latency_vs_chain_length, 2000),
+    'read_view_vs_active_trx': (bench_read_view_vs_active_trx, 2000),
+    'rollback_vs_modified_rows': (bench_rollback_vs_modified_rows, 20),
+    'state_serialization_vs_size': (bench_state_serialization_vs_size, 5),
+    'concurrent_updates': (bench_concurrent_updates, 20000),
+    'scenario_replay': (bench_scenario_replay, 1000),
+    'http': (bench_http, 2000),
+}
+OPTIONAL_BENCHMARKS = {'http'}  # 默认不运行，需要--http或--only指定
+
+
+def run(scale: float = 1.0, only: Optional[List[str]] = None, http: bool = False, seed: int = 42) -> Dict:
+    """运行基准，返回包含运行环境信息与各项结果的字典"""
+    names = only or [name for name in BENCHMARKS if name not in OPTIONAL_BENCHMARKS or http]
+    results = {}
+    for name in names:
+        fn, size = BENCHMARKS[name]
+        # 每项基准使用独立的随机数生成器，单独运行某一项时结果与完整运行一致
+        results[name] = fn(max(1, int(size * scale)), random.Random(f'{seed}:{name}'))
+    return {
+        'benchmark': 'engine',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'params': {'scale': scale, 'seed': seed, 'switch_interval': sys.getswitchinterval()},
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MVCC引擎吞吐与延迟基准')
+    parser.add_argument('--scale', type=float, default=1.0, help='操作数、样本数与重复次数的缩放系数')
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help='只运行指定的基准（可重复）')
+    parser.add_argument('--http', action='store_true', help='同时通过Flask测试客户端测量HTTP接口吞吐')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    parser.add_argument('--output', help='结果写入的JSON文件（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    result = run(args.scale, args.only, args.http, args.seed)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
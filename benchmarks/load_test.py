@@ -0,0 +1,279 @@
+"""
+HTTP负载测试：对比Flask多线程服务器（python app.py）与ASGI模式（uvicorn asgi:app）
+- 先打开--idle个事件流连接（模拟打开着的看板页面），它们会收到测试期间的所有事件
+- 再由--clients个并发客户端在--duration秒内循环执行 begin -> insert -> read -> update -> read -> commit
+- 记录请求吞吐、延迟分位数、失败数，以及服务器进程的线程数与常驻内存（读取/proc，仅Linux）
+
+运行：
+python -m benchmarks.load_test --compare [--clients 50] [--idle 500] [--duration 10]   # 依次启动两种服务器并对比
+python -m benchmarks.load_test --url http://127.0.0.1:5001 [--pid <服务器进程ID>]         # 测试已经启动的服务器
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.engine import _throughput
+from scenario import latency_stats
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKSPACE = 'loadtest'
+
+SERVERS = {
+    'flask': [sys.executable, '-c',
+              'import sys; from app import app; app.run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--log-level', 'warning',
+             '--port'],
+}
+
+
+class HTTPClient:
+    """最小的HTTP/1.1客户端：服务器支持时复用连接，服务器关闭连接（Flask开发服务器）时下次请求重新连接"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head = (f'{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+                f'X-Workspace-Id: {WORKSPACE}\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(body)}\r\n\r\n')
+        self.writer.write(head.encode('latin-1') + body)
+        status, headers = await read_head(self.reader)
+        if 'content-length' in headers:
+            data = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            data = await read_chunked(self.reader)
+        else:
+            data = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+
+async def read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by server')
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return int(status_line.split()[1]), headers
+
+
+async def read_chunked(reader: asyncio.StreamReader) -> bytes:
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b';')[0], 16)
+        if size == 0:
+            await reader.readline()
+            return b''.join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readline()
+
+
+async def open_event_stream(host: str, port: int, opened: List[int], stop: asyncio.Event):
+    """打开一个事件流连接并持续读取（丢弃）推送的事件，直到测试结束"""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return
+    try:
+        writer.write(f'GET /api/events HTTP/1.1\r\nHost: {host}:{port}\r\nX-Workspace-Id: {WORKSPACE}\r\n\r\n'
+                     .encode('latin-1'))
+        status, _ = await read_head(reader)
+        if status != 200:
+            return
+        opened[0] += 1
+        read = asyncio.ensure_future(reader.read(65536))
+        stopped = asyncio.ensure_future(stop.wait())
+        while True:
+            done, _ = await asyncio.wait({read, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            if stopped in done or not read.result():
+                break
+            read = asyncio.ensure_future(reader.read(65536))
+        read.cancel()
+        stopped.cancel()
+    except (OSError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_client(host: str, port: int, deadline: float, latencies: List[int], errors: List[int]):
+    """循环执行一个完整的短事务，直到deadline"""
+    client = HTTPClient(host, port)
+
+    async def call(path: str, payload: Dict) -> Optional[Dict]:
+        start = time.perf_counter_ns()
+        try:
+            status, data = await client.request('POST', path, payload)
+            result = json.loads(data)
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+            await client.close()
+            errors[0] += 1
+            return None
+        latencies.append(time.perf_counter_ns() - start)
+        if status != 200 or not result.get('success', True):
+            errors[0] += 1
+            return None
+        return result
+
+    i = 0
+    while time.perf_counter() < deadline:
+        i += 1
+        trx = await call('/api/transaction/begin', {})
+        if trx is None:
+            continue
+        trx_id = trx['trx_id']
+        row = await call('/api/data/insert', {'trx_id': trx_id, 'data': {'name': f'client{i}', 'balance': i}})
+        if row is not None:
+            await call('/api/data/read', {'trx_id': trx_id, 'row_id': row['row_id']})
+            await call('/api/data/update', {'trx_id': trx_id, 'row_id': row['row_id'],
+                                            'data': {'name': f'client{i}', 'balance': i + 1}})
+            await call('/api/data/read', {'trx_id': trx_id, 'row_id': row['row_id']})
+        await call('/api/transaction/commit', {'trx_id': trx_id})
+    await client.close()
+
+
+def process_stats(pid: Optional[int]) -> Optional[Dict]:
+    """服务器进程的线程数与常驻内存"""
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None
+    return {'threads': int(fields['Threads']), 'rss_kb': int(fields['VmRSS'].split()[0])}
+
+
+async def load_test(url: str, clients: int, idle: int, duration: float, pid: Optional[int] = None) -> Dict:
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+
+    stop = asyncio.Event()
+    opened = [0]
+    streams = [asyncio.ensure_future(open_event_stream(host, port, opened, stop)) for _ in range(idle)]
+    await asyncio.sleep(min(5.0, 0.5 + idle / 500))
+    idle_stats = process_stats(pid)
+
+    latencies: List[int] = []
+    errors = [0]
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, start + duration, latencies, errors) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    busy_stats = process_stats(pid)
+
+    stop.set()
+    await asyncio.gather(*streams)
+    return {
+        'event_streams_opened': opened[0],
+        'requests': _throughput(len(latencies), elapsed),
+        'errors': errors[0],
+        'latency': latency_stats(latencies) if latencies else None,
+        'server_with_idle_streams': idle_stats,
+        'server_under_load': busy_stats,
+    }
+
+
+def wait_for_server(port: int, process: subprocess.Popen, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('Server did not start in time')
+
+
+def run_server(name: str, port: int, clients: int, idle: int, duration: float) -> Dict:
+    """在子进程中启动一种服务器（全新的工作区池）并测试"""
+    process = subprocess.Popen(SERVERS[name] + [str(port)], cwd=REPO_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        wait_for_server(port, process)
+        return asyncio.run(load_test(f'http://127.0.0.1:{port}', clients, idle, duration, process.pid))
+    except RuntimeError as e:
+        process.kill()
+        stderr = process.stderr.read().decode('utf-8', 'replace').strip().splitlines()
+        return {'error': str(e), 'stderr': stderr[-1] if stderr else None}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flask与ASGI模式的HTTP负载测试')
+    parser.add_argument('--url', help='测试已启动的服务器，如 http://127.0.0.1:5001')
+    parser.add_argument('--pid', type=int, help='与--url一起使用：服务器进程ID，用于记录线程数与内存')
+    parser.add_argument('--compare', action='store_true', help='依次启动Flask与ASGI服务器并测试')
+    parser.add_argument('--port', type=int, default=5051, help='--compare时服务器使用的端口')
+    parser.add_argument('--clients', type=int, default=50, help='并发执行事务的客户端数')
+    parser.add_argument('--idle', type=int, default=500, help='空闲的事件流连接数')
+    parser.add_argument('--duration', type=float, default=10.0, help='每种服务器的测试时长（秒）')
+    parser.add_argument('--output', help='结果写入的JSON文件（默认输出到标准输出）')
+    args = parser.parse_args()
+    if not args.url and not args.compare:
+        parser.error('one of --url or --compare is required')
+
+    # 每个连接占用一个文件描述符
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    if args.compare:
+        results = {name: run_server(name, args.port, args.clients, args.idle, args.duration) for name in SERVERS}
+    else:
+        results = {args.url: asyncio.run(load_test(args.url, args.clients, args.idle, args.duration, args.pid))}
+    result = {
+        'benchmark': 'load_test',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'clients': args.clients, 'idle': args.idle, 'duration': args.duration},
+        'results': results,
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+内存占用基准
+统计UndoLog、DataRow、Transaction、ReadView单条记录的平均内存开销（不含数据字典本身），
+以及宽行只修改一列时UPDATE Undo日志连同增量在内的开销、记录过一次操作并提交的事务的开销
+
+运行：python -m benchmarks.memory_footprint [--count N]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+from transaction import Transaction, ReadView
+from undo_log import UndoLog, UndoLogType, compute_delta
+from data_row import DataRow
+
+
+def _measure(factory, count: int) -> float:
+    """创建count个对象，返回每个对象的平均分配字节数"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    objects = [factory(i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    # 扣除保存对象的列表本身
+    used -= objects.__sizeof__()
+    return used / count
+
+
+def _committed_transaction(trx_id: int) -> Transaction:
+    """执行过一次INSERT并提交的事务（操作历史已压缩为元组）"""
+    trx = Transaction(trx_id)
+    trx.add_operation('INSERT', trx_id)
+    trx.commit()
+    return trx
+
+
+def run(count: int = 100000) -> dict:
+    """运行内存基准，返回每类记录的平均字节数"""
+    shared_data = {'name': 'row', 'balance': 100}
+    shared_delta = {'balance': 100}
+    wide_row = {f'col{i}': i for i in range(10)}
+    active_trx_ids = [1, 2, 3]
+
+    return {
+        'count': count,
+        'bytes_per_record': {
+            'UndoLog': round(_measure(
+                lambda i: UndoLog(i, UndoLogType.UPDATE, i, i, shared_delta), count), 1),
+            'UpdateUndoWideRow': round(_measure(
+                lambda i: UndoLog(i, UndoLogType.UPDATE, i, i, compute_delta(wide_row, {**wide_row, 'col0': -i})),
+                count), 1),
+            'DataRow': round(_measure(lambda i: DataRow(i, shared_data), count), 1),
+            'Transaction': round(_measure(lambda i: Transaction(i), count), 1),
+            'CommittedTransaction': round(_measure(_committed_transaction, count), 1),
+            'ReadView': round(_measure(lambda i: ReadView(i, active_trx_ids, 10), count), 1),
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MVCC记录内存占用基准')
+    parser.add_argument('--count', type=int, default=100000, help='每类记录创建的数量')
+    args = parser.parse_args()
+    print(json.dumps(run(args.count), indent=2))
+
+
+if __name__ == '__main__':
+    main()
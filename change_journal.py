@@ -0,0 +1,66 @@
+"""
+InnoDB MVCC 变更日志模块
+为每次状态变更分配单调递增的序列号，支持按序列号获取增量变更
+"""
+import threading
+import uuid
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+
+class ChangeJournal:
+    """
+    变更日志
+
+    每条记录为 (seq, kind, entity_id, action)：
+    - kind: 'transaction' / 'row' / 'undo_log'（版本链随数据行一起变化，按行记录）
+    - action: 'create' / 'update' / 'remove'
+    日志容量有限，过早的序列号无法给出增量，调用方应退回全量状态
+    多个线程可以同时记录变更，序列号分配与追加在同一把锁内完成
+
+    实体版本为该实体最近一次变更的序列号，用于条件请求的ETag；
+    重置、导入快照与恢复时系统连同变更日志重建，序列号可能延续也可能重新开始，
+    因此版本只在同一个日志实例（epoch）内可比较
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.seq = 0  # 最近一次变更的序列号
+        self.entries: Deque[Tuple[int, str, int, str]] = deque(maxlen=capacity)
+        self.versions: Dict[Tuple[str, int], int] = {}  # (kind, entity_id) -> 实体版本，实体删除时移除
+        self.epoch = uuid.uuid4().hex[:12]
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, entity_id: int, action: str = 'update') -> int:
+        """记录一次变更，返回分配的序列号"""
+        with self.lock:
+            self.seq += 1
+            self.entries.append((self.seq, kind, entity_id, action))
+            if action == 'remove':
+                self.versions.pop((kind, entity_id), None)
+            else:
+                self.versions[(kind, entity_id)] = self.seq
+            return self.seq
+
+    def version(self, kind: str, entity_id: int) -> int:
+        """实体版本，本实例内没有变更过的实体（如恢复时载入的实体）为0"""
+        return self.versions.get((kind, entity_id), 0)
+
+    def covers(self, since: int) -> bool:
+        """判断日志是否保留了since之后的全部变更"""
+        return self.seq - len(self.entries) <= since <= self.seq
+
+    def changes_since(self, since: int) -> Dict[Tuple[str, int], bool]:
+        """
+        获取since之后发生变更的实体
+        返回 (kind, entity_id) -> 该实体是否在此期间被创建
+        """
+        changes: Dict[Tuple[str, int], bool] = {}
+        with self.lock:
+            for seq, kind, entity_id, action in reversed(self.entries):
+                if seq <= since:
+                    break
+                key = (kind, entity_id)
+                created = action == 'create'
+                if created or key not in changes:
+                    changes[key] = created
+        return changes
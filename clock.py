@@ -0,0 +1,22 @@
+"""
+InnoDB MVCC 时间戳工具
+记录中以整数微秒保存时间戳，序列化时再转换为本地时间的ISO格式字符串
+"""
+import time
+from datetime import datetime
+
+
+def now_us() -> int:
+    """当前时间（自纪元起的微秒数）"""
+    return time.time_ns() // 1000
+
+
+def to_datetime(timestamp_us: int) -> datetime:
+    """将微秒时间戳转换为本地时间的datetime（与datetime.now()一致）"""
+    seconds, microseconds = divmod(timestamp_us, 1000000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=microseconds)
+
+
+def isoformat(timestamp_us: int) -> str:
+    """将微秒时间戳格式化为ISO字符串"""
+    return to_datetime(timestamp_us).isoformat()
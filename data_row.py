@@ -2,26 +2,55 @@
 InnoDB MVCC 数据行版本链管理模块
 实现数据行的多版本管理和可见性判断
 """
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, List, Iterator, Tuple
 from datetime import datetime
+from bisect import bisect_left, bisect_right, insort
+from clock import now_us, to_datetime, isoformat
 from transaction import ReadView
-from undo_log import UndoLog, UndoLogType
+from undo_log import UndoLog, UndoLogType, MISSING, compute_delta, iter_undo_images
+from secondary_index import SecondaryIndex
+from latch import IdAllocator, StripedLatch
+import metrics
 
+# 一致性读沿Undo链回溯的Undo日志条数（0表示当前版本即可见），普通读取与带路径的读取分别统计
+UNDO_CHAIN_HOPS = metrics.histogram(
+    'mvcc_undo_chain_hops', 'Undo log records visited per consistent read',
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000), labelnames=('read_path',))
+_READ_HOPS = UNDO_CHAIN_HOPS.labels('read')
+_READ_WITH_PATH_HOPS = UNDO_CHAIN_HOPS.labels('read_with_path')
 
-class DataRow:
-    """数据行"""
-
-    _next_row_id = 1
 
-    def __init__(self, data: Dict[str, Any]):
-        self.row_id = DataRow._next_row_id
-        DataRow._next_row_id += 1
+class DataRow:
+    """
+    数据行
+    使用__slots__去掉每个实例的__dict__，时间戳以整数微秒保存
+    mutation_count在行数据、行头或其Undo链每次变化时递增，用于判断派生的版本链缓存是否过期
+    行ID由DataRowManager的ID分配器分配
+    """
+
+    __slots__ = ('row_id', 'data', 'trx_id', 'roll_pointer', 'create_time_us', 'update_time_us', 'deleted',
+                 'mutation_count')
+
+    def __init__(self, row_id: int, data: Dict[str, Any]):
+        self.row_id = row_id
         self.data = data  # 当前数据
         self.trx_id: Optional[int] = None  # 最后修改该行的事务ID
         self.roll_pointer: Optional[int] = None  # 指向Undo日志的指针
-        self.create_time = datetime.now()
-        self.update_time = datetime.now()
+        self.create_time_us = now_us()
+        self.update_time_us = self.create_time_us
         self.deleted = False  # 删除标记
+        self.mutation_count = 0  # 变更计数
+
+    @property
+    def create_time(self) -> datetime:
+        """行创建时间"""
+        return to_datetime(self.create_time_us)
+
+    @property
+    def update_time(self) -> datetime:
+        """行最后修改时间"""
+        return to_datetime(self.update_time_us)
 
     def to_dict(self):
         """转换为字典格式"""
@@ -30,28 +59,73 @@ class DataRow:
             'data': self.data,
             'trx_id': self.trx_id,
             'roll_pointer': self.roll_pointer,
-            'create_time': self.create_time.isoformat(),
-            'update_time': self.update_time.isoformat(),
+            'create_time': isoformat(self.create_time_us),
+            'update_time': isoformat(self.update_time_us),
             'deleted': self.deleted
         }
 
+    def to_tuple(self) -> tuple:
+        """转换为只包含基本类型的元组（快照与检查点使用）"""
+        return (self.row_id, self.data, self.trx_id, self.roll_pointer,
+                self.create_time_us, self.update_time_us, self.deleted)
+
+    @classmethod
+    def from_tuple(cls, values: tuple) -> 'DataRow':
+        """由to_tuple的结果重建数据行"""
+        row_id, data, trx_id, roll_pointer, create_time_us, update_time_us, deleted = values
+        row = cls(row_id, data)
+        row.trx_id = trx_id
+        row.roll_pointer = roll_pointer
+        row.create_time_us = create_time_us
+        row.update_time_us = update_time_us
+        row.deleted = deleted
+        return row
+
 
 class VersionChain:
-    """版本链 - 管理数据行的所有历史版本"""
+    """
+    版本链 - 数据行所有历史版本的只读视图
+
+    版本不单独保存，而是按需从当前行数据沿roll_pointer回溯Undo链推导：
+    INSERT / UPDATE类型的Undo日志各对应一个版本（该事务写入后的数据），DELETE只打删除标记不产生新版本。
+    推导结果按行的mutation_count缓存，行或其Undo链变化后下次访问时重新推导
+    """
 
-    def __init__(self, row: DataRow):
+    def __init__(self, row: DataRow, undo_logs: Dict[int, UndoLog]):
         self.row = row
-        self.versions: List[Dict[str, Any]] = []  # 历史版本列表
-
-    def add_version(self, trx_id: int, data: Dict[str, Any], undo_id: Optional[int] = None):
-        """添加新版本"""
-        version = {
-            'trx_id': trx_id,
-            'data': data.copy(),
-            'undo_id': undo_id,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.versions.append(version)
+        self.undo_logs = undo_logs
+        self._versions: List[Dict[str, Any]] = []
+        self._cached_mutation_count = -1
+
+    @property
+    def versions(self) -> List[Dict[str, Any]]:
+        """历史版本列表（从旧到新）"""
+        row = self.row
+        if self._cached_mutation_count != row.mutation_count:
+            versions = []
+            base_image = row.data
+            for undo_log, after_image, before_image in iter_undo_images(row.data, row.roll_pointer, self.undo_logs):
+                base_image = before_image
+                if undo_log.log_type == UndoLogType.DELETE:
+                    continue
+                versions.append({
+                    'trx_id': undo_log.trx_id,
+                    'data': dict(after_image) if after_image else {},
+                    'undo_id': undo_log.undo_id if undo_log.log_type == UndoLogType.UPDATE else None,
+                    'timestamp': isoformat(undo_log.create_time_us)
+                })
+            if not versions and base_image:
+                # 写入该版本的Undo日志已被purge（链上只剩DELETE），写入事务已无从得知
+                versions.append({
+                    'trx_id': None,
+                    'data': dict(base_image),
+                    'undo_id': None,
+                    'timestamp': isoformat(row.create_time_us)
+                })
+            versions.reverse()
+            self._versions = versions
+            self._cached_mutation_count = row.mutation_count
+        return self._versions
 
     def get_visible_version_with_path(self, read_view: ReadView, undo_logs: Dict[int, UndoLog]) -> tuple:
         """
@@ -62,6 +136,7 @@ class VersionChain:
         - 当前行数据是最新版本
         - Undo日志记录的是历史版本
         - 回溯时，我们需要找到第一个可见的事务，并返回该事务修改后的数据
+        - Undo日志只保存增量，回溯时从当前数据出发逐条应用增量重建每个历史版本
         """
         path = []  # 记录读取路径
         
@@ -77,6 +152,7 @@ class VersionChain:
         path.append(current_version_info)
         
         if current_version_info['visible']:
+            _READ_WITH_PATH_HOPS.observe(0)
             if not self.row.deleted:
                 return self.row.data.copy(), path
             else:
@@ -84,7 +160,8 @@ class VersionChain:
 
         # 沿着Undo链回溯，寻找第一个可见的版本
         current_undo_id = self.row.roll_pointer
-        prev_undo_log = None
+        after_image = self.row.data  # 当前Undo日志对应事务修改后的数据
+        hops = 0
 
         while current_undo_id is not None:
             undo_log = undo_logs.get(current_undo_id)
@@ -95,18 +172,20 @@ class VersionChain:
                     'error': 'Undo log not found'
                 })
                 break
+            hops += 1
 
             # 检查该Undo日志对应的事务是否可见
             visible = read_view.is_visible(undo_log.trx_id)
             visibility_reason = self._explain_visibility(read_view, undo_log.trx_id)
-            
+            before_image = undo_log.before_image(after_image)
+
             undo_info = {
                 'type': 'undo_log',
                 'undo_id': undo_log.undo_id,
                 'trx_id': undo_log.trx_id,
                 'log_type': undo_log.log_type.value,
                 # InnoDB undo log stores before-image; avoid exposing new_value as it is current version data
-                'old_value': undo_log.old_value.copy() if undo_log.old_value else None,
+                'old_value': dict(before_image) if before_image else None,
                 'new_value': None,
                 'roll_pointer': undo_log.roll_pointer,
                 'visible': visible,
@@ -117,30 +196,21 @@ class VersionChain:
             if visible:
                 # 找到第一个可见的事务
                 # 需要返回该事务修改后的数据
+                _READ_WITH_PATH_HOPS.observe(hops)
 
-                if undo_log.log_type == UndoLogType.INSERT:
-                    # INSERT操作：没有更早版本，Undo记录仅用于回滚插入
-                    return None, path
-
-                elif undo_log.log_type == UndoLogType.UPDATE:
-                    # UPDATE操作：需要返回该事务修改后的数据
-                    # 如果有前一个Undo日志（更新的版本），则返回前一个的old_value
-                    # 否则返回当前Undo的new_value
-                    if prev_undo_log and prev_undo_log.old_value:
-                        return prev_undo_log.old_value.copy(), path
-                    elif undo_log.new_value:
-                        return undo_log.new_value.copy(), path
-                    else:
-                        return undo_log.old_value.copy() if undo_log.old_value else None, path
+                if undo_log.log_type in (UndoLogType.INSERT, UndoLogType.UPDATE):
+                    # INSERT / UPDATE操作：需要返回该事务插入或修改后的数据
+                    return (dict(after_image) if after_image else None), path
 
                 elif undo_log.log_type == UndoLogType.DELETE:
                     # DELETE操作：该版本已被删除
                     return None, path
 
             # 继续回溯到更早的版本
-            prev_undo_log = undo_log
+            after_image = before_image
             current_undo_id = undo_log.roll_pointer
 
+        _READ_WITH_PATH_HOPS.observe(hops)
         return None, path  # 没有可见版本
 
     def _explain_visibility(self, read_view: ReadView, trx_id: int) -> str:
@@ -151,17 +221,51 @@ class VersionChain:
             return f'trx_id < min_trx_id ({trx_id} < {read_view.min_trx_id}) -> 可见（ReadView创建前已提交）'
         elif trx_id > read_view.max_trx_id:
             return f'trx_id > max_trx_id ({trx_id} > {read_view.max_trx_id}) -> 不可见（ReadView创建后才开始）'
-        elif trx_id in read_view.m_ids:
+        elif trx_id in read_view.m_ids_set:
             return f'trx_id in m_ids ({trx_id} in {read_view.m_ids}) -> 不可见（创建ReadView时还未提交）'
         else:
             return f'trx_id not in m_ids ({trx_id} not in {read_view.m_ids}) -> 可见（创建ReadView时已提交）'
 
     def get_visible_version(self, read_view: ReadView, undo_logs: Dict[int, UndoLog]) -> Optional[Dict[str, Any]]:
         """
-        根据ReadView获取可见的数据版本（兼容原方法）
+        根据ReadView获取可见的数据版本
+        与get_visible_version_with_path的判断规则相同，但不构造读取路径和可见性解释，
+        普通读取只为最终返回的数据做一次拷贝：
+        回溯时只累积经过的增量（较早的增量覆盖较新的），找到可见版本后再与当前数据合并
         """
-        result, _ = self.get_visible_version_with_path(read_view, undo_logs)
-        return result
+        row = self.row
+        if row.trx_id and read_view.is_visible(row.trx_id):
+            _READ_HOPS.observe(0)
+            return None if row.deleted else row.data.copy()
+
+        current_undo_id = row.roll_pointer
+        overlay: Dict[str, Any] = {}  # 已回溯的UPDATE增量：列 -> 更早版本的值
+        hops = 0
+        while current_undo_id is not None:
+            undo_log = undo_logs.get(current_undo_id)
+            if undo_log is None:
+                break
+            hops += 1
+
+            if read_view.is_visible(undo_log.trx_id):
+                _READ_HOPS.observe(hops)
+                if undo_log.log_type == UndoLogType.DELETE:
+                    # DELETE：该版本已被删除
+                    return None
+                data = row.data.copy() if row.data else {}
+                for column, value in overlay.items():
+                    if value is MISSING:
+                        data.pop(column, None)
+                    else:
+                        data[column] = value
+                return data or None
+
+            if undo_log.delta:
+                overlay.update(undo_log.delta)
+            current_undo_id = undo_log.roll_pointer
+
+        _READ_HOPS.observe(hops)
+        return None
 
     def to_dict(self):
         """转换为字典格式"""
@@ -172,107 +276,232 @@ class VersionChain:
 
 
 class DataRowManager:
-    """数据行管理器"""
-
-    def __init__(self, undo_log_manager):
+    """
+    数据行管理器
+
+    闩锁：
+    - row_latch(row_id): 行闩锁，修改行及其Undo链、沿Undo链回溯读取时持有，同一时刻只持有一个
+    - index_latch: 保护有序row_id索引与二级索引，总是在行闩锁之后获取
+    """
+
+    def __init__(self, undo_log_manager, row_id_allocator: Optional[IdAllocator] = None):
+        self.row_id_allocator = row_id_allocator if row_id_allocator is not None else IdAllocator()
+        self.row_latch = StripedLatch()
+        self.index_latch = threading.Lock()
         self.rows: Dict[int, DataRow] = {}  # row_id -> DataRow
+        self.row_ids: List[int] = []  # 有序的row_id索引，用于范围扫描
+        self.secondary_indexes: Dict[str, SecondaryIndex] = {}  # 列名 -> 二级索引
         self.version_chains: Dict[int, VersionChain] = {}  # row_id -> VersionChain
         self.undo_log_manager = undo_log_manager
+        self.journal = undo_log_manager.journal  # 与Undo日志管理器共用变更日志
 
-    def insert_row(self, trx_id: int, data: Dict[str, Any]) -> DataRow:
-        """插入新行"""
-        row = DataRow(data)
+    def insert_row(self, trx_id: int, data: Dict[str, Any]) -> Tuple[DataRow, int]:
+        """插入新行，返回新行与本次创建的Undo日志ID"""
+        row = DataRow(self.row_id_allocator.allocate(), data)
         row.trx_id = trx_id
-        self.rows[row.row_id] = row
-
-        # 创建版本链
-        version_chain = VersionChain(row)
-        version_chain.add_version(trx_id, data)
-        self.version_chains[row.row_id] = version_chain
-
-        # 创建INSERT类型的Undo日志（用于回滚INSERT操作）
-        # INSERT的Undo日志不需要roll_pointer，因为没有更早的版本
-        undo_log = self.undo_log_manager.create_undo_log(
-            UndoLogType.INSERT, trx_id, row.row_id, None, data, None
-        )
-
-        # 重要：row.roll_pointer指向INSERT的Undo日志
-        # 这样后续UPDATE时可以通过old_roll_pointer获取到INSERT的Undo日志ID
-        row.roll_pointer = undo_log.undo_id
-
-        return row
-
-    def update_row(self, trx_id: int, row_id: int, new_data: Dict[str, Any]) -> bool:
-        """更新行"""
-        if row_id not in self.rows:
-            return False
-
-        row = self.rows[row_id]
-        old_data = row.data.copy()
-        old_roll_pointer = row.roll_pointer  # 保存旧的roll_pointer
-
-        # 创建UPDATE类型的Undo日志
-        # Undo日志的roll_pointer指向更早的版本
-        undo_log = self.undo_log_manager.create_undo_log(
-            UndoLogType.UPDATE, trx_id, row_id, old_data, new_data, old_roll_pointer
-        )
-
-        # 更新行数据
-        # 关键：row.roll_pointer应该指向本次UPDATE创建的Undo日志
-        # 这样可以通过Undo日志的roll_pointer继续回溯到更早的版本
-        row.data = new_data
-        row.trx_id = trx_id
-        row.roll_pointer = undo_log.undo_id  # 指向本次UPDATE的Undo日志
-        row.update_time = datetime.now()
-
-        # 添加到版本链
-        if row_id in self.version_chains:
-            self.version_chains[row_id].add_version(trx_id, new_data, undo_log.undo_id)
-
-        return True
-
-    def delete_row(self, trx_id: int, row_id: int) -> bool:
-        """删除行（标记删除）"""
-        if row_id not in self.rows:
-            return False
-
-        row = self.rows[row_id]
-        old_data = row.data.copy()
-
-        # 创建DELETE类型的Undo日志
-        undo_log = self.undo_log_manager.create_undo_log(
-            UndoLogType.DELETE, trx_id, row_id, old_data, None, row.roll_pointer
-        )
-
-        # 标记删除
-        row.deleted = True
-        row.trx_id = trx_id
-        row.roll_pointer = undo_log.undo_id
-        row.update_time = datetime.now()
-
-        return True
+        with self.row_latch(row.row_id):
+            # 创建INSERT类型的Undo日志（用于回滚INSERT操作）
+            # INSERT的Undo日志不需要roll_pointer，因为没有更早的版本
+            undo_log = self.undo_log_manager.create_undo_log(
+                UndoLogType.INSERT, trx_id, row.row_id, None, None
+            )
+
+            # 重要：row.roll_pointer指向INSERT的Undo日志
+            # 这样后续UPDATE时可以通过old_roll_pointer获取到INSERT的Undo日志ID
+            row.roll_pointer = undo_log.undo_id
+
+            # 行头与Undo日志就绪后才对其他线程可见
+            self.rows[row.row_id] = row
+            # 创建版本链视图（版本由Undo链推导）
+            self.version_chains[row.row_id] = VersionChain(row, self.undo_log_manager.undo_logs)
+            with self.index_latch:
+                insort(self.row_ids, row.row_id)  # row_id单调递增，通常直接追加在末尾
+                for index in self.secondary_indexes.values():
+                    index.add(row.row_id, data)
+            self.journal.record('row', row.row_id, 'create')
+
+        return row, undo_log.undo_id
+
+    def update_row(self, trx_id: int, row_id: int, new_data: Dict[str, Any]) -> Optional[int]:
+        """
+        更新行
+        返回本次创建的Undo日志ID（在行闩锁内取得，不会被其他线程随后的修改覆盖），行不存在时返回None
+        """
+        with self.row_latch(row_id):
+            row = self.rows.get(row_id)
+            if row is None:
+                return None
+
+            old_roll_pointer = row.roll_pointer  # 保存旧的roll_pointer
+
+            # 创建UPDATE类型的Undo日志，只记录被修改列的旧值
+            # Undo日志的roll_pointer指向更早的版本
+            undo_log = self.undo_log_manager.create_undo_log(
+                UndoLogType.UPDATE, trx_id, row_id, compute_delta(row.data, new_data), old_roll_pointer
+            )
+
+            # 更新行数据
+            # 关键：row.roll_pointer应该指向本次UPDATE创建的Undo日志
+            # 这样可以通过Undo日志的roll_pointer继续回溯到更早的版本
+            row.data = new_data
+            row.trx_id = trx_id
+            row.roll_pointer = undo_log.undo_id  # 指向本次UPDATE的Undo日志
+            row.update_time_us = now_us()
+            # 二级索引：插入新值的索引项，旧值的索引项保留到purge
+            if self.secondary_indexes:
+                with self.index_latch:
+                    for index in self.secondary_indexes.values():
+                        index.add(row_id, new_data)
+            self.mark_row_changed(row)
+
+        return undo_log.undo_id
+
+    def delete_row(self, trx_id: int, row_id: int) -> Optional[int]:
+        """删除行（标记删除），返回本次创建的Undo日志ID，行不存在时返回None"""
+        with self.row_latch(row_id):
+            row = self.rows.get(row_id)
+            if row is None:
+                return None
+
+            # 创建DELETE类型的Undo日志（只打删除标记，列数据不变，无需保存旧值）
+            undo_log = self.undo_log_manager.create_undo_log(
+                UndoLogType.DELETE, trx_id, row_id, None, row.roll_pointer
+            )
+
+            # 标记删除
+            row.deleted = True
+            row.trx_id = trx_id
+            row.roll_pointer = undo_log.undo_id
+            row.update_time_us = now_us()
+            self.mark_row_changed(row)
+
+        return undo_log.undo_id
 
     def read_row(self, row_id: int, read_view: ReadView) -> Optional[Dict[str, Any]]:
         """根据ReadView读取行数据"""
-        if row_id not in self.rows:
-            return None
-
         version_chain = self.version_chains.get(row_id)
         if version_chain is None:
             return None
 
-        return version_chain.get_visible_version(read_view, self.undo_log_manager.undo_logs)
+        with self.row_latch(row_id):
+            return version_chain.get_visible_version(read_view, self.undo_log_manager.undo_logs)
 
     def read_row_with_path(self, row_id: int, read_view: ReadView) -> tuple:
         """根据ReadView读取行数据，并返回读取路径"""
-        if row_id not in self.rows:
-            return None, []
-
         version_chain = self.version_chains.get(row_id)
         if version_chain is None:
             return None, []
 
-        return version_chain.get_visible_version_with_path(read_view, self.undo_log_manager.undo_logs)
+        with self.row_latch(row_id):
+            return version_chain.get_visible_version_with_path(read_view, self.undo_log_manager.undo_logs)
+
+    def remove_row(self, row_id: int):
+        """物理删除行及其版本链（调用方持有该行的行闩锁）"""
+        with self.index_latch:
+            if self.rows.pop(row_id, None) is not None:
+                index = bisect_left(self.row_ids, row_id)
+                if index < len(self.row_ids) and self.row_ids[index] == row_id:
+                    del self.row_ids[index]
+                self.journal.record('row', row_id, 'remove')
+            self.version_chains.pop(row_id, None)
+            for index in self.secondary_indexes.values():
+                index.remove_row(row_id)
+
+    def mark_row_changed(self, row: DataRow):
+        """行数据、行头或其Undo链发生变化：递增变更计数使版本链缓存失效，并记录变更"""
+        row.mutation_count += 1
+        self.journal.record('row', row.row_id)
+
+    def iter_row_ids(self, start_row_id: Optional[int] = None,
+                     end_row_id: Optional[int] = None) -> Iterator[int]:
+        """
+        按row_id顺序遍历[start_row_id, end_row_id]内的row_id
+        每次从上一个row_id之后重新定位，遍历过程中行被删除也不会错位
+        """
+        row_ids = self.row_ids
+        index = 0 if start_row_id is None else bisect_left(row_ids, start_row_id)
+        while index < len(row_ids):
+            row_id = row_ids[index]
+            if end_row_id is not None and row_id > end_row_id:
+                break
+            yield row_id
+            index = bisect_right(row_ids, row_id)
+
+    def scan_rows(self, read_view: ReadView, start_row_id: Optional[int] = None,
+                  end_row_id: Optional[int] = None,
+                  limit: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        按row_id顺序扫描[start_row_id, end_row_id]内对ReadView可见的行
+        每行只在读取可见版本时持有行闩锁，扫描期间其他线程可以继续修改
+        """
+        undo_logs = self.undo_log_manager.undo_logs
+        count = 0
+        for row_id in self.iter_row_ids(start_row_id, end_row_id):
+            if limit is not None and count >= limit:
+                break
+            version_chain = self.version_chains.get(row_id)
+            if version_chain is not None:
+                with self.row_latch(row_id):
+                    data = version_chain.get_visible_version(read_view, undo_logs)
+                if data is not None:
+                    count += 1
+                    yield row_id, data
+
+    def _reachable_versions(self, row: DataRow) -> List[Optional[Dict[str, Any]]]:
+        """当前版本加上沿Undo链仍可回溯到的所有版本数据"""
+        versions = [row.data]
+        for undo_log, _, before_image in iter_undo_images(row.data, row.roll_pointer,
+                                                          self.undo_log_manager.undo_logs):
+            if undo_log.delta:
+                versions.append(before_image)
+        return versions
+
+    def create_index(self, column: str) -> SecondaryIndex:
+        """在列上创建二级索引，并为现有行的所有可达版本建立索引项"""
+        index = self.secondary_indexes.get(column)
+        if index is None:
+            index = SecondaryIndex(column)
+            with self.index_latch:
+                index.add_many((row_id, data)
+                               for row_id in self.row_ids
+                               for data in self._reachable_versions(self.rows[row_id]))
+                self.secondary_indexes[column] = index
+        return index
+
+    def refresh_index_entries(self, row_id: int):
+        """purge回收Undo日志或事务回滚后，删除不再可达的版本对应的索引项（调用方持有该行的行闩锁）"""
+        if not self.secondary_indexes:
+            return
+        row = self.rows.get(row_id)
+        if row is None:
+            return
+        versions = self._reachable_versions(row)
+        with self.index_latch:
+            for index in self.secondary_indexes.values():
+                index.retain(row_id, versions)
+
+    def index_lookup(self, read_view: ReadView, column: str, low: Any = None, high: Any = None,
+                     limit: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        通过二级索引查找列值在[low, high]内、对ReadView可见的行
+        索引项可能来自历史版本，需要读取可见版本后重新校验列值
+        """
+        index = self.secondary_indexes[column]
+        undo_logs = self.undo_log_manager.undo_logs
+        with self.index_latch:
+            candidates = index.candidates(low, high)
+        count = 0
+        for row_id in candidates:
+            if limit is not None and count >= limit:
+                break
+            version_chain = self.version_chains.get(row_id)
+            if version_chain is None:
+                continue
+            with self.row_latch(row_id):
+                data = version_chain.get_visible_version(read_view, undo_logs)
+            if data is not None and index.matches(data, low, high):
+                count += 1
+                yield row_id, data
 
     def get_row(self, row_id: int) -> Optional[DataRow]:
         """获取行"""
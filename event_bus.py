@@ -0,0 +1,113 @@
+"""
+InnoDB MVCC 事件推送模块
+将事务与数据操作事件推送给订阅的客户端，支持断线后按序列号续传
+"""
+import json
+import queue
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Any, Optional, Set, Tuple
+
+
+class Subscriber:
+    """
+    事件订阅者
+
+    每个订阅者持有一个有界队列：客户端消费过慢导致队列写满时，
+    后续事件直接丢弃并标记为落后，待队列消费完后发送一次resync事件，
+    由客户端按自己的序列号重新拉取增量状态
+    notify不为None时每次投递后调用（在发布者线程中），异步消费者借此唤醒，不必阻塞在get上
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue: 'queue.Queue[str]' = queue.Queue(maxsize=queue_size)
+        self.lagging = False
+        self.dropped = 0  # 因背压丢弃的事件数
+        self.notify: Optional[Callable[[], None]] = None
+
+    def offer(self, message: str):
+        """投递事件，队列已满时不阻塞发布者"""
+        if self.lagging:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.lagging = True
+            self.dropped += 1
+        if self.notify is not None:
+            self.notify()
+
+    def get(self, timeout: float) -> Optional[str]:
+        """获取下一条待发送的消息，超时返回None（timeout为0时不等待）"""
+        if self.lagging and self.queue.empty():
+            self.lagging = False
+            return EventBus.format_message(None, {'type': 'resync'})
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """
+    事件总线
+
+    - 每个事件带有操作前后的变更序列号 (since, seq)，以及该操作产生的增量状态
+    - 最近的事件保存在有界缓冲区中，客户端重连时从其序列号之后续传
+    - 没有订阅者时不构造事件，缓冲区因此可能出现断档，断档前的序列号无法续传
+    """
+
+    def __init__(self, buffer_size: int = 1000, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.buffer: Deque[Tuple[int, int, str]] = deque(maxlen=buffer_size)  # (since, seq, message)
+        self.subscribers: Set[Subscriber] = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def format_message(seq: Optional[int], event: Dict[str, Any]) -> str:
+        """格式化为SSE消息"""
+        lines = []
+        if seq is not None:
+            lines.append(f'id: {seq}')
+        lines.append('event: mvcc')
+        lines.append('data: ' + json.dumps(event, ensure_ascii=False))
+        return '\n'.join(lines) + '\n\n'
+
+    def has_subscribers(self) -> bool:
+        """是否有订阅者"""
+        return bool(self.subscribers)
+
+    def publish(self, since: int, seq: int, event: Dict[str, Any]):
+        """发布事件：序列化一次，投递给所有订阅者"""
+        message = self.format_message(seq, event)
+        with self.lock:
+            if self.buffer and self.buffer[-1][1] != since:
+                # 与缓冲区中最后一个事件不连续，之前的事件已无法用于续传
+                self.buffer.clear()
+            self.buffer.append((since, seq, message))
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(message)
+
+    def subscribe(self, since: Optional[int], current_seq: int) -> Subscriber:
+        """
+        新增订阅者
+        since不为空时补发该序列号之后的事件；缓冲区无法覆盖时先发送resync事件
+        """
+        subscriber = Subscriber(self.queue_size)
+        with self.lock:
+            if since is not None and since != current_seq:
+                if self.buffer and self.buffer[0][0] <= since and self.buffer[-1][1] == current_seq:
+                    for _, seq, message in self.buffer:
+                        if seq > since:
+                            subscriber.offer(message)
+                else:
+                    subscriber.lagging = True
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """移除订阅者"""
+        with self.lock:
+            self.subscribers.discard(subscriber)
@@ -0,0 +1,176 @@
+"""
+InnoDB MVCC 并发控制模块
+提供ID分配器、有序ID索引、读写闩锁与分段闩锁，使MVCCSystem可以在多线程WSGI服务器中使用
+"""
+import threading
+from bisect import bisect_right, insort
+from typing import Container, Iterable, Iterator, Optional
+
+
+class IdAllocator:
+    """
+    单调递增的ID分配器
+    由MVCCSystem实例持有，不同实例（以及重置后）的ID互不影响
+    """
+
+    __slots__ = ('_next_id', '_lock')
+
+    def __init__(self, start: int = 1):
+        self._next_id = start
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        """原子地分配下一个ID"""
+        with self._lock:
+            value = self._next_id
+            self._next_id += 1
+            return value
+
+    def restore(self, next_id: int):
+        """恢复快照时设置下一个将要分配的ID"""
+        with self._lock:
+            self._next_id = next_id
+
+    @property
+    def next_id(self) -> int:
+        """下一个将要分配的ID（不分配）"""
+        return self._next_id
+
+
+class SortedIdIndex:
+    """
+    线程安全的有序ID索引，用于按ID游标分页
+    ID由IdAllocator单调分配，通常直接追加在末尾；删除只计数，已删除的ID暂留在索引中由遍历方跳过，
+    已删除的数量超过一半时按仍存在的ID重建，均摊下来每次删除为O(1)（purge从最早的ID开始回收，逐个删除需要移动整个列表）
+    """
+
+    __slots__ = ('ids', 'removed', '_lock')
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self.ids = sorted(ids)
+        self.removed = 0  # 上次重建以来删除的ID数
+        self._lock = threading.Lock()
+
+    def add(self, id_: int):
+        """加入一个ID"""
+        with self._lock:
+            if not self.ids or self.ids[-1] < id_:
+                self.ids.append(id_)
+            else:
+                insort(self.ids, id_)
+
+    def discard(self, count: int, live: Container[int]):
+        """记录删除了count个ID；累计超过一半时只保留仍在live中的ID"""
+        with self._lock:
+            self.removed += count
+            if self.removed > len(self.ids) // 2:
+                self.ids = [id_ for id_ in self.ids if id_ in live]
+                self.removed = 0
+
+    def iter_after(self, after: Optional[int] = None) -> Iterator[int]:
+        """
+        按顺序遍历大于after的ID（可能包含已删除的ID，由调用方跳过）
+        每次从上一个ID之后重新定位，遍历过程中加入、删除或重建索引都不会错位
+        """
+        ids = self.ids
+        index = 0 if after is None else bisect_right(ids, after)
+        while index < len(ids):
+            id_ = ids[index]
+            yield id_
+            ids = self.ids
+            index = bisect_right(ids, id_)
+
+
+class RWLatch:
+    """
+    读写闩锁（写优先）
+
+    - 共享模式：单个事务的DML与读取，彼此可以并发
+    - 排他模式：需要一致视图或批量修改多行的操作（全量/增量状态、purge、建索引、重置）
+    有排他请求等待时，新的共享请求也会等待，避免状态查询被持续的DML饿死。
+    不可重入：持有共享模式时不能再次申请
+
+    shared() / exclusive()返回预先构造的上下文对象，热路径上不为每次加锁分配对象
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+        self._shared_guard = _LatchGuard(self.acquire_shared, self.release_shared)
+        self._exclusive_guard = _LatchGuard(self.acquire_exclusive, self.release_exclusive)
+
+    def acquire_shared(self):
+        """以共享模式获取闩锁"""
+        with self._lock:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_shared(self):
+        """释放共享模式"""
+        with self._lock:
+            self._readers -= 1
+            if not self._readers and self._waiting_writers:
+                self._cond.notify_all()
+
+    def acquire_exclusive(self):
+        """以排他模式获取闩锁"""
+        with self._lock:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_exclusive(self):
+        """释放排他模式"""
+        with self._lock:
+            self._writer = False
+            self._cond.notify_all()
+
+    def shared(self) -> '_LatchGuard':
+        """以共享模式持有闩锁的上下文"""
+        return self._shared_guard
+
+    def exclusive(self) -> '_LatchGuard':
+        """以排他模式持有闩锁的上下文"""
+        return self._exclusive_guard
+
+
+class _LatchGuard:
+    """RWLatch的上下文对象，只保存加锁与解锁函数，可被多个线程同时使用"""
+
+    __slots__ = ('_acquire', '_release')
+
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._release()
+
+
+class StripedLatch:
+    """
+    分段闩锁
+    按ID的哈希映射到固定数量（2的幂）的互斥锁上，不必为每一行或每个事务单独创建锁对象。
+    同一时刻一个线程最多持有一个分段，因此不同ID映射到同一分段也不会死锁
+    """
+
+    __slots__ = ('_latches', '_mask')
+
+    def __init__(self, stripes: int = 64):
+        if stripes <= 0 or stripes & (stripes - 1):
+            raise ValueError('stripes must be a power of two')
+        self._latches = [threading.Lock() for _ in range(stripes)]
+        self._mask = stripes - 1
+
+    def __call__(self, key) -> threading.Lock:
+        """获取key对应的闩锁"""
+        return self._latches[hash(key) & self._mask]
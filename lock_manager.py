@@ -0,0 +1,264 @@
+"""
+InnoDB MVCC 行锁管理模块
+实现行级排他锁、按FIFO顺序排队的锁等待、锁等待超时以及基于等待图的死锁检测
+"""
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+
+class LockStatus(Enum):
+    """加锁结果"""
+    GRANTED = "granted"
+    TIMEOUT = "timeout"  # 锁等待超时（timeout为0时表示不等待，冲突即返回）
+    DEADLOCK = "deadlock"  # 被选为死锁牺牲者，调用方需要回滚该事务
+    WAITING = "waiting"  # 不阻塞的加锁：已进入等待队列，调用方稍后以相同参数重试
+
+
+class _LockWaiter:
+    """一次锁等待"""
+
+    __slots__ = ('trx_id', 'row_id', 'status', 'cond', 'start', 'deadline')
+
+    def __init__(self, trx_id: int, row_id: int, mutex: threading.Lock, timeout: float):
+        self.trx_id = trx_id
+        self.row_id = row_id
+        self.status: Optional[LockStatus] = None  # 被授予锁或被选为牺牲者后设置
+        self.cond = threading.Condition(mutex)
+        self.start = time.perf_counter()
+        self.deadline = time.monotonic() + timeout
+
+
+class _RowLock:
+    """一行上的排他锁及其等待队列"""
+
+    __slots__ = ('owner', 'waiters')
+
+    def __init__(self, owner: int):
+        self.owner = owner
+        self.waiters: Deque[_LockWaiter] = deque()
+
+
+class LockManager:
+    """
+    行锁管理器
+
+    InnoDB语义：
+    - UPDATE / DELETE在修改行之前对该行加排他锁，锁持有到事务提交或回滚
+    - INSERT的新行使用隐式锁：行的trx_id是活跃事务时，该行被这个事务隐式锁定；
+      其他事务请求该行时先把隐式锁转换为显式锁，再排队等待
+    - 冲突时按FIFO顺序排队等待，超过等待时间返回超时，事务本身不回滚
+    - 每次进入等待前沿等待图（事务 -> 等待的行 -> 持有者）查找环，
+      发现死锁时选择权重（Undo日志数 + 持有锁数）最小、其次最年轻的事务作为牺牲者
+
+    不阻塞的加锁（block=False，供不能在线程中等待的调用方使用）：冲突时同样进入等待队列并检测死锁，
+    但立即返回WAITING；调用方之后以相同参数重试，得到授予、死锁或超过timeout后的超时结果，
+    重试不算新的锁等待
+    """
+
+    def __init__(self, implicit_owner: Callable[[int, int], Optional[int]],
+                 trx_weight: Callable[[int], int]):
+        # implicit_owner(row_id, trx_id): 除trx_id外隐式锁定该行的活跃事务ID
+        self.implicit_owner = implicit_owner
+        self.trx_weight = trx_weight  # 事务已产生的Undo日志数
+        self.mutex = threading.Lock()
+        self.locks: Dict[int, _RowLock] = {}  # row_id -> 行锁
+        self.trx_locks: Dict[int, Set[int]] = {}  # trx_id -> 持有锁的row_id集合
+        self.waiting: Dict[int, _LockWaiter] = {}  # trx_id -> 正在进行的锁等待
+        self.parked: Dict[int, _LockWaiter] = {}  # trx_id -> 不阻塞的加锁留下、结果尚未被取走的锁等待
+        # 锁等待指标
+        self.lock_waits = 0  # 因冲突需要等待（或不等待直接失败）的次数
+        self.lock_wait_timeouts = 0
+        self.deadlocks = 0
+        self.lock_wait_time_us_total = 0
+        self.lock_wait_time_us_max = 0
+        # 锁状态版本：get_status的结果变化时递增（锁等待不产生数据变更，不体现在变更日志的序列号中）
+        self.version = 0
+
+    def acquire(self, trx_id: int, row_id: int, timeout: float,
+                block: bool = True) -> Tuple[LockStatus, Optional[int]]:
+        """
+        为事务获取行的排他锁
+        返回 (加锁结果, 冲突时阻塞该事务的持有者事务ID)
+        block为False时不在本线程中等待，冲突时返回WAITING（见类说明）
+        """
+        with self.mutex:
+            parked = self.parked.get(trx_id)
+            if parked is not None:
+                if parked.row_id == row_id:
+                    return self._poll_parked(parked)
+                # 调用方放弃了之前的等待，转而请求另一行
+                self._cancel_parked(parked)
+
+            lock = self.locks.get(row_id)
+            if lock is None:
+                owner = self.implicit_owner(row_id, trx_id)
+                if owner is None:
+                    self._grant(trx_id, row_id)
+                    return LockStatus.GRANTED, None
+                # 隐式锁转换为显式锁，由持有者在结束时释放
+                lock = self._grant(owner, row_id)
+            if lock.owner == trx_id:
+                return LockStatus.GRANTED, None
+
+            blocker = lock.owner
+            self.lock_waits += 1
+            self.version += 1
+            if timeout <= 0:
+                self.lock_wait_timeouts += 1
+                return LockStatus.TIMEOUT, blocker
+
+            waiter = _LockWaiter(trx_id, row_id, self.mutex, timeout)
+            lock.waiters.append(waiter)
+            self.waiting[trx_id] = waiter
+            if not block:
+                self.parked[trx_id] = waiter
+
+            victim = self._find_deadlock_victim(trx_id)
+            if victim is not None:
+                self.deadlocks += 1
+                victim_waiter = self.waiting[victim]
+                self._cancel_wait(victim_waiter)
+                victim_waiter.status = LockStatus.DEADLOCK
+                victim_waiter.cond.notify()
+                if victim == trx_id:
+                    self.parked.pop(trx_id, None)
+                    return LockStatus.DEADLOCK, blocker
+            if not block:
+                return LockStatus.WAITING, blocker
+
+            while waiter.status is None:
+                remaining = waiter.deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                waiter.cond.wait(remaining)
+            self._record_wait(waiter.start)
+
+            if waiter.status is None:
+                self._cancel_wait(waiter)
+                self.lock_wait_timeouts += 1
+                lock = self.locks.get(row_id)
+                return LockStatus.TIMEOUT, lock.owner if lock else blocker
+            return waiter.status, None if waiter.status == LockStatus.GRANTED else blocker
+
+    def _poll_parked(self, waiter: _LockWaiter) -> Tuple[LockStatus, Optional[int]]:
+        """不阻塞的加锁重试：返回之前进入队列的等待的结果，仍在等待且未超时时返回WAITING"""
+        lock = self.locks.get(waiter.row_id)
+        owner = lock.owner if lock else None
+        if waiter.status is None:
+            if time.monotonic() < waiter.deadline:
+                return LockStatus.WAITING, owner
+            self._cancel_parked(waiter)
+            return LockStatus.TIMEOUT, owner
+        del self.parked[waiter.trx_id]
+        self._record_wait(waiter.start)
+        return waiter.status, None if waiter.status == LockStatus.GRANTED else owner
+
+    def _cancel_parked(self, waiter: _LockWaiter):
+        """放弃不阻塞的加锁留下的等待，记为一次锁等待超时"""
+        del self.parked[waiter.trx_id]
+        self._record_wait(waiter.start)
+        if waiter.status is None:
+            self._cancel_wait(waiter)
+            self.lock_wait_timeouts += 1
+
+    def release_all(self, trx_id: int):
+        """事务结束时释放其持有的全部行锁，按FIFO顺序把锁授予下一个等待者"""
+        with self.mutex:
+            if trx_id in self.trx_locks or trx_id in self.waiting:
+                self.version += 1
+            self.parked.pop(trx_id, None)
+            waiter = self.waiting.get(trx_id)
+            if waiter is not None:
+                # 事务在等待期间被其他线程结束，唤醒等待线程让其立即返回
+                self._cancel_wait(waiter)
+                waiter.status = LockStatus.TIMEOUT
+                waiter.cond.notify()
+            for row_id in self.trx_locks.pop(trx_id, ()):
+                lock = self.locks.get(row_id)
+                if lock is None or lock.owner != trx_id:
+                    continue
+                if lock.waiters:
+                    next_waiter = lock.waiters.popleft()
+                    del self.waiting[next_waiter.trx_id]
+                    lock.owner = next_waiter.trx_id
+                    self.trx_locks.setdefault(next_waiter.trx_id, set()).add(row_id)
+                    next_waiter.status = LockStatus.GRANTED
+                    next_waiter.cond.notify()
+                else:
+                    del self.locks[row_id]
+
+    def grant(self, trx_id: int, row_id: int):
+        """直接授予行锁（恢复快照时使用，调用方保证该行没有被其他事务锁定）"""
+        with self.mutex:
+            self._grant(trx_id, row_id)
+
+    def _grant(self, trx_id: int, row_id: int) -> _RowLock:
+        lock = _RowLock(trx_id)
+        self.locks[row_id] = lock
+        self.version += 1
+        self.trx_locks.setdefault(trx_id, set()).add(row_id)
+        return lock
+
+    def _cancel_wait(self, waiter: _LockWaiter):
+        """把等待者从等待队列中移除"""
+        self.version += 1
+        self.waiting.pop(waiter.trx_id, None)
+        lock = self.locks.get(waiter.row_id)
+        if lock is not None:
+            try:
+                lock.waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def _find_deadlock_victim(self, trx_id: int) -> Optional[int]:
+        """
+        从刚进入等待的事务出发沿等待图查找环
+        排他锁只有一个持有者，等待图从每个事务出发最多一条边，沿路径走即可
+        """
+        cycle: List[int] = [trx_id]
+        visited = {trx_id}
+        current = trx_id
+        while True:
+            waiter = self.waiting.get(current)
+            if waiter is None:
+                return None
+            lock = self.locks.get(waiter.row_id)
+            if lock is None:
+                return None
+            current = lock.owner
+            if current == trx_id:
+                break
+            if current in visited:
+                return None  # 环不经过trx_id，在其形成时已经处理过
+            visited.add(current)
+            cycle.append(current)
+        return min(cycle, key=lambda t: (self.trx_weight(t) + len(self.trx_locks.get(t, ())), -t))
+
+    def _record_wait(self, start: float):
+        waited_us = int((time.perf_counter() - start) * 1_000_000)
+        self.version += 1
+        self.lock_wait_time_us_total += waited_us
+        if waited_us > self.lock_wait_time_us_max:
+            self.lock_wait_time_us_max = waited_us
+
+    def get_status(self) -> Dict:
+        """获取行锁与锁等待指标"""
+        with self.mutex:
+            waits = self.lock_waits
+            return {
+                'row_locks': len(self.locks),
+                'waiting': [
+                    {'trx_id': waiter.trx_id, 'row_id': waiter.row_id,
+                     'blocking_trx_id': self.locks[waiter.row_id].owner if waiter.row_id in self.locks else None}
+                    for waiter in self.waiting.values()
+                ],
+                'lock_waits': waits,
+                'lock_wait_timeouts': self.lock_wait_timeouts,
+                'deadlocks': self.deadlocks,
+                'lock_wait_time_us_total': self.lock_wait_time_us_total,
+                'lock_wait_time_us_max': self.lock_wait_time_us_max,
+                'lock_wait_time_us_avg': self.lock_wait_time_us_total // waits if waits else 0
+            }
@@ -0,0 +1,168 @@
+"""
+InnoDB MVCC 监控指标模块
+进程内的计数器与直方图，由 /metrics 接口以Prometheus文本格式导出
+
+热路径上的记录开销：
+- 带标签的指标在定义时或首次使用时绑定标签，热路径直接持有绑定后的对象，不再查找或拼接标签
+- inc / observe 只在短暂持有的锁内做加法与一次二分查找，不创建新对象
+- 活跃事务数、History List长度等状态量不在热路径维护，导出时由收集函数现场计算
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# (标签值序列, 取值)
+Sample = Tuple[Tuple[str, ...], float]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class CounterValue:
+    """一组标签取值下的计数器"""
+
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self.lock:
+            self.value += amount
+
+
+class HistogramValue:
+    """一组标签取值下的直方图：每个桶的计数（最后一个为+Inf）与观测值之和"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)  # 桶的上界包含等于的值（le）
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Metric:
+    """
+    指标（计数器或直方图）
+    没有标签时直接调用inc / observe；有标签时通过labels取得绑定后的值对象并在热路径上持有它
+    """
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = ()):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values: str):
+        """取得（不存在时创建）一组标签取值对应的值对象"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}')
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.get(values)
+                if child is None:
+                    child = CounterValue() if self.kind == 'counter' else HistogramValue(self.buckets)
+                    self.children[values] = child
+        return child
+
+    def inc(self, amount: int = 1):
+        self._default.inc(amount)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self.children.items()):
+            labels = list(zip(self.labelnames, values))
+            if self.kind == 'counter':
+                lines.append(f'{self.name}{_format_labels(labels)} {child.value}')
+                continue
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*child.buckets, float('inf')), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_number(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_number(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """指标注册表：计数器与直方图，以及导出时现场计算状态量的收集函数"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        # 收集函数返回 (名称, 说明, 标签名, [(标签值, 取值)])，以gauge类型导出
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, Sequence[str], List[Sample]]]]] = []
+        self.lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing  # 模块重复导入时复用已注册的指标
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register(Metric('counter', name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float],
+                  labelnames: Sequence[str] = ()) -> Metric:
+        return self._register(Metric('histogram', name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, Sequence[str], List[Sample]]]]):
+        with self.lock:
+            self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        lines: List[str] = []
+        for collector in list(self.collectors):
+            for name, documentation, labelnames, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} gauge')
+                for values, value in samples:
+                    lines.append(f'{name}{_format_labels(list(zip(labelnames, values)))} {_format_number(value)}')
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return repr(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in labels) + '}'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
@@ -2,267 +2,1116 @@
 InnoDB MVCC 可视化系统主模块
 整合所有组件，提供统一的API接口
 """
-from transaction import TransactionManager, Transaction, ReadView
-from undo_log import UndoLogManager
-from data_row import DataRowManager
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from bisect import bisect_right
+from itertools import islice
+from transaction import TransactionManager, Transaction, TransactionStatus, ReadView
+from undo_log import UndoLogManager, UndoLog, apply_delta
+from data_row import DataRowManager, DataRow, VersionChain
+from purge import PurgeSystem
+from change_journal import ChangeJournal
+from event_bus import EventBus
+from latch import IdAllocator, RWLatch, SortedIdIndex, StripedLatch
+from lock_manager import LockManager, LockStatus
+import snapshot
+import metrics
+from redo_log import (RedoLog, REDO_BEGIN, REDO_INSERT, REDO_UPDATE, REDO_DELETE, REDO_COMMIT,
+                      REDO_ROLLBACK, REDO_PURGE, REDO_CREATE_INDEX)
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+STATE_VERSION = 2  # capture_state输出格式的版本
+DEFAULT_LOCK_WAIT_TIMEOUT = 10.0  # 行锁等待超时（秒），InnoDB默认50秒，演示环境缩短为10秒
+
+READ_VIEWS_CREATED = metrics.counter(
+    'mvcc_read_views_created_total', 'ReadViews created, by isolation level', labelnames=('isolation_level',))
+_READ_VIEWS_RC = READ_VIEWS_CREATED.labels('READ_COMMITTED')
+_READ_VIEWS_RR = READ_VIEWS_CREATED.labels('REPEATABLE_READ')
+ROLLBACK_DURATION = metrics.histogram(
+    'mvcc_rollback_duration_seconds', 'Time spent rolling back a transaction',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
 
 
 class MVCCSystem:
-    """MVCC系统主类"""
+    """
+    MVCC系统主类
+
+    并发模型（可在多线程WSGI服务器中共享一个实例）：
+    - 事务ID、行ID、Undo日志ID由本实例持有的ID分配器原子分配
+    - latch: 系统状态闩锁。单个事务的DML与读取以共享模式持有，彼此并发；
+      全量/增量状态、purge、建索引与重置以排他模式持有，看到一致的状态
+    - trx_latch: 事务闩锁，同一事务的操作串行执行（提交/回滚不会与该事务的DML交错）
+    - 事务系统闩锁（TransactionManager.latch）：事务开始/结束与ReadView快照
+    - 行闩锁（DataRowManager.row_latch）：修改行及其Undo链、沿Undo链回溯读取
+    获取顺序：状态闩锁 -> 事务闩锁 -> 行闩锁 -> 索引闩锁 / 事务系统闩锁
+
+    行锁（LockManager）与闩锁不同，持有到事务结束：UPDATE / DELETE先在不持有任何闩锁时获取行锁，
+    锁等待期间不阻塞状态查询、purge以及持有者自身的提交/回滚
+
+    持久化（通过MVCCSystem.open启用）：事务开始/结束、DML、purge与建索引在闩锁内追加Redo记录，
+    同一行的记录顺序由行锁保证与执行顺序一致；提交在释放闩锁后等待组提交落盘
+    """
+
+    def __init__(self, auto_purge: bool = False, purge_batch_size: int = 300,
+                 trx_history_size: Optional[int] = 1000, journal_capacity: int = 10000,
+                 lock_wait_timeout: float = DEFAULT_LOCK_WAIT_TIMEOUT, operation_history_size: Optional[int] = 100,
+                 trace_operations: bool = False):
+        # ID分配器归本实例所有，重置时随实例一起重新创建
+        self.trx_id_allocator = IdAllocator()
+        self.row_id_allocator = IdAllocator()
+        self.undo_id_allocator = IdAllocator()
+        # 全局变更序列号与变更日志，供增量状态查询使用
+        self.journal = ChangeJournal(journal_capacity)
+        self.transaction_manager = TransactionManager(trx_history_size, self.journal, self.trx_id_allocator,
+                                                      operation_history_size)
+        self.undo_log_manager = UndoLogManager(self.journal, self.undo_id_allocator)
+        self.data_row_manager = DataRowManager(self.undo_log_manager, self.row_id_allocator)
+        self.purge_system = PurgeSystem(self.transaction_manager, self.undo_log_manager,
+                                        self.data_row_manager, purge_batch_size)
+        self.lock_manager = LockManager(self._implicit_lock_owner, self._trx_weight)
+        # 行锁等待超时（秒），0表示冲突时不等待
+        self.lock_wait_timeout = lock_wait_timeout
+        # 操作历史中是否保留读取返回的数据，默认只记录是否可见，避免读多的事务保存大量数据副本
+        self.trace_operations = trace_operations
+        self.redo_log: Optional[RedoLog] = None
+        self.event_bus = EventBus()
+        self.latch = RWLatch()
+        self.trx_latch = StripedLatch()
+        self._batch = threading.local()  # 当前线程批量执行期间合并事件，结束后统一推送
+        self._published_seq = 0  # 最近一次推送事件时的序列号，事件之间首尾相接
+        # 自动purge：每次提交后执行一轮有预算的purge
+        # 默认关闭，便于教学演示时观察完整的Undo日志链
+        self.auto_purge = auto_purge
+
+    def _get_active_transaction(self, trx_id: int) -> Optional[Transaction]:
+        """获取活跃事务（调用方持有该事务的事务闩锁）"""
+        trx = self.transaction_manager.get_transaction(trx_id)
+        return trx if trx and trx.is_active() else None
+
+    def _log(self, record: tuple) -> int:
+        """追加一条Redo记录（未启用Redo日志时忽略），返回记录末尾的LSN"""
+        return self.redo_log.append(record) if self.redo_log is not None else 0
 
-    def __init__(self):
-        self.transaction_manager = TransactionManager()
-        self.undo_log_manager = UndoLogManager()
-        self.data_row_manager = DataRowManager(self.undo_log_manager)
+    def _implicit_lock_owner(self, row_id: int, trx_id: int) -> Optional[int]:
+        """行的DB_TRX_ID是其他活跃事务时，该行被这个事务隐式锁定（未提交的INSERT）"""
+        row = self.data_row_manager.get_row(row_id)
+        if row is None or row.trx_id is None or row.trx_id == trx_id:
+            return None
+        owner = self.transaction_manager.get_transaction(row.trx_id)
+        return row.trx_id if owner and owner.is_active() else None
+
+    def _trx_weight(self, trx_id: int) -> int:
+        """死锁牺牲者的权重：事务已产生的Undo日志数，回滚代价越小越优先被选中"""
+        trx = self.transaction_manager.get_transaction(trx_id)
+        return len(trx.undo_segment) if trx else 0
+
+    def _lock_row(self, trx_id: int, row_id: int, lock_wait_timeout: Optional[float],
+                  block: bool = True) -> Optional[Dict]:
+        """
+        修改行之前获取该行的排他锁（调用方不持有任何闩锁）
+        成功返回None；失败返回错误结果，被选为死锁牺牲者时整个事务已经回滚
+        block为False时不阻塞等待：仍在锁等待队列中时返回带lock_waiting的结果，调用方稍后以相同参数重试
+        """
+        if not self._get_active_transaction(trx_id):
+            return {'success': False, 'error': 'Transaction not active'}
+        if self.data_row_manager.get_row(row_id) is None:
+            return None  # 行不存在，由后续的修改返回失败
+
+        if lock_wait_timeout is None:
+            lock_wait_timeout = self.lock_wait_timeout
+        status, blocking_trx_id = self.lock_manager.acquire(trx_id, row_id, lock_wait_timeout, block)
+        if status == LockStatus.GRANTED:
+            return None
+        if status == LockStatus.WAITING:
+            return {'success': False, 'row_id': row_id, 'blocking_trx_id': blocking_trx_id, 'lock_waiting': True,
+                    'error': 'Waiting for row lock; retry the same request'}
+        if status == LockStatus.DEADLOCK:
+            self.rollback_transaction(trx_id)
+            return {'success': False, 'row_id': row_id, 'deadlock': True,
+                    'error': 'Deadlock found when trying to get lock; transaction rolled back'}
+        return {'success': False, 'row_id': row_id, 'blocking_trx_id': blocking_trx_id,
+                'error': 'Lock wait timeout exceeded; try restarting transaction'}
 
     def begin_transaction(self, isolation_level: str = "READ_COMMITTED") -> Dict:
         """开启事务"""
-        trx = self.transaction_manager.begin_transaction(isolation_level)
-        return trx.to_dict()
+        since = self.journal.seq
+        with self.latch.shared():
+            trx = self.transaction_manager.begin_transaction(isolation_level)
+            self._log((REDO_BEGIN, trx.trx_id, isolation_level, trx.start_time_us))
+            result = trx.to_dict()
+        self._publish('begin', since, trx_id=trx.trx_id)
+        return result
 
     def commit_transaction(self, trx_id: int) -> Dict:
         """提交事务"""
-        success = self.transaction_manager.commit_transaction(trx_id)
+        since = self.journal.seq
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self.transaction_manager.get_transaction(trx_id)
+            success = self.transaction_manager.commit_transaction(trx_id)
+            if success:
+                trx.undo_segment.clear()
+                self.purge_system.add_committed_transaction(trx)
+                # 提交记录在释放行锁之前追加，之后修改这些行的事务的记录一定排在它后面
+                lsn = self._log((REDO_COMMIT, trx_id, trx.commit_time_us))
+                self.lock_manager.release_all(trx_id)
+        if success:
+            if self.redo_log is not None:
+                # 不持有闩锁等待落盘，同时提交的事务共用一次fsync
+                self.redo_log.flush(lsn)
+                if self.redo_log.checkpoint_due():
+                    self.checkpoint()
+            if self.auto_purge:
+                with self.latch.exclusive():
+                    self.purge_system.run()
+            self._publish('commit', since, trx_id=trx_id)
         return {'success': success, 'trx_id': trx_id}
 
     def rollback_transaction(self, trx_id: int) -> Dict:
-        """回滚事务"""
-        trx = self.transaction_manager.get_transaction(trx_id)
-        if not trx or not trx.is_active():
-            return {'success': False, 'error': 'Transaction not active'}
+        """
+        回滚事务
+        按逆序重放事务自身的回滚段，耗时只与该事务的修改量有关
+        """
+        since = self.journal.seq
+        started = time.perf_counter()
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self._get_active_transaction(trx_id)
+            if not trx:
+                return {'success': False, 'error': 'Transaction not active'}
 
-        # 回滚该事务的所有修改
-        for row_id in trx.modified_rows:
-            self._rollback_row_changes(trx_id, row_id)
+            row_latch = self.data_row_manager.row_latch
+            # 回滚该事务的所有修改（从最新到最早）
+            touched_rows = set()
+            interleaved_rows = set()  # 回滚的Undo日志不在链头（其他事务之后也修改过该行）
+            for undo_id in reversed(trx.undo_segment):
+                undo_log = self.undo_log_manager.get_undo_log(undo_id)
+                if undo_log is None:
+                    continue
+                with row_latch(undo_log.row_id):
+                    row = self.data_row_manager.get_row(undo_log.row_id)
+                    if row is None or row.roll_pointer != undo_id:
+                        interleaved_rows.add(undo_log.row_id)
+                    self._apply_undo(undo_log)
+                touched_rows.add(undo_log.row_id)
+            trx.undo_segment.clear()
 
-        success = self.transaction_manager.rollback_transaction(trx_id)
+            for row_id in touched_rows:
+                with row_latch(row_id):
+                    row = self.data_row_manager.get_row(row_id)
+                    roll_pointer = row.roll_pointer if row else None
+                    self._restore_row_header(row_id)
+                    # 回滚写入的版本已不可达，删除其索引项（每行只在全部Undo日志应用后刷新一次）
+                    self.data_row_manager.refresh_index_entries(row_id)
+                    if row is not None and row.roll_pointer != roll_pointer:
+                        interleaved_rows.add(row_id)  # Undo链被重新接上
+                    if row_id in interleaved_rows:
+                        # 增量作用在了其他事务写入的数据上，或Undo链被重新接上，剩余Undo日志重建出的完整镜像随之改变
+                        for undo_id in self.undo_log_manager.row_undo_chains.get(row_id, ()):
+                            self.journal.record('undo_log', undo_id)
+
+            success = self.transaction_manager.rollback_transaction(trx_id)
+            self._log((REDO_ROLLBACK, trx_id))
+            self.lock_manager.release_all(trx_id)
+        ROLLBACK_DURATION.observe(time.perf_counter() - started)
+        self._publish('rollback', since, trx_id=trx_id)
         return {'success': success, 'trx_id': trx_id}
 
-    def _rollback_row_changes(self, trx_id: int, row_id: int):
-        """回滚某行的该事务的所有修改"""
+    def _apply_undo(self, undo_log):
+        """应用一条Undo日志，撤销其对应的修改并删除该Undo日志（调用方持有该行的行闩锁）"""
+        row_id = undo_log.row_id
         row = self.data_row_manager.get_row(row_id)
-        if not row:
-            return
 
-        # 收集该事务对这一行的所有Undo日志
-        trx_undo_logs = []
-        if row_id in self.undo_log_manager.row_undo_chains:
-            undo_ids = self.undo_log_manager.row_undo_chains[row_id]
-            for undo_id in undo_ids:
-                undo_log = self.undo_log_manager.get_undo_log(undo_id)
-                if undo_log and undo_log.trx_id == trx_id:
-                    trx_undo_logs.append(undo_log)
+        if undo_log.log_type.value == 'INSERT':
+            # INSERT操作回滚：完全删除该行及其版本链
+            self.data_row_manager.remove_row(row_id)
+
+        elif row is None:
+            # 该行已不存在（例如已被回滚的插入），只需删除Undo日志
+            pass
+
+        elif undo_log.log_type.value == 'UPDATE':
+            # UPDATE操作回滚：将增量中的旧值应用回当前数据
+            row.data = apply_delta(row.data, undo_log.delta or {})
+            row.trx_id = undo_log.trx_id
+            row.roll_pointer = undo_log.roll_pointer
 
-        # 如果没有该事务的Undo日志，不需要回滚
-        if not trx_undo_logs:
+        elif undo_log.log_type.value == 'DELETE':
+            # DELETE操作回滚：恢复删除标记（DELETE不修改列数据）
+            row.deleted = False
+            row.trx_id = undo_log.trx_id
+            row.roll_pointer = undo_log.roll_pointer
+
+        self.undo_log_manager.remove_undo_log(undo_log.undo_id)
+        if row is not None:
+            self.data_row_manager.mark_row_changed(row)
+
+    def _restore_row_header(self, row_id: int):
+        """
+        回滚完成后，根据该行最新的Undo日志恢复行的trx_id与roll_pointer（调用方持有该行的行闩锁）
+        行数据已由_apply_undo逐条应用增量恢复
+        """
+        row = self.data_row_manager.get_row(row_id)
+        if not row or row_id not in self.undo_log_manager.row_undo_chains:
             return
 
-        # 按undo_id降序排列（从最新到最早）
-        trx_undo_logs.sort(key=lambda x: x.undo_id, reverse=True)
-
-        # 逐个回滚该事务的所有操作
-        for undo_log in trx_undo_logs:
-            if undo_log.log_type.value == 'INSERT':
-                # INSERT操作回滚：完全删除该行及其版本链
-                self.data_row_manager.rows.pop(row_id, None)
-                # 完全删除版本链
-                self.data_row_manager.version_chains.pop(row_id, None)
-                # 删除该事务的所有Undo日志
-                for log in trx_undo_logs:
-                    self._remove_undo_log(log.undo_id)
-                return  # INSERT回滚后，该行不存在，直接返回
-
-            elif undo_log.log_type.value == 'UPDATE':
-                # UPDATE操作回滚：恢复旧值
-                if undo_log.old_value:
-                    row.data = undo_log.old_value.copy()
-                    row.trx_id = undo_log.trx_id
-                    row.roll_pointer = undo_log.roll_pointer
-                    # 从版本链中移除该版本
-                    if row_id in self.data_row_manager.version_chains:
-                        version_chain = self.data_row_manager.version_chains[row_id]
-                        if version_chain.versions:
-                            # 移除该事务创建的版本
-                            version_chain.versions = [
-                                v for v in version_chain.versions
-                                if v.get('trx_id') != trx_id
-                            ]
-                    # 删除该Undo日志
-                    self._remove_undo_log(undo_log.undo_id)
-
-            elif undo_log.log_type.value == 'DELETE':
-                # DELETE操作回滚：恢复删除标记
-                row.deleted = False
-                if undo_log.old_value:
-                    row.data = undo_log.old_value.copy()
-                row.trx_id = undo_log.trx_id
-                row.roll_pointer = undo_log.roll_pointer
-                # 删除该Undo日志
-                self._remove_undo_log(undo_log.undo_id)
-
-        # 回滚完成后，需要找到该行最后一个非该事务的Undo日志，更新row的状态
-        if row_id in self.undo_log_manager.row_undo_chains:
-            remaining_undo_ids = self.undo_log_manager.row_undo_chains[row_id]
-            if remaining_undo_ids:
-                # 找到最新的Undo日志
-                latest_undo_id = max(remaining_undo_ids)
-                latest_undo = self.undo_log_manager.get_undo_log(latest_undo_id)
-                if latest_undo:
-                    row.trx_id = latest_undo.trx_id
-                    row.roll_pointer = latest_undo_id
-                    # 恢复到最新Undo日志的新值
-                    if latest_undo.new_value:
-                        row.data = latest_undo.new_value.copy()
-            else:
-                # 没有剩余的Undo日志，说明该行应该被删除
-                self.data_row_manager.rows.pop(row_id, None)
-                self.data_row_manager.version_chains.pop(row_id, None)
-
-    def _cleanup_undo_logs(self, row_id: int):
-        """清理某行的所有Undo日志"""
-        if row_id in self.undo_log_manager.row_undo_chains:
-            undo_ids = self.undo_log_manager.row_undo_chains[row_id].copy()
-            for undo_id in undo_ids:
-                self.undo_log_manager.undo_logs.pop(undo_id, None)
-            self.undo_log_manager.row_undo_chains.pop(row_id, None)
-
-    def _remove_undo_log(self, undo_id: int):
-        """删除指定的Undo日志"""
-        if undo_id in self.undo_log_manager.undo_logs:
-            undo_log = self.undo_log_manager.undo_logs[undo_id]
-            row_id = undo_log.row_id
-            # 从undo_logs中删除
-            self.undo_log_manager.undo_logs.pop(undo_id, None)
-            # 从row_undo_chains中删除
-            if row_id in self.undo_log_manager.row_undo_chains:
-                if undo_id in self.undo_log_manager.row_undo_chains[row_id]:
-                    self.undo_log_manager.row_undo_chains[row_id].remove(undo_id)
+        latest_undo_id = self.undo_log_manager.get_latest_undo_id(row_id)
+        if latest_undo_id is not None:
+            latest_undo = self.undo_log_manager.get_undo_log(latest_undo_id)
+            if latest_undo and (row.trx_id != latest_undo.trx_id or row.roll_pointer != latest_undo_id):
+                row.trx_id = latest_undo.trx_id
+                row.roll_pointer = latest_undo_id
+                self.data_row_manager.mark_row_changed(row)
+        else:
+            # 没有剩余的Undo日志，说明该行应该被删除
+            self.data_row_manager.remove_row(row_id)
 
     def insert_data(self, trx_id: int, data: Dict[str, Any]) -> Dict:
         """插入数据"""
-        trx = self.transaction_manager.get_transaction(trx_id)
-        if not trx or not trx.is_active():
-            return {'success': False, 'error': 'Transaction not active'}
+        since = self.journal.seq
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self._get_active_transaction(trx_id)
+            if not trx:
+                return {'success': False, 'error': 'Transaction not active'}
 
-        row = self.data_row_manager.insert_row(trx_id, data)
-        trx.add_operation('INSERT', row.row_id, {'data': data})
-        return {'success': True, 'row_id': row.row_id, 'row': row.to_dict()}
+            # 新行的DB_TRX_ID即为本事务，由隐式锁保护，无需显式加锁
+            row, undo_id = self.data_row_manager.insert_row(trx_id, data)
+            self._log((REDO_INSERT, trx_id, row.row_id, undo_id, data, row.update_time_us))
+            # 本次操作创建的Undo日志加入事务的回滚段
+            trx.add_undo(undo_id)
+            trx.add_operation('INSERT', row.row_id, {'data': data})
+            self.journal.record('transaction', trx_id)
+            result = {'success': True, 'row_id': row.row_id, 'row': row.to_dict()}
+        self._publish('insert', since, trx_id=trx_id, row_id=row.row_id)
+        return result
 
-    def update_data(self, trx_id: int, row_id: int, data: Dict[str, Any]) -> Dict:
-        """更新数据"""
-        trx = self.transaction_manager.get_transaction(trx_id)
-        if not trx or not trx.is_active():
-            return {'success': False, 'error': 'Transaction not active'}
+    def update_data(self, trx_id: int, row_id: int, data: Dict[str, Any],
+                    lock_wait_timeout: Optional[float] = None, block: bool = True) -> Dict:
+        """
+        更新数据
+        先获取行的排他锁，被其他活跃事务锁定时最多等待lock_wait_timeout秒（None使用系统设置）
+        block为False时不在本线程中等待行锁（见_lock_row）
+        """
+        since = self.journal.seq
+        error = self._lock_row(trx_id, row_id, lock_wait_timeout, block)
+        if error:
+            return error
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self._get_active_transaction(trx_id)
+            if not trx:
+                # 等待行锁期间事务已经结束，释放刚获得的锁
+                self.lock_manager.release_all(trx_id)
+                return {'success': False, 'error': 'Transaction not active'}
 
-        # 获取旧数据
-        row = self.data_row_manager.get_row(row_id)
-        old_data = row.data.copy() if row else None
+            # 获取旧数据
+            row = self.data_row_manager.get_row(row_id)
+            old_data = row.data.copy() if row else None
 
-        success = self.data_row_manager.update_row(trx_id, row_id, data)
+            undo_id = self.data_row_manager.update_row(trx_id, row_id, data)
+            success = undo_id is not None
+            if success:
+                self._log((REDO_UPDATE, trx_id, row_id, undo_id, data, row.update_time_us))
+                trx.add_undo(undo_id)
+                trx.add_operation('UPDATE', row_id, {'old_data': old_data, 'new_data': data})
+                self.journal.record('transaction', trx_id)
         if success:
-            trx.add_operation('UPDATE', row_id, {'old_data': old_data, 'new_data': data})
+            self._publish('update', since, trx_id=trx_id, row_id=row_id)
         return {'success': success, 'row_id': row_id}
 
-    def delete_data(self, trx_id: int, row_id: int) -> Dict:
-        """删除数据"""
-        trx = self.transaction_manager.get_transaction(trx_id)
-        if not trx or not trx.is_active():
-            return {'success': False, 'error': 'Transaction not active'}
+    def delete_data(self, trx_id: int, row_id: int, lock_wait_timeout: Optional[float] = None,
+                    block: bool = True) -> Dict:
+        """删除数据（加锁方式与update_data相同）"""
+        since = self.journal.seq
+        error = self._lock_row(trx_id, row_id, lock_wait_timeout, block)
+        if error:
+            return error
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self._get_active_transaction(trx_id)
+            if not trx:
+                self.lock_manager.release_all(trx_id)
+                return {'success': False, 'error': 'Transaction not active'}
 
-        # 获取被删除的数据
-        row = self.data_row_manager.get_row(row_id)
-        deleted_data = row.data.copy() if row else None
+            # 获取被删除的数据
+            row = self.data_row_manager.get_row(row_id)
+            deleted_data = row.data.copy() if row else None
 
-        success = self.data_row_manager.delete_row(trx_id, row_id)
+            undo_id = self.data_row_manager.delete_row(trx_id, row_id)
+            success = undo_id is not None
+            if success:
+                self._log((REDO_DELETE, trx_id, row_id, undo_id, row.update_time_us))
+                trx.add_undo(undo_id)
+                trx.add_operation('DELETE', row_id, {'deleted_data': deleted_data})
+                self.journal.record('transaction', trx_id)
         if success:
-            trx.add_operation('DELETE', row_id, {'deleted_data': deleted_data})
+            self._publish('delete', since, trx_id=trx_id, row_id=row_id)
         return {'success': success, 'row_id': row_id}
 
+    def _get_read_view(self, trx: Transaction) -> ReadView:
+        """
+        获取事务本次读取使用的ReadView（调用方持有该事务的事务闩锁）
+        - READ COMMITTED：每次读取都创建新的ReadView
+        - REPEATABLE READ：第一次读取时创建ReadView，之后复用
+        """
+        if trx.isolation_level == "READ_COMMITTED":
+            _READ_VIEWS_RC.inc()
+            return self.transaction_manager.create_read_view(trx.trx_id)
+
+        if not trx.read_view:
+            _READ_VIEWS_RR.inc()
+            trx.read_view = self.transaction_manager.create_read_view(trx.trx_id)
+        return trx.read_view
+
+    def _read_details(self, data: Optional[Dict]) -> Dict:
+        """READ操作记录的详情，只有开启trace_operations时才包含读取到的数据"""
+        if self.trace_operations:
+            return {'visible': data is not None, 'data': data}
+        return {'visible': data is not None}
+
     def read_data(self, trx_id: int, row_id: int) -> Dict:
         """读取数据"""
-        trx = self.transaction_manager.get_transaction(trx_id)
-        if not trx or not trx.is_active():
-            return {'success': False, 'error': 'Transaction not active'}
+        since = self.journal.seq
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self._get_active_transaction(trx_id)
+            if not trx:
+                return {'success': False, 'error': 'Transaction not active'}
 
-        # 对于READ COMMITTED隔离级别，每次读取都需要创建新的ReadView
-        if trx.isolation_level == "READ_COMMITTED":
-            active_trx_ids = self.transaction_manager.get_active_trx_ids()
-            # 使用Transaction._next_trx_id作为max_trx_id
-            from transaction import Transaction
-            current_read_view = ReadView(trx.trx_id, active_trx_ids, Transaction._next_trx_id)
-            data = self.data_row_manager.read_row(row_id, current_read_view)
-        else:
-            # 对于REPEATABLE READ，第一次读取时创建ReadView，之后复用
-            if not trx.read_view:
-                active_trx_ids = self.transaction_manager.get_active_trx_ids()
-                from transaction import Transaction
-                trx.read_view = ReadView(trx.trx_id, active_trx_ids, Transaction._next_trx_id)
-            data = self.data_row_manager.read_row(row_id, trx.read_view)
-
-        trx.add_operation('READ', row_id, {'visible': data is not None, 'data': data})
+            data = self.data_row_manager.read_row(row_id, self._get_read_view(trx))
+
+            trx.add_operation('READ', row_id, self._read_details(data))
+            self.journal.record('transaction', trx_id)
+        self._publish('read', since, trx_id=trx_id, row_id=row_id)
         return {'success': True, 'data': data}
 
     def read_data_with_path(self, trx_id: int, row_id: int) -> Dict:
         """读取数据并返回读取路径"""
-        trx = self.transaction_manager.get_transaction(trx_id)
-        if not trx or not trx.is_active():
-            return {'success': False, 'error': 'Transaction not active'}
+        since = self.journal.seq
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self._get_active_transaction(trx_id)
+            if not trx:
+                return {'success': False, 'error': 'Transaction not active'}
 
-        # 对于READ COMMITTED隔离级别，每次读取都需要创建新的ReadView
-        if trx.isolation_level == "READ_COMMITTED":
-            active_trx_ids = self.transaction_manager.get_active_trx_ids()
-            # 使用Transaction._next_trx_id作为max_trx_id
-            from transaction import Transaction
-            current_read_view = ReadView(trx.trx_id, active_trx_ids, Transaction._next_trx_id)
-            data, path = self.data_row_manager.read_row_with_path(row_id, current_read_view)
-        else:
-            # 对于REPEATABLE READ，第一次读取时创建ReadView，之后复用
-            if not trx.read_view:
-                active_trx_ids = self.transaction_manager.get_active_trx_ids()
-                from transaction import Transaction
-                trx.read_view = ReadView(trx.trx_id, active_trx_ids, Transaction._next_trx_id)
-            data, path = self.data_row_manager.read_row_with_path(row_id, trx.read_view)
-
-        trx.add_operation('READ', row_id, {'visible': data is not None, 'data': data})
+            data, path = self.data_row_manager.read_row_with_path(row_id, self._get_read_view(trx))
+
+            trx.add_operation('READ', row_id, self._read_details(data))
+            self.journal.record('transaction', trx_id)
+        self._publish('read', since, trx_id=trx_id, row_id=row_id)
         return {'success': True, 'data': data, 'path': path}
 
+    def scan(self, trx_id: int, start_row_id: Optional[int] = None,
+             end_row_id: Optional[int] = None, limit: Optional[int] = None) -> Dict:
+        """
+        快照范围扫描：用同一个ReadView按row_id顺序读取[start_row_id, end_row_id]内所有可见的行
+        返回结果中的rows是生成器，逐行产出 {'row_id', 'data'}，大表不会一次性物化
+        生成器在返回后才被消费，此时不再持有状态闩锁，只在读取每一行时持有该行的行闩锁；
+        扫描使用的ReadView登记到事务管理器，直到生成器结束或被关闭（包括未读完即被丢弃），
+        期间purge不会回收它需要的版本（READ COMMITTED的ReadView不保存在事务上，事务也可能在扫描期间提交）
+        """
+        since = self.journal.seq
+        transaction_manager = self.transaction_manager
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self._get_active_transaction(trx_id)
+            if not trx:
+                return {'success': False, 'error': 'Transaction not active'}
+
+            read_view = self._get_read_view(trx)
+            # 在状态闩锁内登记，purge（排他模式）要么在扫描开始之前完成，要么看到这个ReadView
+            token = transaction_manager.register_read_view(read_view)
+            trx.add_operation('SCAN', start_row_id, {
+                'start_row_id': start_row_id, 'end_row_id': end_row_id, 'limit': limit
+            })
+            self.journal.record('transaction', trx_id)
+        self._publish('read', since, trx_id=trx_id)
+
+        def generate():
+            try:
+                yield None  # 预先启动：生成器停在try之内，之后无论读完、关闭还是被回收都会执行finally
+                for row_id, data in self.data_row_manager.scan_rows(read_view, start_row_id, end_row_id, limit):
+                    yield {'row_id': row_id, 'data': data}
+            finally:
+                transaction_manager.unregister_read_view(token)
+
+        rows = generate()
+        next(rows)
+        return {'success': True, 'read_view': read_view.to_dict(), 'rows': rows}
+
+    def create_index(self, column: str) -> Dict:
+        """在数据行的列上创建二级索引"""
+        if not column:
+            return {'success': False, 'error': 'Column required'}
+        with self.latch.exclusive():
+            index = self.data_row_manager.create_index(column)
+            self._log((REDO_CREATE_INDEX, column))
+            return {'success': True, 'index': index.to_dict()}
+
+    def get_indexes(self) -> List[Dict]:
+        """获取所有二级索引"""
+        with self.latch.shared():
+            return [index.to_dict() for index in self.data_row_manager.secondary_indexes.values()]
+
+    def index_lookup(self, trx_id: int, column: str, low: Any = None, high: Any = None,
+                     limit: Optional[int] = None) -> Dict:
+        """
+        通过二级索引查找列值在[low, high]内的可见行（low == high时为等值查询）
+        候选行经Undo链取得可见版本后重新校验列值
+        """
+        since = self.journal.seq
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self._get_active_transaction(trx_id)
+            if not trx:
+                return {'success': False, 'error': 'Transaction not active'}
+            if column not in self.data_row_manager.secondary_indexes:
+                return {'success': False, 'error': f'No index on column: {column}'}
+
+            read_view = self._get_read_view(trx)
+            rows = [
+                {'row_id': row_id, 'data': data}
+                for row_id, data in self.data_row_manager.index_lookup(read_view, column, low, high, limit)
+            ]
+            trx.add_operation('INDEX_LOOKUP', None, {
+                'column': column, 'low': low, 'high': high, 'row_ids': [row['row_id'] for row in rows]
+            })
+            self.journal.record('transaction', trx_id)
+        self._publish('read', since, trx_id=trx_id)
+        return {'success': True, 'rows': rows}
+
+    def execute_batch(self, operations: List[Dict[str, Any]], stop_on_error: bool = True,
+                      lock_wait: bool = True) -> Dict:
+        """
+        批量执行MVCC操作
+
+        每个操作为一个字典，op取值：begin / commit / rollback / insert / update / delete / read / read_with_path
+        - 事务与数据行既可以用trx_id / row_id直接指定，
+          也可以引用本批次中begin / insert时用as命名的事务或数据行（trx / row字段）
+        - stop_on_error为True时遇到第一个失败的操作即停止，其余操作不再执行
+        - update / delete遇到行锁冲突时默认不等待（批次在一个线程内顺序执行，
+          等待本批次中其他事务持有的锁只会等到超时），可用lock_wait_timeout字段指定等待时间；
+          lock_wait为False时（调用方的线程不能阻塞）忽略lock_wait_timeout，冲突时一律不等待
+        整个批次结束后只推送一次batch事件
+        """
+        since = self.journal.seq
+        names: Dict[str, Dict[str, int]] = {'trx': {}, 'row': {}}
+        results = []
+        self._batch.active = True
+        try:
+            for index, operation in enumerate(operations):
+                if not lock_wait and operation.get('lock_wait_timeout'):
+                    operation = dict(operation, lock_wait_timeout=0)
+                result = self.execute_operation(operation, names)
+                result['index'] = index
+                results.append(result)
+                if stop_on_error and not result['success']:
+                    break
+        finally:
+            self._batch.active = False
+
+        self._publish('batch', since)
+        return {
+            'success': len(results) == len(operations) and all(r['success'] for r in results),
+            'executed': len(results),
+            'results': results
+        }
+
+    def execute_operation(self, operation: Dict[str, Any], names: Dict[str, Dict[str, int]]) -> Dict:
+        """
+        执行单个批量格式的操作（批量执行与场景回放共用）
+        names为 {'trx': {名称: trx_id}, 'row': {名称: row_id}}，操作成功时记录其中用as命名的事务与数据行
+        """
+        op = operation.get('op')
+        handler = self._BATCH_HANDLERS.get(op)
+        if handler is None:
+            return {'op': op, 'success': False, 'error': f'Unknown operation: {op}'}
+
+        trx_id = operation.get('trx_id')
+        if 'trx' in operation:
+            trx_id = names['trx'].get(operation['trx'])
+        row_id = operation.get('row_id')
+        if 'row' in operation:
+            row_id = names['row'].get(operation['row'])
+
+        result = handler(self, operation, trx_id, row_id)
+        result.setdefault('success', True)
+        result['op'] = op
+
+        # 记录本批次中命名的事务与数据行，供后续操作引用
+        alias = operation.get('as')
+        if alias is not None and result['success']:
+            if op == 'begin':
+                names['trx'][alias] = result['trx_id']
+            elif op == 'insert':
+                names['row'][alias] = result['row_id']
+        return result
+
+    _BATCH_HANDLERS = {
+        'begin': lambda self, op, trx_id, row_id: self.begin_transaction(
+            op.get('isolation_level', 'READ_COMMITTED')),
+        'commit': lambda self, op, trx_id, row_id: self.commit_transaction(trx_id),
+        'rollback': lambda self, op, trx_id, row_id: self.rollback_transaction(trx_id),
+        'insert': lambda self, op, trx_id, row_id: self.insert_data(trx_id, op.get('data', {})),
+        'update': lambda self, op, trx_id, row_id: self.update_data(
+            trx_id, row_id, op.get('data', {}), op.get('lock_wait_timeout', 0)),
+        'delete': lambda self, op, trx_id, row_id: self.delete_data(
+            trx_id, row_id, op.get('lock_wait_timeout', 0)),
+        'read': lambda self, op, trx_id, row_id: self.read_data(trx_id, row_id),
+        'read_with_path': lambda self, op, trx_id, row_id: self.read_data_with_path(trx_id, row_id),
+    }
+
     def get_system_state(self) -> Dict:
         """获取系统完整状态"""
+        with self.latch.exclusive():
+            return self._get_system_state()
+
+    def _get_system_state(self) -> Dict:
+        """获取系统完整状态（调用方以排他模式持有状态闩锁）"""
         return {
             'transactions': self.transaction_manager.get_all_transactions(),
             'rows': self.data_row_manager.get_all_rows(),
-            'undo_logs': self.undo_log_manager.get_all_undo_logs(),
-            'version_chains': self.data_row_manager.get_all_version_chains()
+            'undo_logs': self.undo_log_manager.get_all_undo_logs(self.data_row_manager.rows),
+            'version_chains': self.data_row_manager.get_all_version_chains(),
+            'purge': self.purge_system.get_status(),
+            'locks': self.lock_manager.get_status(),
+            'seq': self.journal.seq
         }
 
+    def get_state_delta(self, since: int) -> Dict:
+        """
+        获取since序列号之后的增量状态
+        每类实体分为created / changed / removed；版本链随数据行一起返回
+        变更日志已不包含since之后的全部记录时，退回全量状态并标记full
+        """
+        with self.latch.exclusive():
+            return self._get_state_delta(since)
+
+    def _get_state_delta(self, since: int) -> Dict:
+        """获取since序列号之后的增量状态（调用方以排他模式持有状态闩锁）"""
+        if not self.journal.covers(since):
+            state = self._get_system_state()
+            state['full'] = True
+            return state
+
+        seq = self.journal.seq
+        delta = {
+            kind: {'created': [], 'changed': [], 'removed': []}
+            for kind in ('transactions', 'rows', 'undo_logs', 'version_chains')
+        }
+        for (kind, entity_id), created in self.journal.changes_since(since).items():
+            if kind == 'transaction':
+                entity = self.transaction_manager.get_transaction(entity_id)
+                buckets = [(delta['transactions'], entity)]
+            elif kind == 'row':
+                entity = self.data_row_manager.get_row(entity_id)
+                buckets = [(delta['rows'], entity),
+                           (delta['version_chains'], self.data_row_manager.version_chains.get(entity_id))]
+            else:
+                entity = self.undo_log_manager.get_undo_log(entity_id)
+                buckets = [(delta['undo_logs'], entity)]
+
+            if entity is None:
+                # 在此期间创建又被删除的实体，客户端从未见过，无需返回
+                if not created:
+                    for bucket, _ in buckets:
+                        bucket['removed'].append(entity_id)
+                continue
+            if kind == 'undo_log':
+                # Undo日志只保存增量，完整镜像需要从所属行的当前数据回溯重建
+                row = self.data_row_manager.get_row(entity.row_id)
+                delta['undo_logs']['created' if created else 'changed'].append(
+                    self.undo_log_manager.undo_log_to_dict(entity, row))
+                continue
+            for bucket, item in buckets:
+                if item is not None:
+                    bucket['created' if created else 'changed'].append(item.to_dict())
+
+        delta['purge'] = self.purge_system.get_status()
+        delta['locks'] = self.lock_manager.get_status()
+        delta['seq'] = seq
+        delta['since'] = since
+        delta['full'] = False
+        return delta
+
+    def purge(self, batch_size: Optional[int] = None) -> Dict:
+        """执行一轮purge，回收不再被任何ReadView需要的Undo日志"""
+        since = self.journal.seq
+        with self.latch.exclusive():
+            result = self.purge_system.run(batch_size)
+        self._publish('purge', since)
+        result['success'] = True
+        return result
+
+    def get_lock_status(self) -> Dict:
+        """获取行锁、锁等待与死锁统计"""
+        return self.lock_manager.get_status()
+
+    def get_display_roll_pointer(self, internal_roll_pointer: Optional[int]) -> Optional[int]:
+        """
+        获取用于展示的DB_ROLL_PTR值
+
+        InnoDB语义：DB_ROLL_PTR指向上一个版本
+        - INSERT后：显示NULL（没有上一个版本）
+        - UPDATE后：显示上一个版本的Undo日志ID
+        内部实现中row.roll_pointer指向当前版本的Undo日志
+        """
+        if internal_roll_pointer is None:
+            return None
+
+        # 获取当前roll_pointer指向的Undo日志
+        undo_log = self.undo_log_manager.get_undo_log(internal_roll_pointer)
+        if not undo_log:
+            return None
+
+        # 如果是INSERT类型，显示NULL（因为INSERT没有上一个版本）
+        if undo_log.log_type.value == 'INSERT':
+            return None
+
+        # 如果是UPDATE/DELETE类型，显示Undo日志的roll_pointer（指向上一个版本）
+        return undo_log.roll_pointer
+
+    def add_display_roll_pointers(self, state: Dict):
+        """为全量或增量状态中的数据行补充display_roll_pointer字段"""
+        if state.get('full', True):
+            rows = state['rows']
+        else:
+            rows = state['rows']['created'] + state['rows']['changed']
+        for row in rows:
+            row['display_roll_pointer'] = self.get_display_roll_pointer(row['roll_pointer'])
+
+    def _publish(self, event_type: str, since: int, **info):
+        """
+        向事件订阅者推送一次操作产生的变更
+        没有订阅者或该操作未改变状态时不构造事件
+
+        多个线程的操作可能交错完成，事件统一在排他闩锁内按顺序构造：
+        每个事件从上一个事件的序列号开始，首尾相接，不依赖各操作自己的since
+        """
+        if getattr(self._batch, 'active', False) or self.journal.seq == since:
+            return
+        if not self.event_bus.has_subscribers():
+            self._published_seq = max(self._published_seq, self.journal.seq)
+            return
+
+        with self.latch.exclusive():
+            since = self._published_seq
+            seq = self.journal.seq
+            if seq == since:
+                return  # 其他线程的事件已经包含了这次变更
+            delta = self._get_state_delta(since)
+            self.add_display_roll_pointers(delta)
+            self._published_seq = seq
+            event = {'type': event_type, 'since': since, 'seq': seq, 'delta': delta}
+            event.update(info)
+            self.event_bus.publish(since, seq, event)
+
     def get_transaction_info(self, trx_id: int) -> Optional[Dict]:
         """获取事务详细信息"""
-        trx = self.transaction_manager.get_transaction(trx_id)
-        return trx.to_dict() if trx else None
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self.transaction_manager.get_transaction(trx_id)
+            return trx.to_dict() if trx else None
+
+    def get_transaction_operations(self, trx_id: int, offset: Optional[int] = None,
+                                   limit: int = 50) -> Optional[Dict]:
+        """分页获取事务的操作历史（见Transaction.operations_page），事务不存在时返回None"""
+        with self.latch.shared(), self.trx_latch(trx_id):
+            trx = self.transaction_manager.get_transaction(trx_id)
+            return trx.operations_page(offset, limit) if trx else None
 
     def get_row_info(self, row_id: int) -> Optional[Dict]:
         """获取数据行详细信息"""
-        row = self.data_row_manager.get_row(row_id)
-        if not row:
-            return None
+        with self.latch.shared(), self.data_row_manager.row_latch(row_id):
+            row = self.data_row_manager.get_row(row_id)
+            if not row:
+                return None
 
-        return {
-            'row': row.to_dict(),
-            'version_chain': self.data_row_manager.get_version_chain(row_id),
-            'undo_chain': self.undo_log_manager.get_undo_chain_dict(row_id)
-        }
+            return {
+                'row': row.to_dict(),
+                'version_chain': self.data_row_manager.get_version_chain(row_id),
+                'undo_chain': self.undo_log_manager.get_undo_chain_dict(row)
+            }
+
+    def list_rows(self, after: Optional[int] = None, start_row_id: Optional[int] = None,
+                  end_row_id: Optional[int] = None, changed_since: Optional[int] = None,
+                  version_chains: bool = False) -> Dict:
+        """
+        按row_id顺序列出数据行（分页接口使用）
+        - after为游标：上一页最后一行的row_id；[start_row_id, end_row_id]为row_id范围
+        - changed_since不为None时只列出该序列号之后变更过的行；变更日志已不包含之后的全部记录时忽略该条件并标记full
+        - seq为开始列出时的序列号，可作为下一次的changed_since（期间变更的行可能在下一次再次出现）
+        返回结果中的rows是生成器，逐行产出行的字典（含display_roll_pointer，version_chains为True时附带版本链）；
+        与scan相同，生成器在返回后才被消费，只在产出每一行时持有状态闩锁（共享模式）与该行的行闩锁
+        """
+        seq = self.journal.seq
+        full = changed_since is not None and not self.journal.covers(changed_since)
+        if full:
+            changed_since = None
+        if after is not None:
+            start_row_id = after + 1 if start_row_id is None else max(after + 1, start_row_id)
+        data_row_manager = self.data_row_manager
+        journal = self.journal
+
+        def generate():
+            for row_id in data_row_manager.iter_row_ids(start_row_id, end_row_id):
+                if changed_since is not None and journal.version('row', row_id) <= changed_since:
+                    continue
+                with self.latch.shared(), data_row_manager.row_latch(row_id):
+                    row = data_row_manager.get_row(row_id)
+                    if row is None:
+                        continue
+                    item = row.to_dict()
+                    item['display_roll_pointer'] = self.get_display_roll_pointer(row.roll_pointer)
+                    if version_chains:
+                        item['version_chain'] = data_row_manager.get_version_chain(row_id)
+                yield item
+
+        return {'success': True, 'seq': seq, 'full': full, 'rows': generate()}
+
+    def list_transactions(self, after: Optional[int] = None, statuses: Optional[List[str]] = None) -> Dict:
+        """
+        按trx_id顺序列出事务（分页接口使用）
+        after为游标：上一页最后一个事务的trx_id；statuses为要列出的状态（active / committed / aborted），为空时不筛选
+        返回结果中的transactions是生成器，逐个产出事务的字典，只在产出每个事务时持有该事务的事务闩锁
+        """
+        valid = {status.value for status in TransactionStatus}
+        for status in statuses or ():
+            if status not in valid:
+                return {'success': False, 'error': f'Unknown transaction status: {status}'}
+        transaction_manager = self.transaction_manager
+
+        def generate():
+            for trx_id in transaction_manager.trx_ids.iter_after(after):
+                with self.latch.shared(), self.trx_latch(trx_id):
+                    trx = transaction_manager.get_transaction(trx_id)
+                    if trx is None or (statuses and trx.status.value not in statuses):
+                        continue
+                    item = trx.to_dict()
+                yield item
+
+        return {'success': True, 'seq': self.journal.seq, 'transactions': generate()}
+
+    def list_undo_logs(self, after: Optional[int] = None, trx_id: Optional[int] = None,
+                       row_id: Optional[int] = None) -> Dict:
+        """
+        按undo_id顺序列出Undo日志（分页接口使用，old_value / new_value为重建的完整镜像）
+        after为游标：上一页最后一条Undo日志的undo_id；trx_id / row_id只列出该事务产生的、该行Undo链上的Undo日志
+        活跃事务的回滚段即为其全部Undo日志，直接按回滚段列出；已结束事务的Undo日志按trx_id筛选
+        返回结果中的undo_logs是生成器，只在产出每条Undo日志时持有所属行的行闩锁
+        """
+        undo_log_manager = self.undo_log_manager
+        data_row_manager = self.data_row_manager
+        # 行的Undo链与事务的回滚段都按创建顺序（即undo_id升序）排列，只需定位游标；其余情况遍历有序的undo_id索引
+        undo_ids: Iterable[int]
+        with self.latch.shared():
+            if row_id is not None:
+                chain = list(undo_log_manager.row_undo_chains.get(row_id, ()))
+                undo_ids = islice(chain, 0 if after is None else bisect_right(chain, after), None)
+            elif trx_id is not None and trx_id in self.transaction_manager.active_transactions:
+                with self.trx_latch(trx_id):
+                    trx = self.transaction_manager.get_transaction(trx_id)
+                    segment = list(trx.undo_segment) if trx is not None else []
+                undo_ids = islice(segment, 0 if after is None else bisect_right(segment, after), None)
+            else:
+                undo_ids = undo_log_manager.undo_ids.iter_after(after)
+
+        def generate():
+            images_cache: Dict = {}
+            for undo_id in undo_ids:
+                undo_log = undo_log_manager.get_undo_log(undo_id)
+                if undo_log is None or (trx_id is not None and undo_log.trx_id != trx_id):
+                    continue
+                with self.latch.shared(), data_row_manager.row_latch(undo_log.row_id):
+                    if undo_log_manager.get_undo_log(undo_id) is None:
+                        continue  # 等待闩锁期间已被purge或回滚
+                    item = undo_log_manager.undo_log_to_dict(
+                        undo_log, data_row_manager.get_row(undo_log.row_id), images_cache)
+                yield item
+
+        return {'success': True, 'seq': self.journal.seq, 'undo_logs': generate()}
+
+    def get_state_version(self) -> str:
+        """
+        全局状态版本，不变时get_system_state / get_state_delta的结果不变
+        由变更日志实例、变更序列号与锁状态版本组成，只读取计数器，不加闩锁
+        """
+        return f'{self.journal.epoch}-{self.journal.seq}.{self.lock_manager.version}'
+
+    def get_entity_version(self, kind: str, entity_id: int) -> Optional[str]:
+        """
+        事务（kind为'transaction'）或数据行（'row'）的版本，不变时get_transaction_info / get_row_info的结果不变
+        数据行的版本随其Undo链的变化（回滚、purge）一起推进；实体不存在时返回None
+        """
+        entities = self.transaction_manager.transactions if kind == 'transaction' else self.data_row_manager.rows
+        if entity_id not in entities:
+            return None
+        return f'{self.journal.epoch}-{self.journal.version(kind, entity_id)}'
 
     def reset(self):
-        """重置系统"""
-        # 重置所有ID计数器
-        from transaction import Transaction
-        from data_row import DataRow
-        from undo_log import UndoLog
-
-        Transaction._next_trx_id = 1
-        DataRow._next_row_id = 1
-        UndoLog._next_undo_id = 1
-
-        # 重新初始化系统
-        self.__init__()
+        """
+        重置系统
+        重新初始化时ID分配器随之重建，所有ID从1开始重新分配
+        """
+        with self.latch.exclusive():
+            # 保留配置以及二级索引定义，二级索引重置后为空索引
+            config = self._config()
+            index_columns = list(self.data_row_manager.secondary_indexes)
+            self._reinitialize(MVCCSystem(*config))
+            for column in index_columns:
+                self.data_row_manager.create_index(column)
+            self._after_reinitialize()
+
+    def load_snapshot(self, data: bytes) -> Dict:
+        """
+        用export_snapshot导出的快照替换当前系统的全部状态（包括配置、ID计数器与二级索引）
+        先在闩锁之外由快照完整构建一个新系统，成功后才替换当前状态；快照无效时当前状态保持不变
+        """
+        try:
+            loaded = MVCCSystem.import_snapshot(data)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        except (KeyError, IndexError, TypeError) as e:
+            return {'success': False, 'error': f'Invalid snapshot content: {e!r}'}
+        with self.latch.exclusive():
+            self._reinitialize(loaded)
+            self._after_reinitialize()
+            return {'success': True, 'seq': self.journal.seq, 'rows': len(self.data_row_manager.rows),
+                    'undo_logs': len(self.undo_log_manager.undo_logs)}
+
+    def _config(self) -> Tuple:
+        """构造参数（重置与快照保留的配置），顺序与__init__的参数一致"""
+        return (self.auto_purge, self.purge_system.batch_size, self.transaction_manager.history_size,
+                self.journal.entries.maxlen, self.lock_wait_timeout,
+                self.transaction_manager.operation_history_size, self.trace_operations)
+
+    def _reinitialize(self, system: 'MVCCSystem'):
+        """
+        换用system（新创建或由快照恢复的系统）的全部状态（调用方以排他模式持有状态闩锁）
+        事件订阅者、闩锁与Redo日志保留；序列号继续递增，之前的增量请求会退回全量状态
+        """
+        seq = self.journal.seq
+        event_bus, redo_log = self.event_bus, self.redo_log
+        latch, trx_latch, batch = self.latch, self.trx_latch, self._batch
+        self.__dict__.update(system.__dict__)
+        self.journal.seq = max(self.journal.seq, seq)
+        self.event_bus, self.redo_log = event_bus, redo_log
+        self.latch, self.trx_latch, self._batch = latch, trx_latch, batch
+        # 行锁管理器的回调绑定在创建它的系统上，改为绑定本系统
+        self.lock_manager.implicit_owner = self._implicit_lock_owner
+        self.lock_manager.trx_weight = self._trx_weight
+
+    def _after_reinitialize(self):
+        """重置或导入快照后推进序列号、写检查点并通知订阅者全量刷新"""
+        seq = self.journal.seq
+        self.journal.seq = seq + 1
+        self._published_seq = self.journal.seq
+        if self.redo_log is not None:
+            # 以新的状态写检查点，之前的Redo日志随之截断
+            self._attach_redo_log(self.redo_log)
+            self.redo_log.write_checkpoint(self.capture_state())
+        if self.event_bus.has_subscribers():
+            self.event_bus.publish(seq, self.journal.seq,
+                                   {'type': 'reset', 'since': seq, 'seq': self.journal.seq, 'full': True})
+
+    def export_snapshot(self) -> bytes:
+        """导出全部状态为紧凑的二进制快照（格式见snapshot模块）"""
+        with self.latch.exclusive():
+            return snapshot.encode_state(self.capture_state())
+
+    @classmethod
+    def import_snapshot(cls, data: bytes) -> 'MVCCSystem':
+        """由export_snapshot导出的快照创建新的系统，格式不符时抛出ValueError"""
+        return cls.restore_state(snapshot.decode_state(data))
+
+    def capture_state(self) -> Tuple:
+        """
+        把系统状态转换为只包含基本类型的元组（快照与检查点使用，调用方以排他模式持有状态闩锁）
+        派生结构（版本链、有序row_id索引、二级索引项）不保存，恢复时重建
+        """
+        transaction_manager = self.transaction_manager
+        undo_log_manager = self.undo_log_manager
+        purge_system = self.purge_system
+        lock_manager = self.lock_manager
+
+        config = self._config()
+        allocators = (self.trx_id_allocator.next_id, self.row_id_allocator.next_id, self.undo_id_allocator.next_id)
+        transactions = tuple(
+            tuple(trx.to_tuple() for trx in group)
+            for group in (transaction_manager.active_transactions.values(),
+                          transaction_manager.committed_transactions,
+                          transaction_manager.aborted_transactions)
+        )
+        rows = tuple(row.to_tuple() for row in self.data_row_manager.rows.values())
+        undo_logs = tuple(undo_log.to_tuple() for undo_log in undo_log_manager.undo_logs.values())
+        undo_chains = tuple((row_id, tuple(chain)) for row_id, chain in undo_log_manager.row_undo_chains.items())
+        purge = (tuple((trx_id, tuple(row_ids)) for trx_id, row_ids in purge_system.history_list),
+                 purge_system.purged_undo_count, purge_system.purged_row_count)
+        locks = (tuple((row_id, lock.owner) for row_id, lock in lock_manager.locks.items()),
+                 (lock_manager.lock_waits, lock_manager.lock_wait_timeouts, lock_manager.deadlocks,
+                  lock_manager.lock_wait_time_us_total, lock_manager.lock_wait_time_us_max))
+        indexes = tuple(self.data_row_manager.secondary_indexes)
+
+        return (STATE_VERSION, config, allocators, self.journal.seq, transactions,
+                rows, undo_logs, undo_chains, purge, locks, indexes)
+
+    @classmethod
+    def restore_state(cls, state: Tuple) -> 'MVCCSystem':
+        """由capture_state的结果创建新的系统"""
+        if state[0] != STATE_VERSION:
+            raise ValueError(f'Unsupported state version: {state[0]}')
+        system = cls(*state[1])
+        system._load_state(state)
+        system._published_seq = system.journal.seq
+        return system
+
+    def _load_state(self, state: Tuple):
+        """
+        把capture_state的结果载入刚初始化的系统
+        记录直接放入各管理器，版本链、有序row_id索引与二级索引随后重建，不经过逐条操作的接口
+        """
+        (_, config, allocators, seq, transactions,
+         rows, undo_logs, undo_chains, purge, locks, indexes) = state
+
+        # 恢复后变更日志为空，只有since等于该序列号的增量请求可以继续，其余退回全量状态
+        self.journal.seq = max(self.journal.seq, seq)
+
+        transaction_manager = self.transaction_manager
+        operation_history_size = transaction_manager.operation_history_size
+        active, committed, aborted = ([Transaction.from_tuple(values, operation_history_size) for values in group]
+                                      for group in transactions)
+        for trx in active:
+            transaction_manager.active_transactions[trx.trx_id] = trx
+        transaction_manager.committed_transactions.extend(committed)
+        transaction_manager.aborted_transactions.extend(aborted)
+        transaction_manager.finished_operations = sum(len(trx.operations) for trx in (*committed, *aborted))
+        for trx in (*active, *committed, *aborted):
+            transaction_manager.transactions[trx.trx_id] = trx
+        transaction_manager.trx_ids = SortedIdIndex(transaction_manager.transactions)
+
+        undo_log_manager = self.undo_log_manager
+        for values in undo_logs:
+            undo_log = UndoLog.from_tuple(values)
+            undo_log_manager.undo_logs[undo_log.undo_id] = undo_log
+        undo_log_manager.undo_ids = SortedIdIndex(undo_log_manager.undo_logs)
+        for row_id, chain in undo_chains:
+            undo_log_manager.row_undo_chains[row_id] = dict.fromkeys(chain)
+
+        data_row_manager = self.data_row_manager
+        for values in rows:
+            row = DataRow.from_tuple(values)
+            data_row_manager.rows[row.row_id] = row
+            data_row_manager.version_chains[row.row_id] = VersionChain(row, undo_log_manager.undo_logs)
+        data_row_manager.row_ids = sorted(data_row_manager.rows)
+        for column in indexes:
+            data_row_manager.create_index(column)
+
+        history_list, purged_undo_count, purged_row_count = purge
+        self.purge_system.history_list.extend((trx_id, list(row_ids)) for trx_id, row_ids in history_list)
+        self.purge_system.purged_undo_count = purged_undo_count
+        self.purge_system.purged_row_count = purged_row_count
+
+        lock_manager = self.lock_manager
+        held_locks, lock_metrics = locks
+        for row_id, owner in held_locks:
+            lock_manager.grant(owner, row_id)
+        (lock_manager.lock_waits, lock_manager.lock_wait_timeouts, lock_manager.deadlocks,
+         lock_manager.lock_wait_time_us_total, lock_manager.lock_wait_time_us_max) = lock_metrics
+
+        # ID计数器不小于已有记录的最大ID + 1（手工编辑过的快照也不会分配出重复ID）
+        for allocator, next_id, ids in ((self.trx_id_allocator, allocators[0], transaction_manager.transactions),
+                                        (self.row_id_allocator, allocators[1], self.data_row_manager.rows),
+                                        (self.undo_id_allocator, allocators[2], undo_log_manager.undo_logs)):
+            allocator.restore(max(next_id, max(ids, default=0) + 1))
+
+    @classmethod
+    def open(cls, redo_dir: str, checkpoint_interval: int = 16 * 1024 * 1024, sync: bool = True,
+             **config) -> 'MVCCSystem':
+        """
+        打开以redo_dir为数据目录的持久化系统，目录中已有数据时执行崩溃恢复：
+        1. 通过mmap加载最近一次检查点（没有检查点时按config创建空系统）
+        2. 按顺序重放检查点之后的Redo记录
+        3. 回滚崩溃时仍活跃的事务（回滚本身也写入Redo日志）
+        4. 写一个新的检查点，截断已经重放过的日志
+        """
+        redo_log = RedoLog(redo_dir, checkpoint_interval, sync)
+        checkpoint = redo_log.read_checkpoint()
+        if checkpoint is None:
+            system, checkpoint_lsn = cls(**config), 0
+        else:
+            checkpoint_lsn, sections = checkpoint
+            system = cls.restore_state(tuple(sections))
+        system._replay(redo_log.read_records(checkpoint_lsn))
+
+        redo_log.open()
+        system._attach_redo_log(redo_log)
+        for trx_id in list(system.transaction_manager.active_transactions):
+            system.rollback_transaction(trx_id)
+        system.checkpoint()
+        return system
+
+    def _attach_redo_log(self, redo_log: RedoLog):
+        self.redo_log = redo_log
+        self.purge_system.redo_log = redo_log
+
+    def checkpoint(self) -> Dict:
+        """写检查点：在排他闩锁内保存全量状态，随后截断Redo日志"""
+        if self.redo_log is None:
+            return {'success': False, 'error': 'Redo log not enabled'}
+        with self.latch.exclusive():
+            self.redo_log.write_checkpoint(self.capture_state())
+        result = self.redo_log.get_status()
+        result['success'] = True
+        return result
+
+    def close(self):
+        """把缓冲区中的Redo记录写入磁盘并关闭日志文件"""
+        if self.redo_log is not None:
+            self.redo_log.close()
+
+    def _replay(self, records: Iterable[Tuple[int, tuple]]):
+        """
+        按顺序重放Redo记录（恢复时调用，此时尚未启用Redo日志）
+        每条记录带有执行时分配的ID，重放前把ID分配器设置到该ID，使重放结果与原始执行一致
+        """
+        auto_purge, self.auto_purge = self.auto_purge, False  # 自动purge的结果已作为PURGE记录写入日志
+        allocators = (self.trx_id_allocator, self.row_id_allocator, self.undo_id_allocator)
+        next_ids = [allocator.next_id for allocator in allocators]
+        for _, record in records:
+            kind = record[0]
+            if kind == REDO_BEGIN:
+                _, trx_id, isolation_level, start_time_us = record
+                self.trx_id_allocator.restore(trx_id)
+                self.begin_transaction(isolation_level)
+                self.transaction_manager.get_transaction(trx_id).start_time_us = start_time_us
+            elif kind == REDO_INSERT:
+                _, trx_id, row_id, undo_id, data, time_us = record
+                self.row_id_allocator.restore(row_id)
+                self.undo_id_allocator.restore(undo_id)
+                self.insert_data(trx_id, data)
+                self.data_row_manager.get_row(row_id).create_time_us = time_us
+                self._restore_times(trx_id, row_id, undo_id, time_us)
+            elif kind == REDO_UPDATE:
+                _, trx_id, row_id, undo_id, data, time_us = record
+                self.undo_id_allocator.restore(undo_id)
+                self.update_data(trx_id, row_id, data, lock_wait_timeout=0)
+                self._restore_times(trx_id, row_id, undo_id, time_us)
+            elif kind == REDO_DELETE:
+                _, trx_id, row_id, undo_id, time_us = record
+                self.undo_id_allocator.restore(undo_id)
+                self.delete_data(trx_id, row_id, lock_wait_timeout=0)
+                self._restore_times(trx_id, row_id, undo_id, time_us)
+            elif kind == REDO_COMMIT:
+                _, trx_id, commit_time_us = record
+                self.commit_transaction(trx_id)
+                self.transaction_manager.get_transaction(trx_id).commit_time_us = commit_time_us
+            elif kind == REDO_ROLLBACK:
+                self.rollback_transaction(record[1])
+            elif kind == REDO_PURGE:
+                self.purge_system.replay(record[1], record[2])
+            elif kind == REDO_CREATE_INDEX:
+                self.data_row_manager.create_index(record[1])
+            next_ids = [max(next_id, allocator.next_id) for next_id, allocator in zip(next_ids, allocators)]
+        for allocator, next_id in zip(allocators, next_ids):
+            allocator.restore(next_id)
+        self.auto_purge = auto_purge
+
+    def _restore_times(self, trx_id: int, row_id: int, undo_id: int, time_us: int):
+        """把重放DML时产生的时间戳改回原始执行时的时间"""
+        self.data_row_manager.get_row(row_id).update_time_us = time_us
+        self.undo_log_manager.undo_logs[undo_id].create_time_us = time_us
+        operations = self.transaction_manager.get_transaction(trx_id).operations
+        if operations:  # operation_history_size为0时不保留操作历史
+            op_type, operation_row_id, _, details = operations[-1]
+            operations[-1] = (op_type, operation_row_id, time_us, details)
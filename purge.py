@@ -0,0 +1,196 @@
+"""
+InnoDB MVCC Purge 模块
+根据所有活跃ReadView计算低水位，回收不再被任何快照需要的Undo日志和删除标记的数据行
+"""
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple, Set
+
+from transaction import TransactionManager, Transaction
+from undo_log import UndoLogManager, UndoLog
+from data_row import DataRowManager
+from redo_log import RedoLog, REDO_PURGE
+
+# purge对一行的处理结果：None表示本轮跳过，ROW_REMOVED表示整行回收，其余为截断处的Undo日志ID
+ROW_REMOVED = 0
+
+
+class PurgeSystem:
+    """
+    Purge系统
+
+    InnoDB语义：
+    - 事务提交后，其Undo日志进入History List，等待purge
+    - purge以所有活跃ReadView中最小的min_trx_id作为低水位
+    - trx_id小于低水位且不再活跃的事务，对所有现存及将来的ReadView都可见，
+      其更早的历史版本不会再被任何快照访问，可以安全回收
+    """
+
+    def __init__(self, transaction_manager: TransactionManager,
+                 undo_log_manager: UndoLogManager,
+                 data_row_manager: DataRowManager,
+                 batch_size: int = 300):
+        self.transaction_manager = transaction_manager
+        self.undo_log_manager = undo_log_manager
+        self.data_row_manager = data_row_manager
+        self.batch_size = batch_size  # 每轮purge最多处理的数据行数
+        # History List：按提交顺序排列的 (trx_id, [row_id列表])
+        self.history_list: Deque[Tuple[int, List[int]]] = deque()
+        self.purged_undo_count = 0  # 累计回收的Undo日志数
+        self.purged_row_count = 0  # 累计回收的删除标记行数
+        # purge的结果取决于运行时的ReadView，无法在恢复时重新推导，因此把每行的处理结果写入Redo日志
+        self.redo_log: Optional[RedoLog] = None
+
+    def add_committed_transaction(self, trx: Transaction):
+        """事务提交后将其修改的行加入History List"""
+        if trx.modified_rows:
+            self.history_list.append((trx.trx_id, sorted(trx.modified_rows, reverse=True)))
+
+    def history_list_length(self) -> int:
+        """History List长度（尚未purge的已提交事务数）"""
+        return len(self.history_list)
+
+    def get_low_watermark(self) -> int:
+        """
+        计算purge低水位
+        没有任何ReadView时，低水位为下一个将要分配的事务ID
+        """
+        return self.transaction_manager.get_low_watermark()
+
+    def run(self, batch_size: int = None) -> Dict:
+        """
+        执行一轮purge
+        按History List顺序处理，最多处理batch_size个数据行，遇到低水位之上的事务即停止
+        """
+        budget = batch_size if batch_size is not None else self.batch_size
+        low_watermark = self.get_low_watermark()
+        active_trx_ids = set(self.transaction_manager.get_active_trx_ids())
+
+        processed_rows = 0
+        purged_undo = 0
+        purged_rows = 0
+        purged_trx = 0
+        actions: List[Tuple[int, int, Optional[int]]] = []  # (trx_id, row_id, 处理结果)
+        finished_trx_ids: List[int] = []
+
+        while self.history_list and processed_rows < budget:
+            trx_id, row_ids = self.history_list[0]
+            if trx_id >= low_watermark:
+                break
+
+            while row_ids and processed_rows < budget:
+                row_id = row_ids.pop()
+                with self.data_row_manager.row_latch(row_id):
+                    action = self._purge_row(row_id, low_watermark, active_trx_ids)
+                    undo_count, row_removed = self._apply_action(row_id, action)
+                actions.append((trx_id, row_id, action))
+                purged_undo += undo_count
+                purged_rows += row_removed
+                processed_rows += 1
+
+            if not row_ids:
+                self.history_list.popleft()
+                finished_trx_ids.append(trx_id)
+                purged_trx += 1
+
+        if self.redo_log is not None and (actions or finished_trx_ids):
+            self.redo_log.append((REDO_PURGE, tuple(actions), tuple(finished_trx_ids)))
+
+        self.purged_undo_count += purged_undo
+        self.purged_row_count += purged_rows
+
+        return {
+            'low_watermark': low_watermark,
+            'purged_trx': purged_trx,
+            'purged_undo_logs': purged_undo,
+            'purged_rows': purged_rows,
+            'history_list_length': self.history_list_length()
+        }
+
+    def _purge_row(self, row_id: int, low_watermark: int, active_trx_ids: Set[int]) -> Optional[int]:
+        """
+        判断某行可以回收哪些历史版本
+
+        从最新的Undo日志开始向旧版本回溯，找到第一个对所有ReadView都可见的版本：
+        - 读取最迟在该版本停止，更早的Undo日志可以回收，该Undo日志的roll_pointer置空
+        - 如果该版本就是已删除的当前版本，整行连同其Undo链一起回收
+        - 更早的Undo日志中若仍有活跃事务的记录（回滚需要），本轮跳过该行
+        返回处理结果：None（跳过）、ROW_REMOVED（整行回收）或截断处的Undo日志ID
+        """
+        row = self.data_row_manager.get_row(row_id)
+        if row is None:
+            return None
+
+        undo_logs = self.undo_log_manager.undo_logs
+        chain: List[UndoLog] = []  # 从新到旧
+        undo_id = row.roll_pointer
+        while undo_id is not None:
+            undo_log = undo_logs.get(undo_id)
+            if undo_log is None:
+                break
+            chain.append(undo_log)
+            undo_id = undo_log.roll_pointer
+
+        cut = None
+        for index, undo_log in enumerate(chain):
+            if undo_log.trx_id < low_watermark and undo_log.trx_id not in active_trx_ids:
+                cut = index
+                break
+        if cut is None:
+            return None
+
+        # 当前版本已删除且对所有ReadView可见：整行回收
+        if cut == 0 and row.deleted:
+            if any(undo_log.trx_id in active_trx_ids for undo_log in chain):
+                return None
+            return ROW_REMOVED
+
+        older = chain[cut + 1:]
+        if not older or any(undo_log.trx_id in active_trx_ids for undo_log in older):
+            return None
+        return chain[cut].undo_id
+
+    def _apply_action(self, row_id: int, action: Optional[int]) -> Tuple[int, int]:
+        """执行_purge_row的处理结果（调用方持有该行的行闩锁），返回 (回收的Undo日志数, 回收的行数)"""
+        if action is None:
+            return 0, 0
+        if action == ROW_REMOVED:
+            removed = self.undo_log_manager.remove_row_undo_logs(row_id)
+            self.data_row_manager.remove_row(row_id)
+            return removed, 1
+
+        row = self.data_row_manager.get_row(row_id)
+        undo_logs = self.undo_log_manager.undo_logs
+        removed_ids = set()
+        undo_id = undo_logs[action].roll_pointer
+        while undo_id is not None and undo_id in undo_logs:
+            removed_ids.add(undo_id)
+            undo_id = undo_logs[undo_id].roll_pointer
+        self.undo_log_manager.truncate_chain(action)
+        self.undo_log_manager.remove_undo_logs(row_id, removed_ids)
+        self.data_row_manager.mark_row_changed(row)
+        self.data_row_manager.refresh_index_entries(row_id)
+        return len(removed_ids), 0
+
+    def replay(self, actions: Sequence[Tuple[int, int, Optional[int]]], finished_trx_ids: Sequence[int]):
+        """崩溃恢复时重放Redo日志中记录的一轮purge"""
+        entries = {trx_id: row_ids for trx_id, row_ids in self.history_list}
+        for trx_id, row_id, action in actions:
+            row_ids = entries.get(trx_id)
+            if row_ids is not None and row_id in row_ids:
+                row_ids.remove(row_id)
+            with self.data_row_manager.row_latch(row_id):
+                undo_count, row_removed = self._apply_action(row_id, action)
+            self.purged_undo_count += undo_count
+            self.purged_row_count += row_removed
+        if finished_trx_ids:
+            finished = set(finished_trx_ids)
+            self.history_list = deque(entry for entry in self.history_list if entry[0] not in finished)
+
+    def get_status(self) -> Dict:
+        """获取purge状态"""
+        return {
+            'history_list_length': self.history_list_length(),
+            'low_watermark': self.get_low_watermark(),
+            'purged_undo_logs': self.purged_undo_count,
+            'purged_rows': self.purged_row_count
+        }
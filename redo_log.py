@@ -0,0 +1,239 @@
+"""
+InnoDB MVCC Redo日志模块
+只追加、带长度前缀的二进制Redo日志，支持组提交（多个事务的提交共用一次fsync）、
+检查点（可mmap加载的全量状态文件）以及崩溃恢复时读取检查点之后的日志
+"""
+import marshal
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+# Redo记录类型（记录为元组，第一个元素是类型）
+REDO_BEGIN = 1  # (type, trx_id, isolation_level, start_time_us)
+REDO_INSERT = 2  # (type, trx_id, row_id, undo_id, data, time_us)
+REDO_UPDATE = 3  # (type, trx_id, row_id, undo_id, data, time_us)
+REDO_DELETE = 4  # (type, trx_id, row_id, undo_id, time_us)
+REDO_COMMIT = 5  # (type, trx_id, commit_time_us)
+REDO_ROLLBACK = 6  # (type, trx_id)
+REDO_PURGE = 7  # (type, ((trx_id, row_id, action), ...), (已处理完的trx_id, ...))
+REDO_CREATE_INDEX = 8  # (type, column)
+
+LOG_MAGIC = b'MVCCREDO'
+LOG_HEADER = struct.Struct('<8sQ')  # magic, 文件中第一条记录的LSN
+RECORD_HEADER = struct.Struct('<II')  # 记录长度, CRC32
+
+CHECKPOINT_MAGIC = b'MVCCCKPT'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_HEADER = struct.Struct('<8sIIQ')  # magic, 版本, 分段数, 检查点LSN
+CHECKPOINT_SECTION = struct.Struct('<QQ')  # 分段偏移, 分段长度
+
+
+class RedoLog:
+    """
+    Redo日志
+
+    - LSN为日志的逻辑字节偏移，检查点之后日志文件被截断，文件头记录第一条记录的LSN
+    - 每条记录为 [长度][CRC32][marshal序列化的记录元组]，恢复时遇到不完整或校验失败的记录即停止
+    - append只写入内存缓冲区；flush(lsn)保证该LSN之前的记录已落盘，
+      同时到达的多个flush由第一个线程一次写入并fsync，其余线程等待其完成（组提交）
+    - 日志超过checkpoint_interval字节后checkpoint_due返回True，由调用方写检查点
+    """
+
+    def __init__(self, directory: str, checkpoint_interval: int = 16 * 1024 * 1024, sync: bool = True):
+        self.directory = directory
+        self.log_path = os.path.join(directory, 'redo.log')
+        self.checkpoint_path = os.path.join(directory, 'checkpoint')
+        self.checkpoint_interval = checkpoint_interval
+        self.sync = sync  # 为False时只写入操作系统缓存，不fsync
+        os.makedirs(directory, exist_ok=True)
+        self.mutex = threading.Lock()
+        self.flushed = threading.Condition(self.mutex)
+        self.buffer: List[bytes] = []  # 尚未写入文件的记录
+        self.file = None
+        self.start_lsn = 0  # 日志文件中第一条记录的LSN（即最近一次检查点的LSN）
+        self.write_lsn = 0  # 已追加记录的末尾LSN
+        self.flushed_lsn = 0  # 已落盘记录的末尾LSN
+        self.flushing = False  # 是否有线程正在写入并fsync
+        self.flush_count = 0  # fsync次数，与提交次数对比可以看出组提交的效果
+
+    # ---- 恢复 ----
+
+    def read_checkpoint(self) -> Optional[Tuple[int, List]]:
+        """
+        读取检查点，返回 (检查点LSN, 分段列表)，没有检查点时返回None
+        文件通过mmap映射，各分段直接从映射内存反序列化，不需要先把整个文件读入
+        """
+        try:
+            f = open(self.checkpoint_path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, section_count, lsn = CHECKPOINT_HEADER.unpack_from(mapped, 0)
+            if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+                raise ValueError(f'Invalid checkpoint file: {self.checkpoint_path}')
+            view = memoryview(mapped)
+            try:
+                sections = []
+                position = CHECKPOINT_HEADER.size
+                for _ in range(section_count):
+                    offset, length = CHECKPOINT_SECTION.unpack_from(mapped, position)
+                    position += CHECKPOINT_SECTION.size
+                    sections.append(marshal.loads(view[offset:offset + length]))
+            finally:
+                view.release()
+        return lsn, sections
+
+    def read_records(self, from_lsn: int = 0) -> Iterator[Tuple[int, tuple]]:
+        """
+        按顺序产出日志中LSN不小于from_lsn的 (LSN, 记录)
+        遇到不完整或校验失败的记录（崩溃时未写完的尾部）即停止，并把文件截断到最后一条完整记录
+        """
+        try:
+            f = open(self.log_path, 'r+b')
+        except FileNotFoundError:
+            return
+        with f:
+            header = f.read(LOG_HEADER.size)
+            if len(header) < LOG_HEADER.size:
+                return
+            magic, start_lsn = LOG_HEADER.unpack(header)
+            if magic != LOG_MAGIC:
+                raise ValueError(f'Invalid redo log file: {self.log_path}')
+            offset = LOG_HEADER.size
+            while True:
+                record_header = f.read(RECORD_HEADER.size)
+                if len(record_header) < RECORD_HEADER.size:
+                    break
+                length, crc = RECORD_HEADER.unpack(record_header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                lsn = start_lsn + offset - LOG_HEADER.size
+                if lsn >= from_lsn:
+                    yield lsn, marshal.loads(payload)
+                offset += RECORD_HEADER.size + length
+            f.truncate(offset)
+
+    def open(self):
+        """恢复完成后打开日志文件用于追加"""
+        try:
+            f = open(self.log_path, 'r+b')
+        except FileNotFoundError:
+            self._create_log_file(0)
+            f = open(self.log_path, 'r+b')
+        magic, start_lsn = LOG_HEADER.unpack(f.read(LOG_HEADER.size))
+        f.seek(0, os.SEEK_END)
+        self.file = f
+        self.start_lsn = start_lsn
+        self.write_lsn = self.flushed_lsn = start_lsn + f.tell() - LOG_HEADER.size
+
+    def close(self):
+        """写入缓冲区中的记录并关闭日志文件"""
+        self.flush(self.write_lsn)
+        with self.mutex:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    # ---- 写入 ----
+
+    def append(self, record: tuple) -> int:
+        """追加一条记录到缓冲区，返回记录末尾的LSN"""
+        payload = marshal.dumps(record)
+        with self.mutex:
+            self.buffer.append(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+            self.buffer.append(payload)
+            self.write_lsn += RECORD_HEADER.size + len(payload)
+            return self.write_lsn
+
+    def flush(self, lsn: int):
+        """
+        保证lsn之前的记录已经落盘（组提交）
+        没有线程在写入时当前线程成为写入者，把缓冲区中的全部记录一次写入并fsync；
+        否则等待正在进行的写入完成，它可能已经包含了本线程的记录
+        """
+        with self.mutex:
+            while self.flushed_lsn < lsn:
+                if self.flushing:
+                    self.flushed.wait()
+                    continue
+                self.flushing = True
+                data = b''.join(self.buffer)
+                self.buffer.clear()
+                target_lsn = self.write_lsn
+                self.mutex.release()
+                try:
+                    self.file.write(data)
+                    self.file.flush()
+                    if self.sync:
+                        os.fsync(self.file.fileno())
+                finally:
+                    self.mutex.acquire()
+                    self.flushing = False
+                    self.flushed.notify_all()
+                self.flushed_lsn = target_lsn
+                self.flush_count += 1
+
+    def checkpoint_due(self) -> bool:
+        """自上次检查点以来的日志量是否已超过checkpoint_interval"""
+        return self.write_lsn - self.start_lsn >= self.checkpoint_interval
+
+    # ---- 检查点 ----
+
+    def write_checkpoint(self, sections: Sequence):
+        """
+        写入检查点并截断日志（调用方保证期间没有新的记录追加）
+
+        检查点文件布局：文件头 | 分段表 (偏移, 长度) × N | 各分段的marshal数据
+        先写临时文件并fsync后再替换，随后用以检查点LSN开头的空日志替换旧日志；
+        两步之间崩溃时，恢复会跳过旧日志中检查点LSN之前的记录
+        """
+        self.flush(self.write_lsn)
+        with self.mutex:
+            lsn = self.write_lsn
+            payloads = [marshal.dumps(section) for section in sections]
+            offset = CHECKPOINT_HEADER.size + CHECKPOINT_SECTION.size * len(payloads)
+            table = []
+            for payload in payloads:
+                table.append(CHECKPOINT_SECTION.pack(offset, len(payload)))
+                offset += len(payload)
+
+            temp_path = self.checkpoint_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(payloads), lsn))
+                f.writelines(table)
+                f.writelines(payloads)
+                f.flush()
+                if self.sync:
+                    os.fsync(f.fileno())
+            os.replace(temp_path, self.checkpoint_path)
+
+            if self.file is not None:
+                self.file.close()
+            self._create_log_file(lsn)
+            self.file = open(self.log_path, 'r+b')
+            self.file.seek(0, os.SEEK_END)
+            self.start_lsn = lsn
+
+    def _create_log_file(self, start_lsn: int):
+        """创建只有文件头的空日志（先写临时文件再替换）"""
+        temp_path = self.log_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(LOG_HEADER.pack(LOG_MAGIC, start_lsn))
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+        os.replace(temp_path, self.log_path)
+
+    def get_status(self) -> dict:
+        """获取Redo日志状态"""
+        with self.mutex:
+            return {
+                'write_lsn': self.write_lsn,
+                'flushed_lsn': self.flushed_lsn,
+                'checkpoint_lsn': self.start_lsn,
+                'flush_count': self.flush_count
+            }
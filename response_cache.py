@@ -0,0 +1,50 @@
+"""
+InnoDB MVCC 响应缓存模块
+按版本缓存序列化后的JSON响应体：状态未变化时重复的查询直接返回缓存的字节，不再计算与序列化
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class ResponseCache:
+    """
+    LRU响应缓存
+
+    键包含实体或全局状态的版本，状态变化后旧版本的条目不会再被命中，随LRU顺序淘汰，无需主动失效；
+    条目数超过max_entries或响应体总字节数超过max_bytes时淘汰最久未使用的条目
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[Hashable, bytes]' = OrderedDict()  # 最近使用的在末尾
+        self.size = 0  # 缓存的响应体字节数之和
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+            return body
+
+    def put(self, key: Hashable, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = body
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def collect_metrics(self):
+        """导出时计算的监控状态量（metrics.Registry的收集函数）"""
+        with self.lock:
+            entries, size = len(self.entries), self.size
+        yield ('mvcc_response_cache_entries', 'Cached serialized JSON responses', (), [((), entries)])
+        yield ('mvcc_response_cache_bytes', 'Total size of cached response bodies', (), [((), size)])
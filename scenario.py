@@ -0,0 +1,221 @@
+"""
+InnoDB MVCC 场景回放模块
+场景文件（JSON）描述一组命名事务上按顺序执行的 begin / DML / 读取 / commit / rollback 步骤，
+回放引擎在MVCCSystem上执行场景，既可以作为负载生成器，也可以作为可复现的性能回归用例
+
+场景格式：
+    {
+      "name": "rc_vs_rr",
+      "description": "...",
+      "steps": [
+        {"op": "begin", "as": "writer", "isolation_level": "READ_COMMITTED"},
+        {"op": "insert", "trx": "writer", "as": "r1", "data": {"name": "Alice"}},
+        {"op": "commit", "trx": "writer"},
+        {"op": "read", "trx": "reader", "row": "r1", "expect": {"data": {"name": "Alice"}}}
+      ]
+    }
+
+- 步骤格式与 /api/batch 的操作相同：trx / row 引用本场景中begin / insert时用as命名的事务与数据行，
+  也可以用trx_id / row_id直接指定已有的事务与数据行
+- expect为可选的预期结果，只比较其中列出的字段（如success、data、error），不一致的步骤计入mismatches
+- 回放多份副本时每份副本有独立的命名空间；seed不为None时用该种子的随机数生成器决定每一步执行哪份副本，
+  否则各副本轮流执行一步。回放在调用线程中顺序执行，同一场景、副本数与种子在新建的系统上结果完全一致，
+  digest为各步骤结果（不含时间）的摘要，可用于比较两次回放的行为是否相同
+
+运行：python scenario.py scenarios/rc_vs_rr.json [--copies 100] [--seed 1] [--rate 2000] [--output result.json]
+"""
+import argparse
+import hashlib
+import json
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from mvcc_system import MVCCSystem
+
+OPERATIONS = ('begin', 'commit', 'rollback', 'insert', 'update', 'delete', 'read', 'read_with_path')
+TRX_OPERATIONS = ('commit', 'rollback', 'insert', 'update', 'delete', 'read', 'read_with_path')
+ROW_OPERATIONS = ('update', 'delete', 'read', 'read_with_path')
+
+MAX_REPORTED_MISMATCHES = 20
+
+
+def load_scenario(source: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """从JSON文件路径或已解析的字典加载场景，校验后返回，格式错误时抛出ValueError"""
+    if isinstance(source, str):
+        with open(source, encoding='utf-8') as f:
+            scenario = json.load(f)
+    else:
+        scenario = source
+    if not isinstance(scenario, dict) or not isinstance(scenario.get('steps'), list):
+        raise ValueError('Scenario must be an object with a steps list')
+    validate_steps(scenario['steps'])
+    return {
+        'name': scenario.get('name', 'scenario'),
+        'description': scenario.get('description', ''),
+        'steps': scenario['steps']
+    }
+
+
+def validate_steps(steps: List[Dict[str, Any]]):
+    """检查步骤的操作类型，以及引用的事务与数据行名称是否已在之前的步骤中定义"""
+    trx_names, row_names = set(), set()
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict):
+            raise ValueError(f'Step {index}: must be an object')
+        op = step.get('op')
+        if op not in OPERATIONS:
+            raise ValueError(f'Step {index}: unknown operation {op!r}')
+        if op in TRX_OPERATIONS:
+            if 'trx' in step:
+                if step['trx'] not in trx_names:
+                    raise ValueError(f'Step {index}: transaction {step["trx"]!r} is not defined by an earlier begin')
+            elif 'trx_id' not in step:
+                raise ValueError(f'Step {index}: {op} needs trx or trx_id')
+        if op in ROW_OPERATIONS:
+            if 'row' in step:
+                if step['row'] not in row_names:
+                    raise ValueError(f'Step {index}: row {step["row"]!r} is not defined by an earlier insert')
+            elif 'row_id' not in step:
+                raise ValueError(f'Step {index}: {op} needs row or row_id')
+        if 'expect' in step and not isinstance(step['expect'], dict):
+            raise ValueError(f'Step {index}: expect must be an object')
+        if 'as' in step:
+            if op == 'begin':
+                trx_names.add(step['as'])
+            elif op == 'insert':
+                row_names.add(step['as'])
+            else:
+                raise ValueError(f'Step {index}: as is only allowed on begin and insert')
+
+
+def _outcome(result: Dict[str, Any]) -> tuple:
+    """步骤结果中与时间无关的部分，用于计算digest"""
+    return (result['op'], result['success'], result.get('error'), result.get('trx_id'),
+            result.get('row_id'), result.get('data'))
+
+
+def latency_stats(samples_ns: List[int]) -> Dict:
+    """延迟样本（纳秒）汇总为微秒统计（回放统计与benchmarks共用）"""
+    samples = sorted(samples_ns)
+    count = len(samples)
+
+    def percentile(p: float) -> float:
+        return round(samples[min(count - 1, int(count * p))] / 1000, 2)
+
+    return {
+        'count': count,
+        'mean_us': round(statistics.fmean(samples) / 1000, 2),
+        'p50_us': percentile(0.50),
+        'p95_us': percentile(0.95),
+        'p99_us': percentile(0.99),
+        'max_us': round(samples[-1] / 1000, 2),
+    }
+
+
+def replay(system: MVCCSystem, scenario: Dict[str, Any], copies: int = 1, seed: Optional[int] = None,
+           rate: Optional[float] = None) -> Dict:
+    """
+    在system上回放场景的copies份副本，返回回放统计
+
+    rate为目标吞吐（每秒步骤数，所有副本合计），为None时尽快执行；
+    按绝对时间表调度（第i步不早于开始后i / rate秒），单步变慢不会使整体吞吐低于目标，
+    落后于时间表的最大时间记录在max_lag_ms中
+    """
+    steps = scenario['steps']
+    rnd = random.Random(seed) if seed is not None else None
+    names = [{'trx': {}, 'row': {}} for _ in range(copies)]
+    positions = [0] * copies
+    pending = [copy for copy in range(copies) if steps]  # 还有未执行步骤的副本
+    turn = 0
+
+    latencies: Dict[str, List[int]] = {op: [] for op in OPERATIONS}
+    failed: Dict[str, int] = {op: 0 for op in OPERATIONS}
+    mismatches = []
+    mismatch_count = 0
+    digest = hashlib.sha256()
+    interval = 1.0 / rate if rate else None
+    max_lag = 0.0
+    executed = 0
+
+    start = time.perf_counter()
+    while pending:
+        if rnd is not None:
+            slot = rnd.randrange(len(pending))
+        else:
+            slot = turn % len(pending)
+            turn = slot + 1
+        copy = pending[slot]
+        index = positions[copy]
+        step = steps[index]
+        positions[copy] = index + 1
+        if positions[copy] == len(steps):
+            pending.pop(slot)
+            turn = slot
+
+        if interval is not None:
+            delay = start + executed * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+
+        op_start = time.perf_counter_ns()
+        result = system.execute_operation(step, names[copy])
+        latencies[step['op']].append(time.perf_counter_ns() - op_start)
+        executed += 1
+
+        if not result['success']:
+            failed[step['op']] += 1
+        digest.update(repr((copy, index, _outcome(result))).encode())
+        expect = step.get('expect')
+        if expect is not None:
+            actual = {key: result.get(key) for key in expect}
+            if actual != expect:
+                mismatch_count += 1
+                if len(mismatches) < MAX_REPORTED_MISMATCHES:
+                    mismatches.append({'copy': copy, 'index': index, 'op': step['op'],
+                                       'expected': expect, 'actual': actual})
+    seconds = time.perf_counter() - start
+
+    return {
+        'scenario': scenario['name'],
+        'copies': copies,
+        'seed': seed,
+        'rate': rate,
+        'steps': executed,
+        'failed': sum(failed.values()),
+        'seconds': round(seconds, 4),
+        'ops_per_sec': round(executed / seconds, 1) if seconds else None,
+        'max_lag_ms': round(max_lag * 1000, 3),
+        'operations': {op: dict(latency_stats(samples), failed=failed[op])
+                       for op, samples in latencies.items() if samples},
+        'mismatch_count': mismatch_count,
+        'mismatches': mismatches,
+        'digest': digest.hexdigest(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MVCC场景回放')
+    parser.add_argument('scenario', help='场景JSON文件')
+    parser.add_argument('--copies', type=int, default=1, help='交错回放的副本数')
+    parser.add_argument('--seed', type=int, help='交错顺序的随机数种子（默认各副本轮流执行）')
+    parser.add_argument('--rate', type=float, help='目标吞吐（每秒步骤数），默认尽快执行')
+    parser.add_argument('--output', help='结果写入的JSON文件（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    result = replay(MVCCSystem(), load_scenario(args.scenario),
+                    args.copies, args.seed, args.rate)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if result['mismatch_count'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
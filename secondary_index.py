@@ -0,0 +1,115 @@
+"""
+InnoDB MVCC 二级索引模块
+在数据行的列上建立有序索引，保留历史版本的索引项直到purge，查询时经Undo链回表校验可见性
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+def index_key(value: Any) -> Tuple:
+    """
+    将列值转换为可排序的索引键
+    数字与字符串分属不同区间，避免不同类型之间无法比较
+    """
+    if isinstance(value, (int, float)):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return (2, repr(value))
+
+
+class SecondaryIndex:
+    """
+    二级索引
+
+    InnoDB语义：
+    - 索引项为 (列值, 主键)，UPDATE修改列值时插入新索引项，旧索引项保留
+    - 旧索引项要等purge确认没有快照再需要对应的历史版本后才删除
+    - 因此索引只用于定位候选行，结果必须通过Undo链读取可见版本后重新校验
+    """
+
+    def __init__(self, column: str):
+        self.column = column
+        self.entries: List[Tuple[Tuple, int]] = []  # 有序的 (索引键, row_id)
+        self.row_keys: Dict[int, Set[Tuple]] = {}  # row_id -> 该行在索引中的所有键
+
+    def add(self, row_id: int, data: Optional[Dict[str, Any]]):
+        """为某个行版本添加索引项（列不存在时忽略）"""
+        if not data or self.column not in data:
+            return
+        key = index_key(data[self.column])
+        keys = self.row_keys.setdefault(row_id, set())
+        if key not in keys:
+            keys.add(key)
+            insort(self.entries, (key, row_id))
+
+    def add_many(self, versions: Iterable[Tuple[int, Optional[Dict[str, Any]]]]):
+        """批量添加 (row_id, 行版本数据) 的索引项，最后统一排序（建索引时使用，避免逐条有序插入）"""
+        column = self.column
+        entries = self.entries
+        for row_id, data in versions:
+            if not data or column not in data:
+                continue
+            key = index_key(data[column])
+            keys = self.row_keys.setdefault(row_id, set())
+            if key not in keys:
+                keys.add(key)
+                entries.append((key, row_id))
+        entries.sort()
+
+    def remove_row(self, row_id: int):
+        """删除某行的全部索引项"""
+        for key in self.row_keys.pop(row_id, ()):
+            self._remove_entry(key, row_id)
+
+    def retain(self, row_id: int, versions: Iterable[Optional[Dict[str, Any]]]):
+        """只保留某行仍可达版本对应的索引项（purge与回滚使用）"""
+        keys = self.row_keys.get(row_id)
+        if not keys:
+            return
+        live = {
+            index_key(data[self.column])
+            for data in versions if data and self.column in data
+        }
+        for key in keys - live:
+            keys.discard(key)
+            self._remove_entry(key, row_id)
+
+    def _remove_entry(self, key: Tuple, row_id: int):
+        index = bisect_left(self.entries, (key, row_id))
+        if index < len(self.entries) and self.entries[index] == (key, row_id):
+            del self.entries[index]
+
+    def candidates(self, low: Any = None, high: Any = None) -> List[int]:
+        """
+        返回索引键在[low, high]内的候选row_id（按键、row_id排序，去重）
+        low / high为None表示不限制
+        """
+        start = 0 if low is None else bisect_left(self.entries, (index_key(low),))
+        end = len(self.entries) if high is None else bisect_right(self.entries, (index_key(high), float('inf')))
+        seen: Set[int] = set()
+        row_ids = []
+        for _, row_id in self.entries[start:end]:
+            if row_id not in seen:
+                seen.add(row_id)
+                row_ids.append(row_id)
+        return row_ids
+
+    def matches(self, data: Dict[str, Any], low: Any = None, high: Any = None) -> bool:
+        """回表后校验可见版本的列值是否仍在[low, high]内"""
+        if self.column not in data:
+            return False
+        key = index_key(data[self.column])
+        if low is not None and key < index_key(low):
+            return False
+        if high is not None and key > index_key(high):
+            return False
+        return True
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'column': self.column,
+            'entries': len(self.entries),
+            'rows': len(self.row_keys)
+        }
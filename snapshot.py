@@ -0,0 +1,402 @@
+"""
+InnoDB MVCC 快照模块
+把MVCCSystem.capture_state的状态元组编码为紧凑的二进制快照并解码回同样的元组，
+用于导出/导入预先准备好的演示场景以及工作区休眠到磁盘
+
+编码方式：
+- 整数使用LEB128变长编码（可能为负的使用zigzag），ID与时间戳在各段内按前一条记录做差值编码
+- 列名等字典的键放入文件头的字符串表，键序列相同的字典（同样列的数据行）共用文件头中的一项键集合，
+  正文中只写集合序号和各列的值
+- 数据行、Undo日志等记录按ID排序后逐条连续存放，字段顺序固定，不带字段标记
+"""
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+SNAPSHOT_MAGIC = b'MVCCSNAP'
+SNAPSHOT_FORMAT = 2
+
+# 通用值的类型标记（数据行的数据、操作历史等任意JSON值）
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT, _TUPLE = range(9)
+_DOUBLE = struct.Struct('<d')
+
+
+class _Writer:
+    """快照编码器：正文写入缓冲区，字符串与字典的键集合在编码过程中收集到文件头的表中"""
+
+    def __init__(self):
+        self.out = bytearray()
+        self.strings: Dict[str, int] = {}
+        self.shapes: Dict[Tuple[str, ...], int] = {}  # 字典的键序列 -> 序号
+
+    def uint(self, n: int):
+        out = self.out
+        while n > 0x7F:
+            out.append((n & 0x7F) | 0x80)
+            n >>= 7
+        out.append(n)
+
+    def sint(self, n: int):
+        self.uint(n << 1 if n >= 0 else ((-n) << 1) - 1)
+
+    def opt_uint(self, n: Optional[int]):
+        """可为None的非负整数，None编码为0"""
+        self.uint(0 if n is None else n + 1)
+
+    def intern(self, s: str) -> int:
+        index = self.strings.get(s)
+        if index is None:
+            index = self.strings[s] = len(self.strings)
+        return index
+
+    def string(self, s: str):
+        """写入字符串在字符串表中的序号"""
+        self.uint(self.intern(s))
+
+    def uints(self, values):
+        self.uint(len(values))
+        for value in values:
+            self.uint(value)
+
+    def value(self, v: Any):
+        out = self.out
+        if v is None:
+            out.append(_NONE)
+        elif v is True:
+            out.append(_TRUE)
+        elif v is False:
+            out.append(_FALSE)
+        elif isinstance(v, int):
+            out.append(_INT)
+            self.sint(v)
+        elif isinstance(v, float):
+            out.append(_FLOAT)
+            out += _DOUBLE.pack(v)
+        elif isinstance(v, str):
+            # 字符串值直接内联（时间戳等很少重复），只有字典的键进入字符串表
+            out.append(_STR)
+            data = v.encode('utf-8')
+            self.uint(len(data))
+            out += data
+        elif isinstance(v, dict):
+            shape = tuple(v)
+            index = self.shapes.get(shape)
+            if index is None:
+                for key in shape:
+                    if not isinstance(key, str):
+                        raise TypeError(f'Unsupported dict key in snapshot: {type(key).__name__}')
+                    self.intern(key)
+                index = self.shapes[shape] = len(self.shapes)
+            out.append(_DICT)
+            self.uint(index)
+            for item in v.values():
+                self.value(item)
+        elif isinstance(v, (list, tuple)):
+            out.append(_LIST if isinstance(v, list) else _TUPLE)
+            self.uint(len(v))
+            for item in v:
+                self.value(item)
+        else:
+            raise TypeError(f'Unsupported value in snapshot: {type(v).__name__}')
+
+    def getvalue(self) -> bytes:
+        """文件头（魔数、格式版本、字符串表、键集合表）加上正文"""
+        header = _Writer()
+        header.out += SNAPSHOT_MAGIC
+        header.uint(SNAPSHOT_FORMAT)
+        header.uint(len(self.strings))
+        for s in self.strings:  # dict按插入顺序即序号顺序
+            data = s.encode('utf-8')
+            header.uint(len(data))
+            header.out += data
+        header.uint(len(self.shapes))
+        for shape in self.shapes:
+            header.uints([self.strings[key] for key in shape])
+        return bytes(header.out + self.out)
+
+
+def _write_read_view(w: _Writer, read_view: Optional[tuple]):
+    if read_view is None:
+        w.uint(0)
+        return
+    creator_trx_id, m_ids, max_trx_id, create_time_us = read_view
+    w.uint(1)
+    w.uint(creator_trx_id)
+    w.uints(m_ids)
+    w.uint(max_trx_id)
+    w.sint(create_time_us)
+
+
+def _write_operations(w: _Writer, operations: Tuple, operation_count: int, start_time_us: int):
+    """操作历史：类型写入字符串表，时间戳相对前一条记录（第一条相对事务开始时间）做差值编码"""
+    w.uint(operation_count)
+    w.uint(len(operations))
+    previous_time = start_time_us
+    for op_type, row_id, time_us, details in operations:
+        w.string(op_type)
+        w.value(row_id)
+        w.sint(time_us - previous_time)
+        previous_time = time_us
+        w.value(details)
+
+
+def encode_state(state: Tuple) -> bytes:
+    """把capture_state的结果编码为二进制快照"""
+    (version, config, allocators, seq, transactions,
+     rows, undo_logs, undo_chains, purge, locks, indexes) = state
+    w = _Writer()
+    w.uint(version)
+    w.uint(len(config))
+    for item in config:
+        w.value(item)
+    for next_id in allocators:
+        w.uint(next_id)
+    w.uint(seq)
+
+    for group in transactions:
+        w.uint(len(group))
+        previous_id = previous_time = 0
+        for (trx_id, status, isolation_level, start_time_us, commit_time_us,
+             read_view, operations, operation_count, modified_rows, undo_segment) in group:
+            w.sint(trx_id - previous_id)
+            w.sint(start_time_us - previous_time)
+            previous_id, previous_time = trx_id, start_time_us
+            w.string(status)
+            w.string(isolation_level)
+            w.value(None if commit_time_us is None else commit_time_us - start_time_us)
+            _write_read_view(w, read_view)
+            _write_operations(w, operations, operation_count, start_time_us)
+            w.uints(modified_rows)
+            w.uints(undo_segment)
+
+    w.uint(len(rows))
+    previous_id = previous_time = 0
+    for row_id, data, trx_id, roll_pointer, create_time_us, update_time_us, deleted in sorted(rows):
+        w.uint(row_id - previous_id)
+        w.sint(create_time_us - previous_time)
+        previous_id, previous_time = row_id, create_time_us
+        w.sint(update_time_us - create_time_us)
+        w.value(data)
+        w.uint(trx_id)
+        w.opt_uint(roll_pointer)
+        w.uint(1 if deleted else 0)
+
+    # Undo日志按undo_id顺序连续存放
+    w.uint(len(undo_logs))
+    previous_id = previous_time = 0
+    for undo_id, log_type, trx_id, row_id, delta, create_time_us, roll_pointer in sorted(undo_logs):
+        w.uint(undo_id - previous_id)
+        w.sint(create_time_us - previous_time)
+        previous_id, previous_time = undo_id, create_time_us
+        w.string(log_type)
+        w.uint(trx_id)
+        w.uint(row_id)
+        w.opt_uint(roll_pointer)
+        if delta is None:
+            w.uint(0)
+        else:
+            values, missing = delta
+            w.uint(1)
+            w.value(values)
+            w.uint(len(missing))
+            for column in missing:
+                w.string(column)
+
+    w.uint(len(undo_chains))
+    for row_id, chain in undo_chains:
+        w.uint(row_id)
+        w.uints(chain)
+
+    history_list, purged_undo_count, purged_row_count = purge
+    w.uint(len(history_list))
+    for trx_id, row_ids in history_list:
+        w.uint(trx_id)
+        w.uints(row_ids)
+    w.uint(purged_undo_count)
+    w.uint(purged_row_count)
+
+    held_locks, lock_metrics = locks
+    w.uint(len(held_locks))
+    for row_id, owner in held_locks:
+        w.uint(row_id)
+        w.uint(owner)
+    for metric in lock_metrics:
+        w.uint(metric)
+
+    w.uint(len(indexes))
+    for column in indexes:
+        w.string(column)
+    return w.getvalue()
+
+
+def decode_state(data: bytes) -> Tuple:
+    """把二进制快照解码为capture_state格式的元组，数据不完整或格式不符时抛出ValueError"""
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError('Invalid snapshot: bad magic')
+    try:
+        return _decode(bytes(data), len(SNAPSHOT_MAGIC))
+    except (IndexError, UnicodeDecodeError, struct.error) as e:
+        raise ValueError(f'Invalid snapshot: {e}') from None
+
+
+def _decode(data: bytes, pos: int) -> Tuple:
+    """解码正文：各读取函数通过闭包共享读取位置，单字节整数走快速路径"""
+
+    def uint() -> int:
+        nonlocal pos
+        byte = data[pos]
+        pos += 1
+        if byte < 0x80:
+            return byte
+        n = byte & 0x7F
+        shift = 7
+        while True:
+            byte = data[pos]
+            pos += 1
+            n |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    def sint() -> int:
+        n = uint()
+        return -((n + 1) >> 1) if n & 1 else n >> 1
+
+    def opt_uint() -> Optional[int]:
+        n = uint()
+        return None if n == 0 else n - 1
+
+    def uints() -> Tuple[int, ...]:
+        return tuple([uint() for _ in range(uint())])
+
+    def raw_string() -> str:
+        nonlocal pos
+        end = uint() + pos
+        if end > len(data):
+            raise ValueError('Invalid snapshot: truncated string')
+        s = data[pos:end].decode('utf-8')
+        pos = end
+        return s
+
+    def string() -> str:
+        return strings[uint()]
+
+    def value() -> Any:
+        # 出现最多的字典、小整数与短字符串内联处理，减少函数调用
+        nonlocal pos
+        tag = data[pos]
+        if tag <= _FLOAT and tag != _INT:
+            # 没有长度或整数部分的类型
+            pos += 1
+            if tag == _NONE:
+                return None
+            if tag == _TRUE:
+                return True
+            if tag == _FALSE:
+                return False
+            (v,) = _DOUBLE.unpack_from(data, pos)
+            pos += _DOUBLE.size
+            return v
+        n = data[pos + 1]
+        if n < 0x80:
+            pos += 2
+        else:
+            pos += 1
+            n = uint()
+        if tag == _DICT:
+            keys = shapes[n]
+            return dict(zip(keys, [value() for _ in keys]))
+        if tag == _INT:
+            return -((n + 1) >> 1) if n & 1 else n >> 1
+        if tag == _STR:
+            end = pos + n
+            if end > len(data):
+                raise ValueError('Invalid snapshot: truncated string')
+            s = data[pos:end].decode('utf-8')
+            pos = end
+            return s
+        if tag == _LIST:
+            return [value() for _ in range(n)]
+        if tag == _TUPLE:
+            return tuple([value() for _ in range(n)])
+        raise ValueError(f'Invalid snapshot: bad value tag {tag}')
+
+    def read_view() -> Optional[tuple]:
+        if uint() == 0:
+            return None
+        return uint(), uints(), uint(), sint()
+
+    def operations(start_time_us: int) -> Tuple[tuple, int]:
+        operation_count = uint()
+        records = []
+        time_us = start_time_us
+        for _ in range(uint()):
+            op_type = string()
+            row_id = value()
+            time_us += sint()
+            records.append((op_type, row_id, time_us, value()))
+        return tuple(records), operation_count
+
+    snapshot_format = uint()
+    if snapshot_format != SNAPSHOT_FORMAT:
+        raise ValueError(f'Unsupported snapshot format: {snapshot_format}')
+    strings = [raw_string() for _ in range(uint())]
+    shapes = [tuple([strings[index] for index in uints()]) for _ in range(uint())]
+
+    version = uint()
+    config = tuple([value() for _ in range(uint())])
+    allocators = (uint(), uint(), uint())
+    seq = uint()
+
+    transactions = []
+    for _ in range(3):
+        group = []
+        trx_id = start_time_us = 0
+        for _ in range(uint()):
+            trx_id += sint()
+            start_time_us += sint()
+            status = string()
+            isolation_level = string()
+            commit_time_us = value()
+            if commit_time_us is not None:
+                commit_time_us += start_time_us
+            trx_read_view = read_view()
+            trx_operations, operation_count = operations(start_time_us)
+            group.append((trx_id, status, isolation_level, start_time_us, commit_time_us,
+                          trx_read_view, trx_operations, operation_count, uints(), uints()))
+        transactions.append(tuple(group))
+
+    rows = []
+    row_id = create_time_us = 0
+    for _ in range(uint()):
+        row_id += uint()
+        create_time_us += sint()
+        update_time_us = create_time_us + sint()
+        row_data = value()
+        rows.append((row_id, row_data, uint(), opt_uint(), create_time_us, update_time_us, uint() == 1))
+
+    undo_logs = []
+    undo_id = create_time_us = 0
+    for _ in range(uint()):
+        undo_id += uint()
+        create_time_us += sint()
+        log_type = string()
+        trx_id = uint()
+        row_id = uint()
+        roll_pointer = opt_uint()
+        delta = None
+        if uint():
+            old_values = value()
+            delta = (old_values, tuple([string() for _ in range(uint())]))
+        undo_logs.append((undo_id, log_type, trx_id, row_id, delta, create_time_us, roll_pointer))
+
+    undo_chains = tuple([(uint(), uints()) for _ in range(uint())])
+    history_list = tuple([(uint(), uints()) for _ in range(uint())])
+    purge = (history_list, uint(), uint())
+    held_locks = tuple([(uint(), uint()) for _ in range(uint())])
+    locks = (held_locks, tuple([uint() for _ in range(5)]))
+    indexes = tuple([string() for _ in range(uint())])
+    if pos != len(data):
+        raise ValueError('Invalid snapshot: trailing data')
+
+    return (version, config, allocators, seq, tuple(transactions),
+            tuple(rows), tuple(undo_logs), undo_chains, purge, locks, indexes)
@@ -1,9 +1,40 @@
 #!/bin/bash
 
 # InnoDB MVCC 可视化系统 - 快速验证和启动脚本
+# 用法: ./start.sh [flask|asgi] [--data-dir 目录]
+#   flask（默认）: Flask多线程开发服务器（python3 app.py）
+#   asgi: asyncio模式（uvicorn asgi:app），引擎调用经单写者队列执行，空闲的事件流连接不占用线程
+#   --data-dir: 持久化工作区（Redo日志与检查点）到该目录，服务重启后恢复；也可直接设置 MVCC_DATA_DIR 环境变量
+# 端口可通过 PORT 环境变量指定，默认5001
+
+MODE=flask
+PORT=${PORT:-5001}
+
+usage() {
+    echo "用法: $0 [flask|asgi] [--data-dir 目录]"
+    exit 1
+}
+
+while [ $# -gt 0 ]; do
+    case "$1" in
+        flask|asgi) MODE=$1 ;;
+        --data-dir)
+            [ -n "$2" ] || usage
+            case "$2" in
+                /*) MVCC_DATA_DIR=$2 ;;
+                *) MVCC_DATA_DIR="$PWD/$2" ;;  # 相对路径按调用时的目录解析
+            esac
+            export MVCC_DATA_DIR
+            shift ;;
+        *) usage ;;
+    esac
+    shift
+done
+
+cd "$(dirname "$0")" || exit 1
 
 echo "================================================================="
-echo "  InnoDB MVCC 可视化系统 v2.0 - 快速验证和启动"
+echo "  InnoDB MVCC 可视化系统 v2.0 - 快速验证和启动 ($MODE)"
 echo "================================================================="
 echo ""
 
@@ -17,29 +48,39 @@ fi
 echo "✅ Python 3 已安装"
 echo ""
 
-# 检查 Flask
-echo "2. 检查 Flask..."
-python3 -c "import flask" 2>/dev/null
-if [ $? -ne 0 ]; then
-    echo "⚠️  Flask 未安装，正在安装..."
-    pip install flask
+# 检查依赖
+echo "2. 检查依赖..."
+MODULES="flask flask_cors"
+if [ "$MODE" = "asgi" ]; then
+    MODULES="$MODULES uvicorn"
+fi
+for module in $MODULES; do
+    python3 -c "import $module" 2>/dev/null
     if [ $? -ne 0 ]; then
-        echo "❌ 错误: Flask 安装失败"
-        exit 1
+        echo "⚠️  $module 未安装，正在安装依赖..."
+        pip install -r requirements.txt
+        if [ $? -ne 0 ]; then
+            echo "❌ 错误: 依赖安装失败"
+            exit 1
+        fi
+        break
     fi
-fi
-echo "✅ Flask 已安装"
+done
+echo "✅ 依赖已安装"
 echo ""
 
-# 运行完整验证
-echo "3. 运行完整验证..."
+# 回放场景用例验证引擎行为
+echo "3. 回放场景用例..."
 echo "================================================================="
-python3 verify_all.py
-if [ $? -ne 0 ]; then
-    echo ""
-    echo "❌ 验证失败，请检查错误信息"
-    exit 1
-fi
+for scenario in scenarios/*.json; do
+    python3 scenario.py "$scenario" > /dev/null
+    if [ $? -ne 0 ]; then
+        echo ""
+        echo "❌ 场景 $scenario 的结果与预期不一致，请检查错误信息: python3 scenario.py $scenario"
+        exit 1
+    fi
+    echo "✅ $scenario"
+done
 echo ""
 
 # 询问是否启动系统
@@ -53,17 +94,25 @@ if [ "$response" = "y" ] || [ "$response" = "Y" ]; then
     echo ""
     echo "正在启动系统..."
     echo "================================================================="
-    echo "访问地址: http://127.0.0.1:5001"
+    echo "访问地址: http://127.0.0.1:$PORT"
+    if [ -n "$MVCC_DATA_DIR" ]; then
+        echo "数据目录: $MVCC_DATA_DIR（重启后恢复各工作区的状态）"
+    fi
     echo "按 Ctrl+C 停止服务器"
     echo "================================================================="
     echo ""
-    python3 app.py
+    if [ "$MODE" = "asgi" ]; then
+        python3 -m uvicorn asgi:app --host 0.0.0.0 --port "$PORT"
+    else
+        python3 -c "from app import app; app.run(debug=True, host='0.0.0.0', port=$PORT, threaded=True)"
+    fi
 else
     echo ""
     echo "使用说明："
-    echo "  1. 运行测试: python3 test_mvcc.py"
-    echo "  2. 运行演示: python3 demo_scenarios.py"
-    echo "  3. 启动系统: python3 app.py"
-    echo "  4. 查看文档: cat FINAL_GUIDE.md"
+    echo "  1. 回放场景: python3 scenario.py scenarios/rc_vs_rr.json"
+    echo "  2. 性能基准: python3 -m benchmarks.engine --scale 0.1"
+    echo "  3. 负载对比: python3 -m benchmarks.load_test --compare"
+    echo "  4. 启动系统: ./start.sh flask 或 ./start.sh asgi"
+    echo "  5. 查看文档: cat README.md"
     echo ""
 fi
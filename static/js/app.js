@@ -9,6 +9,10 @@ let selectedRowId = null; // 当前选中的行ID
 let lastModifiedRows = new Set(); // 上次刷新时被修改的行集合
 let lastUndoLogCount = 0; // 上次Undo Log数量，用于检测回滚
 
+// 增量状态缓存：记录已同步到的变更序列号，以及按ID索引的各类实体
+let stateSeq = null;
+let stateCache = null;
+
 // 全局变量存储路径数据
 let currentPathData = null;
 let currentRowId = null;
@@ -600,74 +604,209 @@ async function resetSystem() {
     }
 }
 
+// 用全量状态重建本地缓存
+function rebuildStateCache(state) {
+    stateCache = {
+        transactions: new Map(),
+        rows: new Map(),
+        undoLogs: new Map(),
+        versionChains: new Map(),
+        purge: state.purge
+    };
+    ['active', 'committed', 'aborted'].forEach(status => {
+        state.transactions[status].forEach(trx => stateCache.transactions.set(trx.trx_id, trx));
+    });
+    state.rows.forEach(row => stateCache.rows.set(row.row_id, row));
+    state.undo_logs.forEach(undo => stateCache.undoLogs.set(undo.undo_id, undo));
+    Object.values(state.version_chains).forEach(chain => stateCache.versionChains.set(chain.row.row_id, chain));
+}
+
+// 将增量变更合并到本地缓存
+function applyStateDelta(delta) {
+    const apply = (cache, changes, keyOf) => {
+        changes.created.concat(changes.changed).forEach(item => cache.set(keyOf(item), item));
+        changes.removed.forEach(id => cache.delete(id));
+    };
+    apply(stateCache.transactions, delta.transactions, trx => trx.trx_id);
+    apply(stateCache.rows, delta.rows, row => row.row_id);
+    apply(stateCache.undoLogs, delta.undo_logs, undo => undo.undo_id);
+    apply(stateCache.versionChains, delta.version_chains, chain => chain.row.row_id);
+    stateCache.purge = delta.purge;
+}
+
+// 由本地缓存生成与 /system/state 相同结构的状态对象
+function buildStateFromCache() {
+    const byId = (key) => (a, b) => a[key] - b[key];
+    const transactions = Array.from(stateCache.transactions.values()).sort(byId('trx_id'));
+    const versionChains = {};
+    Array.from(stateCache.versionChains.keys()).sort((a, b) => a - b).forEach(rowId => {
+        versionChains[rowId] = stateCache.versionChains.get(rowId);
+    });
+    return {
+        transactions: {
+            active: transactions.filter(trx => trx.status === 'active'),
+            committed: transactions.filter(trx => trx.status === 'committed')
+                .sort((a, b) => (a.commit_time < b.commit_time ? -1 : a.commit_time > b.commit_time ? 1 : 0)),
+            aborted: transactions.filter(trx => trx.status === 'aborted')
+        },
+        rows: Array.from(stateCache.rows.values()).sort(byId('row_id')),
+        undo_logs: Array.from(stateCache.undoLogs.values()).sort(byId('undo_id')),
+        version_chains: versionChains,
+        purge: stateCache.purge
+    };
+}
+
+// 获取系统状态：首次请求全量，之后只请求上次序列号之后的增量
+async function fetchSystemState() {
+    const url = stateSeq === null
+        ? `${API_BASE}/system/state`
+        : `${API_BASE}/system/state?since=${stateSeq}`;
+    const response = await fetch(url);
+    const payload = await response.json();
+
+    if (stateSeq === null || payload.full) {
+        rebuildStateCache(payload);
+    } else {
+        applyStateDelta(payload);
+    }
+    stateSeq = payload.seq;
+    return buildStateFromCache();
+}
+
 // 刷新系统状态
 async function refreshSystemState() {
     try {
-        const response = await fetch(`${API_BASE}/system/state`);
-        const state = await response.json();
-
-        // 收集当前所有被修改的行
-        const currentModifiedRows = new Set();
-        state.transactions.active.forEach(trx => {
-            if (trx.modified_rows) {
-                trx.modified_rows.forEach(rowId => currentModifiedRows.add(rowId));
-            }
-        });
+        renderSystemState(await fetchSystemState());
+    } catch (error) {
+        console.error('刷新状态失败:', error);
+    }
+}
 
-        // 检查Undo Log是否发生变化（用于检测回滚）
-        const currentUndoLogCount = state.undo_logs.length;
-        const undoLogChanged = lastUndoLogCount !== currentUndoLogCount;
-        lastUndoLogCount = currentUndoLogCount;
-
-        // 检查选中的行是否被修改或删除
-        let shouldRefreshVersionChain = false;
-        let shouldClearVersionChain = false;
-
-        if (selectedRowId !== null) {
-            // 检查选中的行是否还存在
-            const rowExists = state.rows.some(row => row.row_id === selectedRowId);
-
-            if (!rowExists) {
-                // 行已被删除，需要清空版本链显示
-                shouldClearVersionChain = true;
-            } else if (currentModifiedRows.has(selectedRowId) && !lastModifiedRows.has(selectedRowId)) {
-                // 如果选中的行在本次刷新中被修改了（且上次没有被修改），则需要刷新版本链
-                shouldRefreshVersionChain = true;
-            } else if (undoLogChanged) {
-                // 如果Undo Log发生变化（可能是回滚），也需要刷新版本链
-                shouldRefreshVersionChain = true;
-            }
-        }
+// ==================== 事件推送 ====================
+
+let eventSource = null;
+let resyncing = false; // 正在重新拉取状态，期间忽略推送事件
+let renderPending = false;
+
+// 合并同一帧内的多次渲染
+function scheduleRender() {
+    if (renderPending) {
+        return;
+    }
+    renderPending = true;
+    requestAnimationFrame(() => {
+        renderPending = false;
+        renderSystemState(buildStateFromCache());
+    });
+}
+
+// 按本地序列号重新拉取增量（或全量）状态
+async function resyncSystemState() {
+    if (resyncing) {
+        return;
+    }
+    resyncing = true;
+    try {
+        await refreshSystemState();
+    } finally {
+        resyncing = false;
+    }
+}
 
-        // 更新上次修改的行集合
-        lastModifiedRows = currentModifiedRows;
+// 处理服务端推送的MVCC事件
+function handleMvccEvent(event) {
+    if (resyncing || stateCache === null) {
+        return;
+    }
+    if (event.type === 'resync' || event.type === 'reset') {
+        resyncSystemState();
+        return;
+    }
+    if (event.seq <= stateSeq) {
+        return; // 已经同步过的事件
+    }
+    if (event.since !== stateSeq) {
+        resyncSystemState(); // 中间有遗漏的事件
+        return;
+    }
 
-        systemState = state; // 保存全局状态
+    if (event.delta.full) {
+        rebuildStateCache(event.delta);
+    } else {
+        applyStateDelta(event.delta);
+    }
+    stateSeq = event.seq;
+    scheduleRender();
+}
 
-        renderActiveTransactions(state.transactions.active);
-        updateOpTrxSelect(state.transactions.active);
-        renderCommittedTransactions(state.transactions.committed);
-        renderDataRows(state.rows);
-        renderUndoLogs(state.undo_logs);
-        renderReadViews(state.transactions.active);
+// 建立事件流连接，断线后浏览器会携带Last-Event-ID自动重连续传
+function connectEventStream() {
+    const query = stateSeq === null ? '' : `?since=${stateSeq}`;
+    eventSource = new EventSource(`${API_BASE}/events${query}`);
+    eventSource.addEventListener('mvcc', (e) => handleMvccEvent(JSON.parse(e.data)));
+}
 
-        // 处理版本链显示
-        if (shouldClearVersionChain) {
-            // 清空版本链显示
-            const container = document.getElementById('versionChain');
-            container.innerHTML = '<p style="color: #718096; text-align: center;">该数据行已被删除</p>';
-            selectedRowId = null; // 清除选中状态
-        } else if (shouldRefreshVersionChain && selectedRowId !== null) {
-            // 只在选中行被修改时才刷新版本链
-            showVersionChain(selectedRowId);
+// 渲染系统状态
+function renderSystemState(state) {
+    // 收集当前所有被修改的行
+    const currentModifiedRows = new Set();
+    state.transactions.active.forEach(trx => {
+        if (trx.modified_rows) {
+            trx.modified_rows.forEach(rowId => currentModifiedRows.add(rowId));
         }
+    });
 
-        // 如果在分屏模式，更新分屏视图
-        if (currentViewMode === 'split') {
-            updateSplitViewSelects(state.transactions.active);
+    // 检查Undo Log是否发生变化（用于检测回滚）
+    const currentUndoLogCount = state.undo_logs.length;
+    const undoLogChanged = lastUndoLogCount !== currentUndoLogCount;
+    lastUndoLogCount = currentUndoLogCount;
+
+    // 检查选中的行是否被修改或删除
+    let shouldRefreshVersionChain = false;
+    let shouldClearVersionChain = false;
+
+    if (selectedRowId !== null) {
+        // 检查选中的行是否还存在
+        const rowExists = state.rows.some(row => row.row_id === selectedRowId);
+
+        if (!rowExists) {
+            // 行已被删除，需要清空版本链显示
+            shouldClearVersionChain = true;
+        } else if (currentModifiedRows.has(selectedRowId) && !lastModifiedRows.has(selectedRowId)) {
+            // 如果选中的行在本次刷新中被修改了（且上次没有被修改），则需要刷新版本链
+            shouldRefreshVersionChain = true;
+        } else if (undoLogChanged) {
+            // 如果Undo Log发生变化（可能是回滚），也需要刷新版本链
+            shouldRefreshVersionChain = true;
         }
-    } catch (error) {
-        console.error('刷新状态失败:', error);
+    }
+
+    // 更新上次修改的行集合
+    lastModifiedRows = currentModifiedRows;
+
+    systemState = state; // 保存全局状态
+
+    renderActiveTransactions(state.transactions.active);
+    updateOpTrxSelect(state.transactions.active);
+    renderCommittedTransactions(state.transactions.committed);
+    renderDataRows(state.rows);
+    renderUndoLogs(state.undo_logs);
+    renderReadViews(state.transactions.active);
+
+    // 处理版本链显示
+    if (shouldClearVersionChain) {
+        // 清空版本链显示
+        const container = document.getElementById('versionChain');
+        container.innerHTML = '<p style="color: #718096; text-align: center;">该数据行已被删除</p>';
+        selectedRowId = null; // 清除选中状态
+    } else if (shouldRefreshVersionChain && selectedRowId !== null) {
+        // 只在选中行被修改时才刷新版本链
+        showVersionChain(selectedRowId);
+    }
+
+    // 如果在分屏模式，更新分屏视图
+    if (currentViewMode === 'split') {
+        updateSplitViewSelects(state.transactions.active);
     }
 }
 
@@ -710,7 +849,9 @@ function renderActiveTransactions(transactions) {
     }
 
     container.innerHTML = transactions.map(trx => {
+        // 状态中只附带最近的几条操作，operation_count为操作总数
         const operations = trx.operations || [];
+        const operationCount = trx.operation_count || operations.length;
         const modifiedRows = trx.modified_rows || [];
         const readView = trx.read_view;
 
@@ -746,7 +887,7 @@ function renderActiveTransactions(transactions) {
                 <!-- Operation History with Data -->
                 ${operations.length > 0 ? `
                     <div class="transaction-operations">
-                        <div class="operations-title">📝 操作历史 (${operations.length})</div>
+                        <div class="operations-title">📝 操作历史 (${operationCount})</div>
                         <div class="operations-list">
                             ${operations.slice(-5).map(op => `
                                 <div class="operation-item op-${op.type}">
@@ -762,7 +903,7 @@ function renderActiveTransactions(transactions) {
                                     ` : ''}
                                 </div>
                             `).join('')}
-                            ${operations.length > 5 ? `<div class="operations-more">...还有 ${operations.length - 5} 条</div>` : ''}
+                            ${operationCount > 5 ? `<div class="operations-more">...还有 ${operationCount - 5} 条</div>` : ''}
                         </div>
                     </div>
                 ` : ''}
@@ -797,6 +938,7 @@ function renderCommittedTransactions(transactions) {
 
     container.innerHTML = transactions.slice(-10).reverse().map(trx => {
         const operations = trx.operations || [];
+        const operationCount = trx.operation_count || operations.length;
         const modifiedRows = trx.modified_rows || [];
 
         return `
@@ -820,7 +962,7 @@ function renderCommittedTransactions(transactions) {
                 <!-- Operation Details with Data -->
                 ${operations.length > 0 ? `
                     <div class="transaction-operations">
-                        <div class="operations-title">📝 操作详情 (${operations.length})</div>
+                        <div class="operations-title">📝 操作详情 (${operationCount})</div>
                         <div class="operations-list">
                             ${operations.map(op => `
                                 <div class="operation-item op-${op.type}">
@@ -836,6 +978,7 @@ function renderCommittedTransactions(transactions) {
                                     ` : ''}
                                 </div>
                             `).join('')}
+                            ${operationCount > operations.length ? `<div class="operations-more">...之前还有 ${operationCount - operations.length} 条</div>` : ''}
                         </div>
                     </div>
                 ` : ''}
@@ -1263,10 +1406,15 @@ async function showVersionChain(rowId) {
 // 页面加载时初始化
 document.addEventListener('DOMContentLoaded', () => {
     initPrincipleToggles();
-    refreshSystemState();
-
-    // 每3秒自动刷新一次
-    setInterval(refreshSystemState, 3000);
+    refreshSystemState().then(() => {
+        if (window.EventSource) {
+            // 由服务端推送变更事件
+            connectEventStream();
+        } else {
+            // 不支持EventSource的浏览器退回每3秒轮询一次
+            setInterval(refreshSystemState, 3000);
+        }
+    });
 });
 
 // ==================== 分屏对比视图功能 ====================
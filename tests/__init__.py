@@ -0,0 +1,4 @@
+"""
+InnoDB MVCC 测试
+运行：python -m pytest -q tests
+"""
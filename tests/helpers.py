@@ -0,0 +1,20 @@
+"""测试共用的辅助函数"""
+from mvcc_system import MVCCSystem
+
+
+def committed_rows(system: MVCCSystem, count: int, data: dict) -> list:
+    """由一个已提交的事务插入count行"""
+    trx_id = system.begin_transaction()['trx_id']
+    row_ids = [system.insert_data(trx_id, dict(data))['row_id'] for _ in range(count)]
+    system.commit_transaction(trx_id)
+    return row_ids
+
+
+def without_times(value):
+    """去掉状态中的时间戳，便于比较两个系统的状态"""
+    if isinstance(value, dict):
+        return {key: without_times(item) for key, item in value.items()
+                if not (isinstance(key, str) and (key.endswith('_time') or key == 'timestamp'))}
+    if isinstance(value, list):
+        return [without_times(item) for item in value]
+    return value
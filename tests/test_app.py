@@ -0,0 +1,45 @@
+"""HTTP接口：条件请求与分页"""
+from app import app
+
+
+def _client(workspace_id: str):
+    client = app.test_client()
+    headers = {'X-Workspace-Id': workspace_id}
+    client.post('/api/system/reset', headers=headers)
+    return client, headers
+
+
+def test_row_etag_changes_only_when_the_row_changes():
+    """行的ETag在该行被修改前保持不变（If-None-Match返回304），修改后返回新内容"""
+    client, headers = _client('etag-row')
+    trx_id = client.post('/api/transaction/begin', json={}, headers=headers).get_json()['trx_id']
+    row_id = client.post('/api/data/insert', json={'trx_id': trx_id, 'data': {'v': 1}},
+                         headers=headers).get_json()['row_id']
+    etag = client.get(f'/api/row/{row_id}', headers=headers).headers['ETag']
+    conditional = dict(headers, **{'If-None-Match': etag})
+
+    client.post('/api/transaction/begin', json={}, headers=headers)  # 与该行无关的变化
+    assert client.get(f'/api/row/{row_id}', headers=conditional).status_code == 304
+    client.post('/api/data/update', json={'trx_id': trx_id, 'row_id': row_id, 'data': {'v': 2}}, headers=headers)
+    changed = client.get(f'/api/row/{row_id}', headers=conditional)
+    assert changed.status_code == 200 and changed.get_json()['row']['data'] == {'v': 2}
+    assert client.get('/api/row/999', headers=headers).status_code == 404
+
+
+def test_state_etag_depends_on_since():
+    """全量状态的ETag不能让增量请求得到304，不同since的增量ETag也不同"""
+    client, headers = _client('etag-since')
+    full = client.get('/api/system/state', headers=headers)
+    since = full.get_json()['seq']
+    trx_id = client.post('/api/transaction/begin', json={}, headers=headers).get_json()['trx_id']
+    client.post('/api/data/insert', json={'trx_id': trx_id, 'data': {'v': 1}}, headers=headers)
+
+    full = client.get('/api/system/state', headers=headers)
+    url = f'/api/system/state?since={since}'
+    delta = client.get(url, headers=dict(headers, **{'If-None-Match': full.headers['ETag']}))
+    assert delta.status_code == 200 and delta.get_json()['rows']['created']
+    later = client.get(f'/api/system/state?since={since + 1}',
+                       headers=dict(headers, **{'If-None-Match': delta.headers['ETag']}))
+    assert later.status_code == 200 and later.headers['ETag'] != delta.headers['ETag']
+    again = client.get(url, headers=dict(headers, **{'If-None-Match': delta.headers['ETag']}))
+    assert again.status_code == 304
@@ -0,0 +1,59 @@
+"""ASGI模式：单写者队列中的行锁等待与批量操作"""
+import asyncio
+import json
+import time
+
+
+def _asgi_request(asgi_app, path: str, payload: dict) -> dict:
+    """向ASGI应用发送一个JSON POST请求（协程），返回解析后的响应体"""
+    async def call():
+        messages = [{'type': 'http.request', 'body': json.dumps(payload).encode('utf-8'), 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'', 'root_path': '',
+                 'headers': [(b'content-type', b'application/json'), (b'x-workspace-id', b'asgi-locks')]}
+        await asgi_app(scope, receive, send)
+        return json.loads(b''.join(message.get('body', b'') for message in sent[1:]))
+    return call()
+
+
+def test_asgi_lock_waits_keep_deadlock_detection():
+    """ASGI模式：互相等待的更新由死锁检测处理而不是各自超时；批量操作中的锁等待不阻塞写者线程"""
+    from asgi import app as asgi_app
+
+    async def scenario():
+        request = lambda path, **payload: _asgi_request(asgi_app, path, payload)  # noqa: E731
+        await request('/api/system/reset')
+        t0 = (await request('/api/transaction/begin'))['trx_id']
+        row_a = (await request('/api/data/insert', trx_id=t0, data={'v': 0}))['row_id']
+        row_b = (await request('/api/data/insert', trx_id=t0, data={'v': 0}))['row_id']
+        await request('/api/transaction/commit', trx_id=t0)
+        t1 = (await request('/api/transaction/begin'))['trx_id']
+        t2 = (await request('/api/transaction/begin'))['trx_id']
+        await request('/api/data/update', trx_id=t1, row_id=row_a, data={'v': 1})
+        await request('/api/data/update', trx_id=t2, row_id=row_b, data={'v': 2})
+
+        start = time.perf_counter()
+        first = asyncio.ensure_future(
+            request('/api/data/update', trx_id=t1, row_id=row_b, data={'v': 1}, lock_wait_timeout=5))
+        await asyncio.sleep(0.1)
+        second = await request('/api/data/update', trx_id=t2, row_id=row_a, data={'v': 2}, lock_wait_timeout=5)
+        first = await first
+        assert time.perf_counter() - start < 1
+        assert sorted([first.get('deadlock', False), second.get('deadlock', False)]) == [False, True]
+        assert (first if second.get('deadlock') else second)['success']
+
+        batch_start = time.perf_counter()
+        t3 = (await request('/api/transaction/begin'))['trx_id']
+        batch = await request('/api/batch', operations=[
+            {'op': 'update', 'trx_id': t3, 'row_id': row_a, 'data': {'v': 3}, 'lock_wait_timeout': 5}])
+        assert time.perf_counter() - batch_start < 1
+        assert batch['results'][0]['blocking_trx_id'] is not None
+
+    asyncio.run(scenario())
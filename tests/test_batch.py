@@ -0,0 +1,67 @@
+"""批量执行：命名引用、出错时停止或继续，以及/api/batch接口"""
+from app import app
+from mvcc_system import MVCCSystem
+
+
+def test_batch_resolves_named_transactions_and_rows():
+    """begin / insert用as命名，后续操作用trx / row引用，按顺序返回每个操作的结果"""
+    system = MVCCSystem()
+    result = system.execute_batch([
+        {'op': 'begin', 'as': 't1'},
+        {'op': 'insert', 'trx': 't1', 'data': {'v': 1}, 'as': 'r1'},
+        {'op': 'update', 'trx': 't1', 'row': 'r1', 'data': {'v': 2}},
+        {'op': 'commit', 'trx': 't1'},
+        {'op': 'begin', 'as': 't2'},
+        {'op': 'read', 'trx': 't2', 'row': 'r1'},
+    ])
+    assert result['success'] is True
+    assert result['executed'] == 6
+    assert [r['op'] for r in result['results']] == ['begin', 'insert', 'update', 'commit', 'begin', 'read']
+    assert [r['index'] for r in result['results']] == list(range(6))
+    assert result['results'][-1]['data'] == {'v': 2}
+
+
+def test_batch_stops_or_continues_after_an_error():
+    """stop_on_error为True时在第一个失败的操作处停止，为False时继续执行其余操作"""
+    operations = [
+        {'op': 'begin', 'as': 't'},
+        {'op': 'bogus'},
+        {'op': 'insert', 'trx': 't', 'data': {'v': 1}},
+    ]
+    stopped = MVCCSystem().execute_batch(operations)
+    assert (stopped['success'], stopped['executed']) == (False, 2)
+    assert stopped['results'][1]['error'] == 'Unknown operation: bogus'
+
+    continued = MVCCSystem().execute_batch(operations, stop_on_error=False)
+    assert (continued['success'], continued['executed']) == (False, 3)
+    assert [r['success'] for r in continued['results']] == [True, False, True]
+
+
+def test_batch_lock_conflict_does_not_wait():
+    """批次内两个事务更新同一行时，后者立即失败而不是等待到超时"""
+    system = MVCCSystem(lock_wait_timeout=5)
+    result = system.execute_batch([
+        {'op': 'begin', 'as': 'setup'},
+        {'op': 'insert', 'trx': 'setup', 'data': {'v': 0}, 'as': 'row'},
+        {'op': 'commit', 'trx': 'setup'},
+        {'op': 'begin', 'as': 't1'},
+        {'op': 'begin', 'as': 't2'},
+        {'op': 'update', 'trx': 't1', 'row': 'row', 'data': {'v': 1}},
+        {'op': 'update', 'trx': 't2', 'row': 'row', 'data': {'v': 2}},
+    ], stop_on_error=False)
+    assert [r['success'] for r in result['results']][-2:] == [True, False]
+
+
+def test_batch_endpoint():
+    """/api/batch以一个请求执行整个批次"""
+    client = app.test_client()
+    headers = {'X-Workspace-Id': 'batch'}
+    client.post('/api/system/reset', headers=headers)
+    response = client.post('/api/batch', headers=headers, json={'operations': [
+        {'op': 'begin', 'as': 't'},
+        {'op': 'insert', 'trx': 't', 'data': {'v': 1}, 'as': 'r'},
+        {'op': 'commit', 'trx': 't'},
+    ]}).get_json()
+    assert response['success'] is True
+    row_id = response['results'][1]['row_id']
+    assert client.get(f'/api/row/{row_id}', headers=headers).get_json()['row']['data'] == {'v': 1}
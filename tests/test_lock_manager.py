@@ -0,0 +1,132 @@
+"""行锁：写写冲突、FIFO等待队列、超时与死锁检测"""
+import threading
+import time
+
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows
+
+
+def _wait_until_waiting(system: MVCCSystem, count: int = 1):
+    while len(system.get_lock_status()['waiting']) < count:
+        time.sleep(0.001)
+
+
+def test_conflicting_update_times_out_without_rolling_back():
+    """另一个活跃事务持有行锁时更新等待超时，返回持有者，事务本身不回滚"""
+    system = MVCCSystem()
+    row_id, = committed_rows(system, 1, {'v': 0})
+    holder = system.begin_transaction()['trx_id']
+    waiter = system.begin_transaction()['trx_id']
+    assert system.update_data(holder, row_id, {'v': 1})['success']
+
+    result = system.update_data(waiter, row_id, {'v': 2}, 0.05)
+    assert not result['success'] and result['blocking_trx_id'] == holder
+    assert system.transaction_manager.get_transaction(waiter).is_active()
+    assert system.delete_data(waiter, row_id, 0)['blocking_trx_id'] == holder
+    status = system.get_lock_status()
+    assert (status['lock_waits'], status['lock_wait_timeouts']) == (2, 2)
+    assert status['lock_wait_time_us_total'] > 0
+
+
+def test_uncommitted_insert_is_implicitly_locked():
+    """未提交的INSERT行被插入事务隐式锁定，其他事务修改时等待"""
+    system = MVCCSystem()
+    inserter = system.begin_transaction()['trx_id']
+    row_id = system.insert_data(inserter, {'v': 0})['row_id']
+    other = system.begin_transaction()['trx_id']
+    assert system.delete_data(other, row_id, 0)['blocking_trx_id'] == inserter
+    system.commit_transaction(inserter)
+    assert system.delete_data(other, row_id, 0)['success']
+
+
+def test_released_lock_is_granted_to_waiters_in_fifo_order():
+    """持有者提交后行锁按到达顺序授予等待者，后一个等待者在前一个结束后获得锁"""
+    system = MVCCSystem()
+    row_id, = committed_rows(system, 1, {'v': 0})
+    holder, first, second = (system.begin_transaction()['trx_id'] for _ in range(3))
+    system.update_data(holder, row_id, {'v': 'holder'})
+    order = []
+
+    def update(trx_id):
+        assert system.update_data(trx_id, row_id, {'v': trx_id}, 5)['success']
+        order.append(trx_id)
+        system.commit_transaction(trx_id)
+
+    threads = [threading.Thread(target=update, args=(trx_id,)) for trx_id in (first, second)]
+    threads[0].start()
+    _wait_until_waiting(system, 1)
+    threads[1].start()
+    _wait_until_waiting(system, 2)
+    system.commit_transaction(holder)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == [first, second]
+    reader = system.begin_transaction()['trx_id']
+    assert system.read_data(reader, row_id)['data'] == {'v': second}
+    assert system.get_lock_status()['row_locks'] == 0
+
+
+def test_deadlock_victim_is_rolled_back_and_survivor_granted():
+    """两个事务交叉更新两行：等待中的事务被选为牺牲者并回滚，另一个事务获得锁"""
+    system = MVCCSystem()
+    row_a, row_b, row_c = committed_rows(system, 3, {'v': 0})
+    t1 = system.begin_transaction()['trx_id']
+    t2 = system.begin_transaction()['trx_id']
+    system.update_data(t1, row_a, {'v': 1})
+    system.update_data(t2, row_b, {'v': 2})
+    system.update_data(t2, row_c, {'v': 2})  # t2的回滚代价更大
+
+    results = {}
+    waiter = threading.Thread(target=lambda: results.setdefault('t1', system.update_data(t1, row_b, {'v': 1}, 5)))
+    waiter.start()
+    _wait_until_waiting(system)
+    survivor = system.update_data(t2, row_a, {'v': 2}, 5)
+    waiter.join(5)
+
+    assert results['t1']['deadlock']
+    assert system.transaction_manager.get_transaction(t1).status.value == 'aborted'
+    assert survivor == {'success': True, 'row_id': row_a}
+    system.commit_transaction(t2)
+    reader = system.begin_transaction()['trx_id']
+    assert [system.read_data(reader, row_id)['data'] for row_id in (row_a, row_b, row_c)] == [{'v': 2}] * 3
+    assert system.get_lock_status()['deadlocks'] == 1
+
+
+def test_nonblocking_lock_wait_detects_deadlock_and_retries_are_not_new_waits():
+    """不阻塞的加锁仍进入等待队列：重试不增加锁等待计数与锁状态版本，形成环时牺牲者回滚、另一方获得锁"""
+    system = MVCCSystem()
+    row_a, row_b, row_c = committed_rows(system, 3, {'v': 0})
+    t1 = system.begin_transaction()['trx_id']
+    t2 = system.begin_transaction()['trx_id']
+    assert system.update_data(t1, row_a, {'v': 1})['success']
+    assert system.update_data(t2, row_b, {'v': 2})['success']
+    assert system.update_data(t2, row_c, {'v': 2})['success']  # t2的回滚代价更大，t1将成为牺牲者
+
+    assert system.update_data(t1, row_b, {'v': 1}, 5, block=False)['lock_waiting']
+    locks, version = system.get_lock_status(), system.lock_manager.version
+    assert system.update_data(t1, row_b, {'v': 1}, 5, block=False)['lock_waiting']
+    assert system.lock_manager.version == version
+    assert system.get_lock_status()['lock_waits'] == locks['lock_waits'] == 1
+    assert locks['waiting'] == [{'trx_id': t1, 'row_id': row_b, 'blocking_trx_id': t2}]
+
+    assert system.update_data(t2, row_a, {'v': 2}, 5, block=False)['lock_waiting']  # 形成环，选中等待中的t1
+    victim = system.update_data(t1, row_b, {'v': 1}, 5, block=False)
+    assert victim['deadlock'] and not system.transaction_manager.get_transaction(t1).is_active()
+    assert system.update_data(t2, row_a, {'v': 2}, 5, block=False) == {'success': True, 'row_id': row_a}
+    assert system.get_lock_status()['deadlocks'] == 1
+
+
+def test_nonblocking_lock_wait_times_out():
+    """不阻塞的加锁超过lock_wait_timeout后的重试返回超时，并离开等待队列"""
+    system = MVCCSystem()
+    row_id, = committed_rows(system, 1, {'v': 0})
+    holder = system.begin_transaction()['trx_id']
+    waiter = system.begin_transaction()['trx_id']
+    system.update_data(holder, row_id, {'v': 1})
+    assert system.delete_data(waiter, row_id, 0.05, block=False)['lock_waiting']
+    time.sleep(0.06)
+    result = system.delete_data(waiter, row_id, 0.05, block=False)
+    assert result['blocking_trx_id'] == holder and 'lock_waiting' not in result
+    status = system.get_lock_status()
+    assert (status['waiting'], status['lock_waits'], status['lock_wait_timeouts']) == ([], 1, 1)
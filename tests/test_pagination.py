@@ -0,0 +1,120 @@
+"""分页接口：行、事务与Undo日志的游标分页与筛选"""
+from app import app, stream_page
+from latch import SortedIdIndex
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows
+
+
+def test_list_rows_cursor_range_and_changed_since():
+    """after游标与row_id范围共同限定起点，changed_since只列出之后变更过的行"""
+    system = MVCCSystem()
+    row_ids = committed_rows(system, 6, {'v': 0})
+    listed = system.list_rows(after=row_ids[1], end_row_id=row_ids[4])
+    assert [row['row_id'] for row in listed['rows']] == row_ids[2:5]
+
+    seq = listed['seq']
+    trx_id = system.begin_transaction()['trx_id']
+    system.update_data(trx_id, row_ids[3], {'v': 1})
+    system.commit_transaction(trx_id)
+    changed = system.list_rows(changed_since=seq)
+    assert changed['full'] is False
+    assert [row['row_id'] for row in changed['rows']] == [row_ids[3]]
+
+
+def test_list_transactions_cursor_and_status_filter():
+    """按trx_id游标分页并按状态筛选，历史淘汰的事务不再出现"""
+    system = MVCCSystem(trx_history_size=2)
+    trx_ids = [system.begin_transaction()['trx_id'] for _ in range(6)]
+    for trx_id in trx_ids[:4]:
+        system.commit_transaction(trx_id)
+    system.rollback_transaction(trx_ids[4])
+
+    listed = system.list_transactions()
+    assert [trx['trx_id'] for trx in listed['transactions']] == trx_ids[2:]
+    listed = system.list_transactions(after=trx_ids[2], statuses=['committed', 'active'])
+    assert [trx['trx_id'] for trx in listed['transactions']] == [trx_ids[3], trx_ids[5]]
+    assert system.list_transactions(statuses=['bogus'])['success'] is False
+
+
+def test_list_undo_logs_cursor_and_filters():
+    """Undo日志按undo_id游标分页，可按事务（活跃或已结束）与行筛选，回滚与purge删除的不再出现"""
+    system = MVCCSystem()
+    first, second = committed_rows(system, 2, {'v': 0})
+    writer = system.begin_transaction()['trx_id']
+    system.update_data(writer, first, {'v': 1})
+    system.update_data(writer, second, {'v': 1})
+    system.update_data(writer, first, {'v': 2})
+
+    def undo_ids(**filters):
+        return [undo['undo_id'] for undo in system.list_undo_logs(**filters)['undo_logs']]
+
+    segment = undo_ids(trx_id=writer)
+    assert len(segment) == 3
+    assert undo_ids(trx_id=writer, after=segment[0]) == segment[1:]
+    assert undo_ids(row_id=first, after=segment[0]) == [segment[2]]
+    everything = undo_ids()
+    assert everything[-3:] == segment
+    assert undo_ids(after=everything[1]) == everything[2:]
+
+    system.commit_transaction(writer)
+    assert undo_ids(trx_id=writer) == segment
+    loser = system.begin_transaction()['trx_id']
+    system.delete_data(loser, second)
+    system.rollback_transaction(loser)
+    system.purge()
+    assert undo_ids() == sorted(system.undo_log_manager.undo_logs)
+    assert not set(undo_ids()) - set(everything)
+
+
+def test_sorted_id_index_compacts_removed_ids():
+    """删除只计数，超过一半后只保留仍存在的ID；遍历期间重建不会错位，尚未重建时由调用方跳过已删除的ID"""
+    live = dict.fromkeys(range(1, 11))
+    index = SortedIdIndex([3, 1, 2])
+    for id_ in range(4, 11):
+        index.add(id_)
+    ids = index.iter_after(2)
+    assert next(ids) == 3
+    for id_ in range(1, 8):
+        del live[id_]
+        index.discard(1, live)
+    assert (index.ids, index.removed) == ([7, 8, 9, 10], 1)
+    assert list(ids) == [7, 8, 9, 10]
+    assert list(index.iter_after(7)) == [8, 9, 10]
+
+
+def test_paginated_endpoint_follows_next_cursor():
+    """接口按limit分页，next_cursor作为下一页的after，最后一页为null"""
+    client = app.test_client()
+    headers = {'X-Workspace-Id': 'pagination'}
+    client.post('/api/system/reset', headers=headers)
+    trx_id = client.post('/api/transaction/begin', json={}, headers=headers).get_json()['trx_id']
+    for value in range(5):
+        client.post('/api/data/insert', json={'trx_id': trx_id, 'data': {'v': value}}, headers=headers)
+
+    pages, after = [], ''
+    while after is not None:
+        page = client.get(f'/api/undo_logs?limit=2&after={after}', headers=headers).get_json()
+        pages.append([undo['undo_id'] for undo in page['undo_logs']])
+        after = page['next_cursor']
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(sum(pages, [])) == sum(pages, [])
+
+
+def test_stream_page_closes_items_when_response_is_closed():
+    """客户端提前断开时，记录生成器也被关闭"""
+    closed = []
+
+    def items():
+        try:
+            for id_ in range(10):
+                yield {'id': id_}
+        finally:
+            closed.append(True)
+
+    records = items()  # 保持引用，生成器不会因回收而被关闭
+    with app.test_request_context():
+        body = stream_page({'success': True, 'items': records}, 'items', 'id', 5).response
+    next(body)
+    next(body)
+    body.close()
+    assert closed == [True]
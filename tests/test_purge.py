@@ -0,0 +1,46 @@
+"""Purge：按ReadView低水位回收Undo日志与删除标记的行"""
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows
+
+
+def test_purge_removes_delete_marked_rows_once_no_reader_needs_them():
+    """已提交删除的行在没有更早的ReadView时被物理删除，活跃事务的ReadView会推迟回收"""
+    system = MVCCSystem()
+    kept, deleted = committed_rows(system, 2, {'v': 0})
+    reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+    system.read_data(reader, deleted)
+    trx_id = system.begin_transaction()['trx_id']
+    system.delete_data(trx_id, deleted)
+    system.commit_transaction(trx_id)
+
+    system.purge()
+    assert system.data_row_manager.get_row(deleted) is not None
+    assert system.read_data(reader, deleted)['data'] == {'v': 0}
+
+    system.commit_transaction(reader)
+    result = system.purge()
+    assert result['purged_rows'] == 1
+    assert system.data_row_manager.get_row(deleted) is None
+    assert [row['row_id'] for row in system.get_system_state()['rows']] == [kept]
+
+
+def test_purge_keeps_versions_a_reader_still_needs():
+    """REPEATABLE READ事务的ReadView仍需要旧版本时purge不回收，事务结束后才回收"""
+    system = MVCCSystem()
+    row_id, = committed_rows(system, 1, {'v': 0})
+    reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+    assert system.read_data(reader, row_id)['data'] == {'v': 0}
+
+    for value in (1, 2):
+        writer = system.begin_transaction()['trx_id']
+        system.update_data(writer, row_id, {'v': value})
+        system.commit_transaction(writer)
+    system.purge()
+
+    assert system.read_data(reader, row_id)['data'] == {'v': 0}
+    latest = system.begin_transaction()['trx_id']
+    assert system.read_data(latest, row_id)['data'] == {'v': 2}
+    system.commit_transaction(latest)
+    system.commit_transaction(reader)
+    assert system.purge()['purged_undo_logs'] > 0
+    assert system.get_system_state()['purge']['history_list_length'] == 0
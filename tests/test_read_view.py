@@ -0,0 +1,34 @@
+"""ReadView：可见性规则与快照读"""
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows
+from transaction import ReadView
+
+
+def test_visibility_rules():
+    """自己的修改可见；min_trx_id之前可见；max_trx_id及之后不可见；区间内按是否在m_ids中判断"""
+    read_view = ReadView(creator_trx_id=7, active_trx_ids=[9, 5, 7], max_trx_id=12)
+    assert (read_view.m_ids, read_view.min_trx_id) == ([5, 7, 9], 5)
+    assert read_view.is_visible(7)
+    assert read_view.is_visible(4)
+    assert not read_view.is_visible(5)
+    assert read_view.is_visible(6)
+    assert not read_view.is_visible(9)
+    assert read_view.is_visible(11)
+    assert not read_view.is_visible(12)
+    assert ReadView.from_tuple(read_view.to_tuple()).to_dict() == read_view.to_dict()
+
+
+def test_snapshot_read_with_many_active_transactions():
+    """大量并发活跃事务时，REPEATABLE READ只看到创建ReadView时已提交的版本"""
+    system = MVCCSystem()
+    row_id, = committed_rows(system, 1, {'v': 0})
+    writers = [system.begin_transaction()['trx_id'] for _ in range(200)]
+    reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+    assert system.read_data(reader, row_id)['data'] == {'v': 0}
+
+    system.update_data(writers[100], row_id, {'v': 1})
+    system.commit_transaction(writers[100])
+    assert system.read_data(reader, row_id)['data'] == {'v': 0}
+
+    fresh = system.begin_transaction()['trx_id']
+    assert system.read_data(fresh, row_id)['data'] == {'v': 1}
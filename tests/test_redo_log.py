@@ -0,0 +1,71 @@
+"""Redo日志：崩溃恢复、检查点与持久化工作区"""
+import shutil
+
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows, without_times
+from workspace import WorkspacePool
+
+
+def test_recovery_without_operation_history(tmp_path):
+    """operation_history_size为0的系统也能重放DML并恢复"""
+    system = MVCCSystem.open(str(tmp_path), operation_history_size=0)
+    system.checkpoint()  # 检查点保存配置，之后的DML由重放恢复
+    row_id, = committed_rows(system, 1, {'v': 0})
+    trx_id = system.begin_transaction()['trx_id']
+    system.update_data(trx_id, row_id, {'v': 1})
+    system.commit_transaction(trx_id)
+    system.close()
+
+    recovered = MVCCSystem.open(str(tmp_path))
+    reader = recovered.begin_transaction()['trx_id']
+    assert recovered.read_data(reader, row_id)['data'] == {'v': 1}
+    recovered.close()
+
+
+def test_redo_recovery_after_crash_restores_identical_state(tmp_path):
+    """崩溃（不关闭日志，复制数据目录）后重新打开：已提交的状态与原系统回滚未提交事务后的状态相同"""
+    system = MVCCSystem.open(str(tmp_path / 'db'))
+    row_a, row_b = committed_rows(system, 2, {'v': 0})
+    trx_id = system.begin_transaction()['trx_id']
+    system.update_data(trx_id, row_a, {'v': 1})
+    system.delete_data(trx_id, row_b)
+    system.commit_transaction(trx_id)
+    system.purge()
+    committed_rows(system, 1, {'v': 4})  # 提交时PURGE记录随之落盘
+    uncommitted = system.begin_transaction()['trx_id']
+    system.update_data(uncommitted, row_a, {'v': 2})
+    system.insert_data(uncommitted, {'v': 3})
+    shutil.copytree(str(tmp_path / 'db'), str(tmp_path / 'crash'))
+    system.rollback_transaction(uncommitted)
+
+    recovered = MVCCSystem.open(str(tmp_path / 'crash'))
+    expected, state = system.get_system_state(), recovered.get_system_state()
+    for key in ('rows', 'undo_logs', 'version_chains', 'locks'):
+        assert without_times(state[key]) == without_times(expected[key]), key
+    assert ([trx['trx_id'] for trx in state['transactions']['committed']]
+            == [trx['trx_id'] for trx in expected['transactions']['committed']])
+    assert state['transactions']['active'] == []
+    reader = recovered.begin_transaction()['trx_id']
+    assert recovered.read_data(reader, row_a)['data'] == {'v': 1}
+    recovered.close()
+    system.close()
+
+
+def test_persistent_workspaces_survive_pool_restart(tmp_path):
+    """配置data_dir时工作区写入Redo日志，新建的池（服务重启）从数据目录恢复已提交的数据"""
+    pool = WorkspacePool(idle_timeout=None, memory_budget=None, data_dir=str(tmp_path))
+    workspace = pool.acquire('a')
+    trx_id = workspace.system.begin_transaction()['trx_id']
+    row_id = workspace.system.insert_data(trx_id, {'v': 1})['row_id']
+    workspace.system.commit_transaction(trx_id)
+    workspace.system.insert_data(workspace.system.begin_transaction()['trx_id'], {'v': 2})  # 未提交
+    pool.release(workspace)
+    pool.close()
+
+    restarted = WorkspacePool(idle_timeout=None, memory_budget=None, data_dir=str(tmp_path))
+    system = restarted.acquire('a').system
+    assert [row['data'] for row in system.get_system_state()['rows']] == [{'v': 1}]
+    reader = system.begin_transaction()['trx_id']
+    assert system.read_data(reader, row_id)['data'] == {'v': 1}
+    assert restarted.get_status()['restored'] == 1
+    restarted.close()
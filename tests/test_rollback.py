@@ -0,0 +1,52 @@
+"""回滚：按事务自身的回滚段逆序撤销修改"""
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows, without_times
+
+
+def test_rollback_restores_rows_and_removes_own_undo_logs():
+    """回滚撤销本事务的插入、多次更新与删除，只删除本事务的Undo日志，行头恢复为回滚前的状态"""
+    system = MVCCSystem()
+    first, second, third = committed_rows(system, 3, {'v': 0, 'w': 'x'})
+    writer = system.begin_transaction()['trx_id']
+    system.update_data(writer, first, {'v': 1})
+    system.commit_transaction(writer)
+    before = without_times(system.get_system_state())
+    other_undo_ids = set(system.undo_log_manager.undo_logs)
+
+    trx_id = system.begin_transaction()['trx_id']
+    system.update_data(trx_id, first, {'v': 2, 'w': 'y'})
+    system.update_data(trx_id, first, {'v': 3})
+    system.delete_data(trx_id, second)
+    system.update_data(trx_id, third, {'v': 4, 'extra': True})
+    inserted = system.insert_data(trx_id, {'v': 5})['row_id']
+    trx = system.transaction_manager.get_transaction(trx_id)
+    assert len(trx.undo_segment) == 5
+
+    assert system.rollback_transaction(trx_id)['success'] is True
+    assert trx.undo_segment == []
+    assert set(system.undo_log_manager.undo_logs) == other_undo_ids
+    assert system.data_row_manager.get_row(inserted) is None
+    after = without_times(system.get_system_state())
+    for key in ('rows', 'undo_logs', 'version_chains'):
+        assert after[key] == before[key]
+
+
+def test_rollback_only_touches_own_changes_on_hot_rows():
+    """其他事务在同一行留下的长Undo链不受回滚影响"""
+    system = MVCCSystem()
+    row_id, = committed_rows(system, 1, {'v': 0})
+    for value in range(1, 50):
+        writer = system.begin_transaction()['trx_id']
+        system.update_data(writer, row_id, {'v': value})
+        system.commit_transaction(writer)
+    chain = list(system.undo_log_manager.row_undo_chains[row_id])
+
+    trx_id = system.begin_transaction()['trx_id']
+    system.update_data(trx_id, row_id, {'v': -1})
+    system.rollback_transaction(trx_id)
+
+    assert list(system.undo_log_manager.row_undo_chains[row_id]) == chain
+    row = system.data_row_manager.get_row(row_id)
+    assert (row.data, row.roll_pointer) == ({'v': 49}, chain[-1])
+    reader = system.begin_transaction()['trx_id']
+    assert system.read_data(reader, row_id)['data'] == {'v': 49}
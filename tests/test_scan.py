@@ -0,0 +1,77 @@
+"""快照范围扫描：按row_id顺序读取ReadView可见的行，扫描期间purge不回收其需要的版本"""
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows
+
+
+def test_scan_returns_visible_rows_in_range_and_limit():
+    """范围与limit按row_id顺序生效，未提交与已删除的行按ReadView判断可见性"""
+    system = MVCCSystem()
+    row_ids = committed_rows(system, 5, {'v': 0})
+    writer = system.begin_transaction()['trx_id']
+    system.delete_data(writer, row_ids[1])
+    system.insert_data(writer, {'v': 'new'})
+    reader = system.begin_transaction()['trx_id']
+
+    scanned = list(system.scan(reader, row_ids[1], row_ids[3])['rows'])
+    assert [row['row_id'] for row in scanned] == row_ids[1:4]
+    assert [row['row_id'] for row in system.scan(reader, limit=2)['rows']] == row_ids[:2]
+
+    system.commit_transaction(writer)
+    visible = [row['row_id'] for row in system.scan(reader)['rows']]  # READ COMMITTED：每次扫描新建ReadView
+    assert row_ids[1] not in visible and len(visible) == 5
+
+
+def test_scan_keeps_versions_while_purge_runs():
+    """READ COMMITTED扫描读到一半时其他事务更新、提交并purge，扫描仍按自己的ReadView返回旧版本"""
+    system = MVCCSystem()
+    row_ids = committed_rows(system, 10, {'v': 0})
+    reader = system.begin_transaction('READ_COMMITTED')['trx_id']
+
+    result = system.scan(reader)
+    rows = result['rows']
+    first = next(rows)
+
+    writer = system.begin_transaction()['trx_id']
+    for row_id in row_ids:
+        system.update_data(writer, row_id, {'v': 1})
+    system.commit_transaction(writer)
+    system.purge()
+
+    scanned = [first] + list(rows)
+    assert [row['row_id'] for row in scanned] == row_ids
+    assert all(row['data'] == {'v': 0} for row in scanned)
+
+    # 扫描结束后ReadView注销，purge可以回收旧版本
+    assert system.transaction_manager.open_read_views == {}
+    assert system.purge()['purged_undo_logs'] > 0
+
+
+def test_repeatable_read_scan_survives_commit_of_its_transaction():
+    """REPEATABLE READ事务在扫描读完之前提交，扫描仍不受purge影响"""
+    system = MVCCSystem()
+    row_ids = committed_rows(system, 5, {'v': 0})
+    reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+    rows = system.scan(reader)['rows']
+    system.commit_transaction(reader)
+
+    writer = system.begin_transaction()['trx_id']
+    for row_id in row_ids:
+        system.update_data(writer, row_id, {'v': 1})
+    system.commit_transaction(writer)
+    system.purge()
+
+    assert [row['data'] for row in rows] == [{'v': 0}] * 5
+
+
+def test_abandoned_scan_releases_read_view():
+    """未读完就被丢弃的扫描同样注销ReadView"""
+    system = MVCCSystem()
+    committed_rows(system, 3, {'v': 0})
+    reader = system.begin_transaction()['trx_id']
+    rows = system.scan(reader)['rows']
+    assert len(system.transaction_manager.open_read_views) == 1
+    rows.close()
+    assert system.transaction_manager.open_read_views == {}
+    del rows
+    system.scan(reader)  # 结果从未被读取
+    assert system.transaction_manager.open_read_views == {}
@@ -0,0 +1,70 @@
+"""二级索引：更新、删除与回滚之后的索引查找以及索引项的回收"""
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows
+
+
+def _lookup(system: MVCCSystem, column: str, value) -> list:
+    """用新事务做一次等值查询，返回可见行的row_id"""
+    trx_id = system.begin_transaction()['trx_id']
+    rows = system.index_lookup(trx_id, column, value, value)['rows']
+    system.commit_transaction(trx_id)
+    return [row['row_id'] for row in rows]
+
+
+def test_index_lookup_after_update_and_delete():
+    """更新后按新值查到该行、按旧值查不到；删除后两者都查不到"""
+    system = MVCCSystem()
+    system.create_index('k')
+    row_id, other = committed_rows(system, 2, {'k': 'a'})
+
+    trx_id = system.begin_transaction()['trx_id']
+    system.update_data(trx_id, row_id, {'k': 'b'})
+    system.commit_transaction(trx_id)
+    assert _lookup(system, 'k', 'a') == [other]
+    assert _lookup(system, 'k', 'b') == [row_id]
+
+    trx_id = system.begin_transaction()['trx_id']
+    system.delete_data(trx_id, row_id)
+    system.commit_transaction(trx_id)
+    assert _lookup(system, 'k', 'b') == []
+    assert _lookup(system, 'k', 'a') == [other]
+
+
+def test_index_lookup_sees_snapshot_version():
+    """REPEATABLE READ事务通过旧值的索引项查到自己快照中的版本"""
+    system = MVCCSystem()
+    system.create_index('k')
+    row_id, = committed_rows(system, 1, {'k': 'a'})
+    reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+    system.read_data(reader, row_id)
+
+    trx_id = system.begin_transaction()['trx_id']
+    system.update_data(trx_id, row_id, {'k': 'b'})
+    system.commit_transaction(trx_id)
+
+    assert [row['data'] for row in system.index_lookup(reader, 'k', 'a', 'a')['rows']] == [{'k': 'a'}]
+    assert system.index_lookup(reader, 'k', 'b', 'b')['rows'] == []
+
+
+def test_rollback_removes_index_entries_of_undone_versions():
+    """回滚后被撤销版本的索引项随即删除，反复更新并回滚不会让索引项增长"""
+    system = MVCCSystem()
+    system.create_index('k')
+    row_id, = committed_rows(system, 1, {'k': 'a'})
+    index = system.data_row_manager.secondary_indexes['k']
+    entries = list(index.entries)
+
+    for value in range(20):
+        trx_id = system.begin_transaction()['trx_id']
+        system.update_data(trx_id, row_id, {'k': f'v{value}'})
+        system.update_data(trx_id, row_id, {'k': f'w{value}'})
+        system.rollback_transaction(trx_id)
+
+        trx_id = system.begin_transaction()['trx_id']
+        system.insert_data(trx_id, {'k': 'inserted'})
+        system.rollback_transaction(trx_id)
+
+    assert index.entries == entries
+    assert _lookup(system, 'k', 'a') == [row_id]
+    assert _lookup(system, 'k', 'v0') == []
+    assert _lookup(system, 'k', 'inserted') == []
@@ -0,0 +1,63 @@
+"""快照：二进制快照的导出、导入与无效快照的处理"""
+import snapshot
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows
+
+
+def _populated_system() -> MVCCSystem:
+    """包含已提交、已回滚与活跃事务、二级索引和Undo链的系统"""
+    system = MVCCSystem()
+    system.create_index('k')
+    first, second = committed_rows(system, 2, {'k': 'a'})
+    writer = system.begin_transaction()['trx_id']
+    system.update_data(writer, first, {'k': 'b'})
+    system.commit_transaction(writer)
+    aborted = system.begin_transaction()['trx_id']
+    system.delete_data(aborted, second)
+    system.rollback_transaction(aborted)
+    active = system.begin_transaction()['trx_id']
+    system.insert_data(active, {'k': 'c'})
+    return system
+
+
+def test_snapshot_round_trip_preserves_state():
+    """导出再导入得到的系统与原系统状态一致，再次导出的快照逐字节相同"""
+    system = _populated_system()
+    data = system.export_snapshot()
+    restored = MVCCSystem.import_snapshot(data)
+
+    assert restored.capture_state() == system.capture_state()
+    assert restored.export_snapshot() == data
+    for value in ('a', 'b', 'c'):
+        assert (restored.data_row_manager.secondary_indexes['k'].candidates(value, value)
+                == system.data_row_manager.secondary_indexes['k'].candidates(value, value))
+
+
+def test_load_snapshot_replaces_state_in_place():
+    """load_snapshot换入快照的状态，之后仍可继续执行事务"""
+    source = _populated_system()
+    system = MVCCSystem()
+    committed_rows(system, 3, {'k': 'x'})
+
+    result = system.load_snapshot(source.export_snapshot())
+    assert result['success'] is True
+    assert system.capture_state()[4:] == source.capture_state()[4:]
+
+    trx_id = system.begin_transaction()['trx_id']
+    row_id = system.insert_data(trx_id, {'k': 'd'})['row_id']
+    assert system.commit_transaction(trx_id)['success'] is True
+    assert row_id not in source.data_row_manager.rows
+
+
+def test_malformed_snapshot_leaves_state_intact():
+    """内容无效的快照（格式合法但Undo类型未知、数据被截断）返回错误，当前状态保持不变"""
+    system = _populated_system()
+    before = system.capture_state()
+
+    state = list(_populated_system().capture_state())
+    state[6] = tuple((values[0], 'BOGUS') + values[2:] for values in state[6])
+    for data in (snapshot.encode_state(tuple(state)), system.export_snapshot()[:-3], b'not a snapshot'):
+        result = system.load_snapshot(data)
+        assert result['success'] is False
+        assert result['error']
+        assert system.capture_state() == before
@@ -0,0 +1,49 @@
+"""事务：事务表、有界的事务历史与操作历史"""
+from mvcc_system import MVCCSystem
+
+
+def test_operation_history_is_lazy_and_compacted_at_commit():
+    """操作历史在第一次记录操作时才创建环形缓冲区，事务结束时压缩为元组，分页与序号保持不变"""
+    system = MVCCSystem(operation_history_size=3)
+    trx_id = system.begin_transaction()['trx_id']
+    trx = system.transaction_manager.get_transaction(trx_id)
+    assert trx.operations == ()
+    row_ids = [system.insert_data(trx_id, {'v': i})['row_id'] for i in range(5)]
+    system.commit_transaction(trx_id)
+    assert isinstance(trx.operations, tuple)
+    page = system.get_transaction_operations(trx_id)
+    assert (page['total'], page['first_seq']) == (5, 2)
+    assert [op['row_id'] for op in page['operations']] == row_ids[2:]
+    trx.add_operation('READ', row_ids[0])  # 再记录操作时恢复为有界的环形缓冲区
+    assert [op['seq'] for op in trx.recent_operations()] == [3, 4, 5]
+
+
+def test_finished_transactions_are_bounded_per_history():
+    """已结束事务分别进入有界的提交、回滚历史，超出上限的最早事务从事务表中淘汰"""
+    system = MVCCSystem(trx_history_size=2)
+    manager = system.transaction_manager
+    trx_ids = [system.begin_transaction()['trx_id'] for _ in range(6)]
+    for trx_id in trx_ids[:3]:
+        system.commit_transaction(trx_id)
+    system.rollback_transaction(trx_ids[3])
+
+    assert [trx.trx_id for trx in manager.committed_transactions] == trx_ids[1:3]
+    assert [trx.trx_id for trx in manager.aborted_transactions] == [trx_ids[3]]
+    assert list(manager.active_transactions) == trx_ids[4:]
+    assert sorted(manager.transactions) == trx_ids[1:]
+    assert system.get_transaction_info(trx_ids[0]) is None
+    assert system.get_transaction_info(trx_ids[2])['status'] == 'committed'
+    assert system.commit_transaction(trx_ids[0])['success'] is False
+
+
+def test_transaction_lookup_after_many_transactions():
+    """大量事务之后事务表与历史的大小仍受上限约束，查找只取决于事务是否仍在表中"""
+    system = MVCCSystem(trx_history_size=10)
+    for _ in range(1000):
+        system.commit_transaction(system.begin_transaction()['trx_id'])
+    trx_id = system.begin_transaction()['trx_id']
+
+    assert len(system.transaction_manager.transactions) == 11
+    assert system.transaction_manager.get_transaction(trx_id).is_active()
+    assert system.get_transaction_info(trx_id - 10)['status'] == 'committed'
+    assert system.get_transaction_info(trx_id - 11) is None
@@ -0,0 +1,105 @@
+"""版本链：普通读取与带路径读取、增量Undo日志与按需推导的版本链"""
+from mvcc_system import MVCCSystem
+from tests.helpers import committed_rows
+from undo_log import MISSING, apply_delta, compute_delta
+
+
+def _history(system: MVCCSystem):
+    """依次提交若干次更新与一次删除，每次提交后开启一个REPEATABLE READ读事务记住当时的快照"""
+    row_id, = committed_rows(system, 1, {'name': 'a', 'balance': 0, 'city': 'Beijing'})
+    readers = []
+    changes = [{'name': 'a', 'balance': 10, 'city': 'Beijing'},
+               {'name': 'a', 'balance': 10, 'city': 'Shanghai', 'vip': True},
+               {'name': 'b', 'balance': 10},
+               None]
+    for data in changes:
+        reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+        readers.append((reader, system.read_data(reader, row_id)['data']))
+        writer = system.begin_transaction()['trx_id']
+        if data is None:
+            system.delete_data(writer, row_id)
+        else:
+            system.update_data(writer, row_id, data)
+        system.commit_transaction(writer)
+    reader = system.begin_transaction('REPEATABLE_READ')['trx_id']
+    readers.append((reader, None))
+    return row_id, readers
+
+
+def test_plain_read_matches_read_with_path():
+    """普通读取与带路径读取对每个快照返回相同的版本，只有带路径读取构造读取路径"""
+    system = MVCCSystem()
+    row_id, readers = _history(system)
+    for reader, expected in readers:
+        plain = system.read_data(reader, row_id)
+        with_path = system.read_data_with_path(reader, row_id)
+        assert plain['data'] == with_path['data'] == expected
+        assert 'path' not in plain
+        assert with_path['path']
+
+
+def test_plain_read_returns_a_copy():
+    """普通读取返回的数据是拷贝，修改它不影响行数据与之后的读取"""
+    system = MVCCSystem()
+    row_id, = committed_rows(system, 1, {'v': 0})
+    trx_id = system.begin_transaction()['trx_id']
+    system.read_data(trx_id, row_id)['data']['v'] = 99
+    assert system.read_data(trx_id, row_id)['data'] == {'v': 0}
+
+
+def test_delta_round_trip():
+    """增量只记录变化的列（新增的列记为MISSING），应用到修改后的数据上得到修改前的数据"""
+    old = {'name': 'a', 'balance': 0, 'city': 'Beijing'}
+    new = {'name': 'a', 'balance': 10, 'vip': True}
+    delta = compute_delta(old, new)
+    assert delta == {'balance': 0, 'city': 'Beijing', 'vip': MISSING}
+    assert apply_delta(new, delta) == old
+    assert new == {'name': 'a', 'balance': 10, 'vip': True}
+
+
+def test_update_undo_stores_delta_and_shows_full_images():
+    """UPDATE的Undo日志只保存变化的列，列出时重建完整的修改前后镜像，快照导入导出后增量不变"""
+    system = MVCCSystem()
+    row_id, _ = committed_rows(system, 2, {'name': 'a', 'balance': 0, 'city': 'Beijing'})
+    trx_id = system.begin_transaction()['trx_id']
+    system.update_data(trx_id, row_id, {'name': 'a', 'balance': 10, 'vip': True})
+    system.update_data(trx_id, row_id, {'name': 'a', 'balance': 20, 'vip': True})
+
+    first, second = system.list_undo_logs(trx_id=trx_id)['undo_logs']
+    assert system.undo_log_manager.get_undo_log(first['undo_id']).delta == {
+        'balance': 0, 'city': 'Beijing', 'vip': MISSING}
+    assert system.undo_log_manager.get_undo_log(second['undo_id']).delta == {'balance': 10}
+    assert first['old_value'] == {'name': 'a', 'balance': 0, 'city': 'Beijing'}
+    assert first['new_value'] == second['old_value'] == {'name': 'a', 'balance': 10, 'vip': True}
+    assert second['new_value'] == {'name': 'a', 'balance': 20, 'vip': True}
+
+    restored = MVCCSystem.import_snapshot(system.export_snapshot())
+    assert restored.undo_log_manager.get_undo_log(first['undo_id']).delta == {
+        'balance': 0, 'city': 'Beijing', 'vip': MISSING}
+    reader = restored.begin_transaction()['trx_id']
+    assert restored.read_data(reader, row_id)['data'] == {'name': 'a', 'balance': 0, 'city': 'Beijing'}
+
+
+def test_version_chain_is_derived_from_undo_chain_and_cached():
+    """版本链（从旧到新）由行数据与Undo链按需推导，行未变更时复用缓存，更新、回滚与purge后重新推导"""
+    system = MVCCSystem()
+    row_id, = committed_rows(system, 1, {'v': 0})
+    chain = system.data_row_manager.version_chains[row_id]
+    versions = chain.versions
+    assert [version['data'] for version in versions] == [{'v': 0}]
+    assert chain.versions is versions
+
+    writer = system.begin_transaction()['trx_id']
+    system.update_data(writer, row_id, {'v': 1})
+    system.commit_transaction(writer)
+    assert [(version['trx_id'], version['data']) for version in chain.versions] == [(1, {'v': 0}), (writer, {'v': 1})]
+
+    loser = system.begin_transaction()['trx_id']
+    system.update_data(loser, row_id, {'v': 2})
+    assert chain.versions[-1]['data'] == {'v': 2}
+    system.rollback_transaction(loser)
+    assert [version['data'] for version in chain.versions] == [{'v': 0}, {'v': 1}]
+
+    system.purge()
+    assert [version['data'] for version in chain.versions] == [{'v': 1}]
+    assert system.data_row_manager.get_version_chain(row_id)['versions'] == chain.versions
@@ -0,0 +1,117 @@
+"""工作区池：LRU淘汰、休眠与恢复"""
+import os
+import threading
+
+import workspace as workspace_module
+from workspace import WorkspacePool
+
+
+def _insert_committed(workspace, data: dict) -> int:
+    system = workspace.system
+    trx_id = system.begin_transaction()['trx_id']
+    row_id = system.insert_data(trx_id, data)['row_id']
+    system.commit_transaction(trx_id)
+    return row_id
+
+
+def test_failed_hibernation_keeps_workspace_in_memory(tmp_path):
+    """快照写入失败时工作区放回池中，状态不丢失，请求也不会因此失败"""
+    pool = WorkspacePool(max_workspaces=1, idle_timeout=None, memory_budget=None, hibernate_dir=str(tmp_path))
+    workspace = pool.acquire('a')
+    row_id = _insert_committed(workspace, {'v': 1})
+    pool.release(workspace)
+
+    def fail():
+        raise OSError(28, 'No space left on device')
+
+    workspace.system.export_snapshot = fail
+    pool.release(pool.acquire('b'))  # 取得b时淘汰a，写快照失败；a放回池中，归还b时改为淘汰b
+
+    status = pool.get_status()
+    assert (status['hibernate_failures'], status['workspaces']) == (1, 1)
+    assert os.listdir(str(tmp_path)) == ['b.snap']
+    again = pool.acquire('a')
+    assert again is workspace
+    reader = again.system.begin_transaction()['trx_id']
+    assert again.system.read_data(reader, row_id)['data'] == {'v': 1}
+
+
+def test_hibernated_snapshots_are_pruned_by_count_and_age(tmp_path, monkeypatch):
+    """休眠快照数超过max_hibernated时删除最旧的，超过hibernate_ttl的快照同样删除"""
+    monkeypatch.setattr(workspace_module, 'PRUNE_INTERVAL', 0)
+    pool = WorkspacePool(max_workspaces=1, idle_timeout=None, memory_budget=None, hibernate_dir=str(tmp_path),
+                         hibernate_ttl=3600, max_hibernated=2)
+    for workspace_id in ['a', 'b', 'c']:
+        pool.release(pool.acquire(workspace_id))
+    for workspace_id in ['a', 'b']:
+        os.utime(str(tmp_path / f'{workspace_id}.snap'), (1000, 1000))
+    # a、b已休眠且早已过期；取得d时淘汰c，清理删除a与b
+    pool.release(pool.acquire('d'))
+    assert sorted(os.listdir(str(tmp_path))) == ['c.snap']
+    assert pool.get_status()['pruned'] == 2
+
+    for workspace_id in ['e', 'f', 'g']:
+        pool.release(pool.acquire(workspace_id))
+    assert sorted(os.listdir(str(tmp_path))) == ['e.snap', 'f.snap']
+
+
+def test_workspace_hibernation_runs_outside_pool_lock(tmp_path):
+    """休眠快照写入期间池锁空闲，同时取得该工作区的请求等待写入完成后从快照恢复"""
+    pool = WorkspacePool(max_workspaces=1, idle_timeout=None, memory_budget=None, hibernate_dir=str(tmp_path))
+    workspace = pool.acquire('a')
+    trx_id = workspace.system.begin_transaction()['trx_id']
+    row_id = workspace.system.insert_data(trx_id, {'v': 1})['row_id']
+    workspace.system.commit_transaction(trx_id)
+    pool.release(workspace)
+
+    exporting, resume = threading.Event(), threading.Event()
+    export_snapshot = workspace.system.export_snapshot
+
+    def slow_export():
+        exporting.set()
+        resume.wait(5)
+        return export_snapshot()
+
+    workspace.system.export_snapshot = slow_export
+    evictor = threading.Thread(target=lambda: pool.release(pool.acquire('b')))  # 取得b时淘汰a
+    evictor.start()
+    assert exporting.wait(5)
+    assert pool.lock.acquire(timeout=1)
+    pool.lock.release()
+
+    restored = []
+    reader = threading.Thread(target=lambda: restored.append(pool.acquire('a')))
+    reader.start()
+    reader.join(0.2)
+    assert reader.is_alive()  # 等待a的快照写完
+    resume.set()
+    evictor.join(5)
+    reader.join(5)
+    system = restored[0].system
+    reader_trx = system.begin_transaction()['trx_id']
+    assert system.read_data(reader_trx, row_id)['data'] == {'v': 1}
+    assert pool.get_status()['restored'] == 1
+
+
+def test_memory_estimate_tracks_finished_operations_incrementally():
+    """已结束事务的操作记录数随提交与历史淘汰增减，与逐个统计的结果一致（包括快照恢复之后）"""
+    from mvcc_system import MVCCSystem
+    from workspace import estimate_memory
+
+    system = MVCCSystem(trx_history_size=3)
+    for value in range(5):
+        trx_id = system.begin_transaction()['trx_id']
+        for _ in range(value):
+            system.insert_data(trx_id, {'v': value})
+        (system.commit_transaction if value % 2 else system.rollback_transaction)(trx_id)
+    system.insert_data(system.begin_transaction()['trx_id'], {'v': 'active'})
+
+    def counted(target):
+        return sum(len(trx.operations) for trx in target.transaction_manager.transactions.values()
+                   if not trx.is_active())
+
+    # 提交与回滚历史各自保留至多3个事务，5个已结束事务都还在历史中
+    assert system.transaction_manager.finished_operations == counted(system) == 0 + 1 + 2 + 3 + 4
+    restored = MVCCSystem.import_snapshot(system.export_snapshot())
+    assert restored.transaction_manager.finished_operations == counted(restored)
+    assert estimate_memory(restored) == estimate_memory(system)
@@ -2,9 +2,21 @@
 InnoDB MVCC 事务管理模块
 实现事务的创建、提交、回滚等功能
 """
-from typing import List, Optional, Set, Dict, Any
+import threading
+from typing import List, Optional, Set, Dict, Any, Deque, Tuple, Union
+from collections import deque
 from datetime import datetime
 from enum import Enum
+from itertools import count, islice
+from change_journal import ChangeJournal
+from clock import now_us, to_datetime, isoformat
+from latch import IdAllocator, SortedIdIndex
+
+
+# 操作记录：(类型, row_id, 时间戳微秒, 详情)
+Operation = Tuple[str, Optional[int], int, Optional[Dict[str, Any]]]
+
+RECENT_OPERATIONS = 5  # to_dict中附带的最近操作条数，完整历史通过operations_page分页获取
 
 
 class TransactionStatus(Enum):
@@ -15,26 +27,40 @@ class TransactionStatus(Enum):
 
 
 class Transaction:
-    """事务类"""
+    """
+    事务类
+    使用__slots__去掉每个实例的__dict__，时间戳以整数微秒保存
+    事务ID由TransactionManager的ID分配器分配
+    操作历史是最多保留operation_history_size条的环形缓冲区（None表示不限制），记录为紧凑的元组，
+    operation_count为事务执行过的操作总数，第i个操作（从0开始）的序号为i
+    环形缓冲区在第一次记录操作时才创建，事务结束时压缩为元组：
+    deque即使为空也占用约760字节，没有操作的事务与已结束的事务都不需要它
+    """
 
-    _next_trx_id = 1  # 全局事务ID计数器
+    __slots__ = ('trx_id', 'status', 'isolation_level', 'start_time_us', 'commit_time_us',
+                 'read_view', 'operations', 'operation_count', 'operation_history_size',
+                 'modified_rows', 'undo_segment')
 
-    def __init__(self, isolation_level: str = "READ_COMMITTED"):
-        self.trx_id = Transaction._next_trx_id
-        Transaction._next_trx_id += 1
+    def __init__(self, trx_id: int, isolation_level: str = "READ_COMMITTED",
+                 operation_history_size: Optional[int] = 100):
+        self.trx_id = trx_id
         self.status = TransactionStatus.ACTIVE
         self.isolation_level = isolation_level
-        self.start_time = datetime.now()
-        self.commit_time: Optional[datetime] = None
+        self.start_time_us = now_us()
+        self.commit_time_us: Optional[int] = None
         self.read_view: Optional['ReadView'] = None
-        self.operations: List[Dict[str, Any]] = []  # 操作历史
+        self.operations: Union[Deque[Operation], Tuple[Operation, ...]] = ()  # 最近的操作历史
+        self.operation_count = 0
+        self.operation_history_size = operation_history_size
         self.modified_rows: Set[int] = set()  # 修改的数据行ID集合
+        self.undo_segment: List[int] = []  # 本事务按时间顺序生成的Undo日志ID（回滚段）
 
     def commit(self):
         """提交事务"""
         if self.status == TransactionStatus.ACTIVE:
             self.status = TransactionStatus.COMMITTED
-            self.commit_time = datetime.now()
+            self.commit_time_us = now_us()
+            self.operations = tuple(self.operations)
             return True
         return False
 
@@ -42,40 +68,116 @@ class Transaction:
         """回滚事务"""
         if self.status == TransactionStatus.ACTIVE:
             self.status = TransactionStatus.ABORTED
+            self.operations = tuple(self.operations)
             return True
         return False
 
+    def add_undo(self, undo_id: int):
+        """将本事务生成的Undo日志追加到回滚段"""
+        self.undo_segment.append(undo_id)
+
+    @property
+    def start_time(self) -> datetime:
+        """事务开始时间"""
+        return to_datetime(self.start_time_us)
+
+    @property
+    def commit_time(self) -> Optional[datetime]:
+        """事务提交时间"""
+        return to_datetime(self.commit_time_us) if self.commit_time_us is not None else None
+
     def is_active(self) -> bool:
         """判断事务是否活跃"""
         return self.status == TransactionStatus.ACTIVE
 
-    def add_operation(self, op_type: str, row_id: int, details: Optional[Dict] = None):
-        """记录事务执行的操作"""
-        operation = {
-            'type': op_type,  # 'INSERT', 'UPDATE', 'DELETE', 'READ'
-            'row_id': row_id,
-            'timestamp': datetime.now().isoformat(),
-            'details': details or {}
-        }
-        self.operations.append(operation)
+    def add_operation(self, op_type: str, row_id: Optional[int], details: Optional[Dict] = None):
+        """记录事务执行的操作（'INSERT', 'UPDATE', 'DELETE', 'READ', 'SCAN', 'INDEX_LOOKUP'），超出上限时丢弃最早的记录"""
+        if not isinstance(self.operations, deque):
+            self.operations = deque(self.operations, maxlen=self.operation_history_size)
+        self.operations.append((op_type, row_id, now_us(), details))
+        self.operation_count += 1
 
         # 如果是修改操作，记录修改的行ID
         if op_type in ['INSERT', 'UPDATE', 'DELETE']:
             self.modified_rows.add(row_id)
 
+    @property
+    def first_operation_seq(self) -> int:
+        """操作历史中最早一条记录的序号（之前的记录已被丢弃）"""
+        return self.operation_count - len(self.operations)
+
+    @staticmethod
+    def _operation_to_dict(seq: int, operation: Operation) -> Dict[str, Any]:
+        op_type, row_id, time_us, details = operation
+        return {
+            'seq': seq,
+            'type': op_type,
+            'row_id': row_id,
+            'timestamp': isoformat(time_us),
+            'details': details or {}
+        }
+
+    def recent_operations(self, count: int = RECENT_OPERATIONS) -> List[Dict[str, Any]]:
+        """最近count条操作"""
+        start = max(0, len(self.operations) - count)
+        first = self.first_operation_seq + start
+        return [self._operation_to_dict(seq, operation)
+                for seq, operation in enumerate(islice(self.operations, start, None), first)]
+
+    def operations_page(self, offset: Optional[int] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        按序号分页获取操作历史：返回序号不小于offset的至多limit条操作
+        offset为None或早于已保留的最早记录时从最早的记录开始，next_offset为下一页的offset（没有更多记录时为None）
+        """
+        first = self.first_operation_seq
+        start = min(max(first, offset or 0), self.operation_count)
+        end = min(self.operation_count, start + max(0, limit))
+        operations = [self._operation_to_dict(seq, operation)
+                      for seq, operation in enumerate(islice(self.operations, start - first, end - first), start)]
+        return {
+            'trx_id': self.trx_id,
+            'total': self.operation_count,
+            'first_seq': first,
+            'operations': operations,
+            'next_offset': end if end < self.operation_count else None
+        }
+
     def to_dict(self):
-        """转换为字典格式"""
+        """转换为字典格式（只附带最近的操作，避免每次序列化整个操作历史）"""
         return {
             'trx_id': self.trx_id,
             'status': self.status.value,
             'isolation_level': self.isolation_level,
-            'start_time': self.start_time.isoformat(),
-            'commit_time': self.commit_time.isoformat() if self.commit_time else None,
+            'start_time': isoformat(self.start_time_us),
+            'commit_time': isoformat(self.commit_time_us) if self.commit_time_us is not None else None,
             'read_view': self.read_view.to_dict() if self.read_view else None,
-            'operations': self.operations,
+            'operations': self.recent_operations(),
+            'operation_count': self.operation_count,
             'modified_rows': list(self.modified_rows)
         }
 
+    def to_tuple(self) -> tuple:
+        """转换为只包含基本类型的元组（快照与检查点使用）"""
+        return (self.trx_id, self.status.value, self.isolation_level, self.start_time_us, self.commit_time_us,
+                self.read_view.to_tuple() if self.read_view else None, tuple(self.operations),
+                self.operation_count, tuple(self.modified_rows), tuple(self.undo_segment))
+
+    @classmethod
+    def from_tuple(cls, values: tuple, operation_history_size: Optional[int] = 100) -> 'Transaction':
+        """由to_tuple的结果重建事务"""
+        (trx_id, status, isolation_level, start_time_us, commit_time_us,
+         read_view, operations, operation_count, modified_rows, undo_segment) = values
+        trx = cls(trx_id, isolation_level, operation_history_size)
+        trx.status = TransactionStatus(status)
+        trx.start_time_us = start_time_us
+        trx.commit_time_us = commit_time_us
+        trx.read_view = ReadView.from_tuple(read_view) if read_view is not None else None
+        trx.operations = tuple(operations)
+        trx.operation_count = operation_count
+        trx.modified_rows = set(modified_rows)
+        trx.undo_segment = list(undo_segment)
+        return trx
+
 
 class ReadView:
     """
@@ -83,12 +185,20 @@ class ReadView:
     用于实现MVCC的可见性判断
     """
 
+    __slots__ = ('creator_trx_id', 'm_ids', 'm_ids_set', 'min_trx_id', 'max_trx_id', 'create_time_us')
+
     def __init__(self, creator_trx_id: int, active_trx_ids: List[int], max_trx_id: int):
         self.creator_trx_id = creator_trx_id  # 创建该ReadView的事务ID
         self.m_ids = sorted(active_trx_ids)  # 创建ReadView时活跃的事务ID列表
-        self.min_trx_id = min(active_trx_ids) if active_trx_ids else creator_trx_id  # 最小活跃事务ID
+        self.m_ids_set = frozenset(self.m_ids)  # m_ids的不可变哈希集合，用于O(1)成员判断
+        self.min_trx_id = self.m_ids[0] if self.m_ids else creator_trx_id  # 最小活跃事务ID
         self.max_trx_id = max_trx_id  # 系统中下一个将要分配的事务ID
-        self.create_time = datetime.now()
+        self.create_time_us = now_us()
+
+    @property
+    def create_time(self) -> datetime:
+        """ReadView创建时间"""
+        return to_datetime(self.create_time_us)
 
     def is_visible(self, trx_id: int) -> bool:
         """
@@ -111,7 +221,7 @@ class ReadView:
         if trx_id >= self.max_trx_id:
             return False
 
-        return trx_id not in self.m_ids
+        return trx_id not in self.m_ids_set
 
     def to_dict(self):
         """转换为字典格式"""
@@ -120,22 +230,59 @@ class ReadView:
             'm_ids': self.m_ids,
             'min_trx_id': self.min_trx_id,
             'max_trx_id': self.max_trx_id,
-            'create_time': self.create_time.isoformat()
+            'create_time': isoformat(self.create_time_us)
         }
 
+    def to_tuple(self) -> tuple:
+        """转换为只包含基本类型的元组（快照与检查点使用）"""
+        return (self.creator_trx_id, tuple(self.m_ids), self.max_trx_id, self.create_time_us)
+
+    @classmethod
+    def from_tuple(cls, values: tuple) -> 'ReadView':
+        """由to_tuple的结果重建ReadView"""
+        creator_trx_id, m_ids, max_trx_id, create_time_us = values
+        read_view = cls(creator_trx_id, list(m_ids), max_trx_id)
+        read_view.create_time_us = create_time_us
+        return read_view
+
 
 class TransactionManager:
-    """事务管理器"""
+    """
+    事务管理器
+
+    - transactions: trx_id -> Transaction 索引，查找为O(1)
+    - active_transactions: 按trx_id有序的活跃事务集合（事务ID单调递增，插入顺序即ID顺序）
+    - committed_transactions / aborted_transactions: 有界的已结束事务历史，
+      超过history_size时淘汰最早结束的事务，同时从索引中移除
+    - latch: 事务系统闩锁，保护事务ID分配、活跃事务集合的变化以及ReadView快照，
+      保证ReadView看到的活跃事务集合与max_trx_id是一致的
+    """
 
-    def __init__(self):
-        self.active_transactions: List[Transaction] = []
-        self.committed_transactions: List[Transaction] = []
-        self.aborted_transactions: List[Transaction] = []
+    def __init__(self, history_size: Optional[int] = 1000, journal: Optional[ChangeJournal] = None,
+                 trx_id_allocator: Optional[IdAllocator] = None, operation_history_size: Optional[int] = 100):
+        self.history_size = history_size  # 每类已结束事务保留的最大数量，None表示不限制
+        self.operation_history_size = operation_history_size  # 每个事务保留的最大操作记录数，None表示不限制
+        self.journal = journal if journal is not None else ChangeJournal()
+        self.trx_id_allocator = trx_id_allocator if trx_id_allocator is not None else IdAllocator()
+        self.latch = threading.Lock()
+        self.transactions: Dict[int, Transaction] = {}  # trx_id -> Transaction
+        self.trx_ids = SortedIdIndex()  # 有序的trx_id索引，用于分页列出
+        self.active_transactions: Dict[int, Transaction] = {}  # trx_id -> Transaction（有序）
+        self.committed_transactions: Deque[Transaction] = deque()
+        self.aborted_transactions: Deque[Transaction] = deque()
+        self.finished_operations = 0  # 已结束事务历史中保留的操作记录数之和（结束后不再变化，供内存估算使用）
+        # 不属于事务的ReadView（如尚未读完的快照扫描），purge同样不能回收它们需要的版本
+        self.open_read_views: Dict[int, ReadView] = {}
+        self._read_view_tokens = count(1)
 
     def begin_transaction(self, isolation_level: str = "READ_COMMITTED") -> Transaction:
         """开启新事务"""
-        trx = Transaction(isolation_level)
-        self.active_transactions.append(trx)
+        with self.latch:
+            trx = Transaction(self.trx_id_allocator.allocate(), isolation_level, self.operation_history_size)
+            self.active_transactions[trx.trx_id] = trx
+            self.transactions[trx.trx_id] = trx
+            self.trx_ids.add(trx.trx_id)
+            self.journal.record('transaction', trx.trx_id, 'create')
 
         # 注意：根据InnoDB的实现，ReadView应该在第一次SELECT时创建，而不是在事务开启时
         # READ COMMITTED: 每次SELECT都创建新的ReadView
@@ -146,39 +293,87 @@ class TransactionManager:
 
     def commit_transaction(self, trx_id: int) -> bool:
         """提交事务"""
-        for trx in self.active_transactions:
-            if trx.trx_id == trx_id:
-                if trx.commit():
-                    self.active_transactions.remove(trx)
-                    self.committed_transactions.append(trx)
-                    return True
-        return False
+        with self.latch:
+            trx = self.active_transactions.get(trx_id)
+            if trx and trx.commit():
+                del self.active_transactions[trx_id]
+                self._add_to_history(self.committed_transactions, trx)
+                self.journal.record('transaction', trx_id)
+                return True
+            return False
 
     def rollback_transaction(self, trx_id: int) -> bool:
         """回滚事务"""
-        for trx in self.active_transactions:
-            if trx.trx_id == trx_id:
-                if trx.rollback():
-                    self.active_transactions.remove(trx)
-                    self.aborted_transactions.append(trx)
-                    return True
-        return False
+        with self.latch:
+            trx = self.active_transactions.get(trx_id)
+            if trx and trx.rollback():
+                del self.active_transactions[trx_id]
+                self._add_to_history(self.aborted_transactions, trx)
+                self.journal.record('transaction', trx_id)
+                return True
+            return False
+
+    def _add_to_history(self, history: Deque[Transaction], trx: Transaction):
+        """加入已结束事务历史，超出上限时淘汰最早的事务"""
+        history.append(trx)
+        self.finished_operations += len(trx.operations)
+        if self.history_size is not None:
+            while len(history) > self.history_size:
+                evicted = history.popleft()
+                self.finished_operations -= len(evicted.operations)
+                self.transactions.pop(evicted.trx_id, None)
+                self.trx_ids.discard(1, self.transactions)
+                self.journal.record('transaction', evicted.trx_id, 'remove')
 
     def get_active_trx_ids(self) -> List[int]:
-        """获取所有活跃事务ID"""
-        return [trx.trx_id for trx in self.active_transactions]
+        """获取所有活跃事务ID（升序）"""
+        with self.latch:
+            return list(self.active_transactions)
+
+    def create_read_view(self, creator_trx_id: int) -> ReadView:
+        """在事务系统闩锁内对活跃事务集合与下一个事务ID做快照，创建ReadView"""
+        with self.latch:
+            return ReadView(creator_trx_id, list(self.active_transactions), self.trx_id_allocator.next_id)
+
+    def register_read_view(self, read_view: ReadView) -> int:
+        """
+        登记一个在事务之外仍在使用的ReadView，返回注销时使用的编号
+        READ COMMITTED的ReadView不保存在事务上，REPEATABLE READ的ReadView在事务结束后也不再计入，
+        延迟消费的快照扫描需要登记，直到扫描结束
+        """
+        with self.latch:
+            token = next(self._read_view_tokens)
+            self.open_read_views[token] = read_view
+            return token
+
+    def unregister_read_view(self, token: int):
+        """注销register_read_view登记的ReadView"""
+        with self.latch:
+            self.open_read_views.pop(token, None)
+
+    def get_low_watermark(self) -> int:
+        """
+        所有ReadView（包括登记的ReadView）中最小的min_trx_id
+        没有任何ReadView时为下一个将要分配的事务ID
+        """
+        with self.latch:
+            low_watermark = self.trx_id_allocator.next_id
+            for trx in self.active_transactions.values():
+                if trx.read_view is not None and trx.read_view.min_trx_id < low_watermark:
+                    low_watermark = trx.read_view.min_trx_id
+            for read_view in self.open_read_views.values():
+                if read_view.min_trx_id < low_watermark:
+                    low_watermark = read_view.min_trx_id
+            return low_watermark
 
     def get_transaction(self, trx_id: int) -> Optional[Transaction]:
         """根据ID获取事务"""
-        for trx in self.active_transactions + self.committed_transactions + self.aborted_transactions:
-            if trx.trx_id == trx_id:
-                return trx
-        return None
+        return self.transactions.get(trx_id)
 
     def get_all_transactions(self):
         """获取所有事务"""
         return {
-            'active': [trx.to_dict() for trx in self.active_transactions],
+            'active': [trx.to_dict() for trx in self.active_transactions.values()],
             'committed': [trx.to_dict() for trx in self.committed_transactions],
             'aborted': [trx.to_dict() for trx in self.aborted_transactions]
         }
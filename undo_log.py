@@ -2,9 +2,12 @@
 InnoDB MVCC UndoLog 日志管理模块
 实现Undo日志链的创建和管理
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set, Iterator, Tuple
 from datetime import datetime
 from enum import Enum
+from change_journal import ChangeJournal
+from clock import now_us, to_datetime, isoformat
+from latch import IdAllocator, SortedIdIndex
 
 
 class UndoLogType(Enum):
@@ -14,62 +17,175 @@ class UndoLogType(Enum):
     DELETE = "DELETE"
 
 
+class _Missing:
+    """增量Undo中表示"修改前该列不存在"的标记"""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+def compute_delta(old_data: Dict[str, Any], new_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    计算UPDATE的增量Undo：只记录发生变化的列在修改前的值
+    修改前不存在的列记为MISSING
+    """
+    delta = {}
+    for column, value in new_data.items():
+        if column not in old_data:
+            delta[column] = MISSING
+        elif old_data[column] != value:
+            delta[column] = old_data[column]
+    for column, value in old_data.items():
+        if column not in new_data:
+            delta[column] = value
+    return delta
+
+
+def apply_delta(data: Optional[Dict[str, Any]], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """将增量Undo应用到修改后的数据上，得到修改前的完整数据"""
+    result = dict(data) if data else {}
+    for column, value in delta.items():
+        if value is MISSING:
+            result.pop(column, None)
+        else:
+            result[column] = value
+    return result
+
+
 class UndoLog:
-    """Undo日志记录"""
+    """
+    Undo日志记录
+    使用__slots__去掉每个实例的__dict__，时间戳以整数微秒保存
 
-    _next_undo_id = 1
+    只保存增量：
+    - UPDATE：delta记录被修改列在修改前的值
+    - INSERT / DELETE：不修改列数据，delta为None
+    完整的修改前后镜像从当前行数据出发，沿roll_pointer逐条应用增量重建（见iter_undo_images）
+    """
 
-    def __init__(self, log_type: UndoLogType, trx_id: int, row_id: int,
-                 old_value: Optional[Dict[str, Any]] = None,
-                 new_value: Optional[Dict[str, Any]] = None):
-        self.undo_id = UndoLog._next_undo_id
-        UndoLog._next_undo_id += 1
+    __slots__ = ('undo_id', 'log_type', 'trx_id', 'row_id', 'delta', 'create_time_us', 'roll_pointer')
+
+    def __init__(self, undo_id: int, log_type: UndoLogType, trx_id: int, row_id: int,
+                 delta: Optional[Dict[str, Any]] = None):
+        self.undo_id = undo_id
         self.log_type = log_type
         self.trx_id = trx_id  # 创建该Undo日志的事务ID
         self.row_id = row_id  # 关联的数据行ID
-        self.old_value = old_value  # 旧值
-        self.new_value = new_value  # 新值
-        self.create_time = datetime.now()
+        self.delta = delta  # 被修改列的旧值
+        self.create_time_us = now_us()
         self.roll_pointer: Optional[int] = None  # 指向上一个版本的Undo日志ID
 
-    def to_dict(self):
-        """转换为字典格式"""
+    @property
+    def create_time(self) -> datetime:
+        """Undo日志创建时间"""
+        return to_datetime(self.create_time_us)
+
+    def before_image(self, after_image: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """根据修改后的数据重建修改前的完整数据"""
+        if self.log_type == UndoLogType.INSERT:
+            return None  # 插入之前该行不存在
+        if self.delta is None:
+            return after_image  # DELETE只打删除标记，不修改列数据
+        return apply_delta(after_image, self.delta)
+
+    def to_dict(self, old_value: Optional[Dict[str, Any]] = None,
+                new_value: Optional[Dict[str, Any]] = None):
+        """
+        转换为字典格式
+        old_value / new_value为重建出的完整修改前后镜像；DELETE没有new_value
+        """
         return {
             'undo_id': self.undo_id,
             'log_type': self.log_type.value,
             'trx_id': self.trx_id,
             'row_id': self.row_id,
-            'old_value': self.old_value,
-            'new_value': self.new_value,
-            'create_time': self.create_time.isoformat(),
+            'old_value': old_value,
+            'new_value': new_value if self.log_type != UndoLogType.DELETE else None,
+            'create_time': isoformat(self.create_time_us),
             'roll_pointer': self.roll_pointer
         }
 
+    def to_tuple(self) -> tuple:
+        """
+        转换为只包含基本类型的元组（快照与检查点使用）
+        增量拆分为 (有旧值的列, 修改前不存在的列)，MISSING标记不能直接序列化
+        """
+        delta = None
+        if self.delta is not None:
+            delta = ({column: value for column, value in self.delta.items() if value is not MISSING},
+                     tuple(column for column, value in self.delta.items() if value is MISSING))
+        return (self.undo_id, self.log_type.name, self.trx_id, self.row_id, delta,
+                self.create_time_us, self.roll_pointer)
+
+    @classmethod
+    def from_tuple(cls, values: tuple) -> 'UndoLog':
+        """由to_tuple的结果重建Undo日志"""
+        undo_id, log_type, trx_id, row_id, encoded_delta, create_time_us, roll_pointer = values
+        delta = None
+        if encoded_delta is not None:
+            old_values, missing = encoded_delta
+            delta = dict(old_values)
+            for column in missing:
+                delta[column] = MISSING
+        undo_log = cls(undo_id, UndoLogType[log_type], trx_id, row_id, delta)  # 按名称查找比按值构造快
+        undo_log.create_time_us = create_time_us
+        undo_log.roll_pointer = roll_pointer
+        return undo_log
+
+
+def iter_undo_images(data: Optional[Dict[str, Any]], roll_pointer: Optional[int],
+                     undo_logs: Dict[int, UndoLog]) -> Iterator[Tuple[UndoLog, Optional[Dict], Optional[Dict]]]:
+    """
+    从行的当前数据出发沿roll_pointer回溯，逐条产出 (Undo日志, 修改后镜像, 修改前镜像)
+    较新Undo日志的修改前镜像即为下一条Undo日志的修改后镜像
+    """
+    after_image = data
+    undo_id = roll_pointer
+    while undo_id is not None:
+        undo_log = undo_logs.get(undo_id)
+        if undo_log is None:
+            return
+        before_image = undo_log.before_image(after_image)
+        yield undo_log, after_image, before_image
+        after_image = before_image
+        undo_id = undo_log.roll_pointer
+
 
 class UndoLogManager:
-    """Undo日志管理器"""
+    """
+    Undo日志管理器
+    同一行的Undo链只在持有该行闩锁时修改（见DataRowManager.row_latch）
+    """
 
-    def __init__(self):
+    def __init__(self, journal: Optional[ChangeJournal] = None, undo_id_allocator: Optional[IdAllocator] = None):
+        self.journal = journal if journal is not None else ChangeJournal()
+        self.undo_id_allocator = undo_id_allocator if undo_id_allocator is not None else IdAllocator()
         self.undo_logs: Dict[int, UndoLog] = {}  # undo_id -> UndoLog
-        self.row_undo_chains: Dict[int, List[int]] = {}  # row_id -> [undo_id列表]
+        self.undo_ids = SortedIdIndex()  # 有序的undo_id索引，用于分页列出
+        # row_id -> {undo_id: None}，按创建顺序排列的有序集合，支持O(1)摘除
+        self.row_undo_chains: Dict[int, Dict[int, None]] = {}
 
     def create_undo_log(self, log_type: UndoLogType, trx_id: int, row_id: int,
-                       old_value: Optional[Dict[str, Any]] = None,
-                       new_value: Optional[Dict[str, Any]] = None,
+                       delta: Optional[Dict[str, Any]] = None,
                        prev_undo_id: Optional[int] = None) -> UndoLog:
         """创建Undo日志"""
-        undo_log = UndoLog(log_type, trx_id, row_id, old_value, new_value)
+        undo_log = UndoLog(self.undo_id_allocator.allocate(), log_type, trx_id, row_id, delta)
 
         # 设置roll_pointer指向上一个版本
         if prev_undo_id is not None:
             undo_log.roll_pointer = prev_undo_id
 
         self.undo_logs[undo_log.undo_id] = undo_log
+        self.undo_ids.add(undo_log.undo_id)
 
         # 维护行的Undo链
-        if row_id not in self.row_undo_chains:
-            self.row_undo_chains[row_id] = []
-        self.row_undo_chains[row_id].append(undo_log.undo_id)
+        self.row_undo_chains.setdefault(row_id, {})[undo_log.undo_id] = None
+        self.journal.record('undo_log', undo_log.undo_id, 'create')
 
         return undo_log
 
@@ -85,11 +201,106 @@ class UndoLogManager:
         undo_ids = self.row_undo_chains[row_id]
         return [self.undo_logs[undo_id] for undo_id in undo_ids if undo_id in self.undo_logs]
 
-    def get_all_undo_logs(self) -> List[Dict]:
-        """获取所有Undo日志"""
-        return [undo.to_dict() for undo in self.undo_logs.values()]
+    def get_latest_undo_id(self, row_id: int) -> Optional[int]:
+        """获取某行Undo链中最新的Undo日志ID"""
+        chain = self.row_undo_chains.get(row_id)
+        if not chain:
+            return None
+        return next(reversed(chain))
+
+    def remove_undo_log(self, undo_id: int):
+        """删除指定的Undo日志，并从所属行的Undo链中摘除"""
+        undo_log = self.undo_logs.pop(undo_id, None)
+        if undo_log is not None:
+            chain = self.row_undo_chains.get(undo_log.row_id)
+            if chain is not None:
+                chain.pop(undo_id, None)
+            self.undo_ids.discard(1, self.undo_logs)
+            self.journal.record('undo_log', undo_id, 'remove')
+
+    def remove_undo_logs(self, row_id: int, undo_ids: Set[int]):
+        """批量删除某行的一组Undo日志"""
+        chain = self.row_undo_chains.get(row_id)
+        for undo_id in undo_ids:
+            self.undo_logs.pop(undo_id, None)
+            if chain is not None:
+                chain.pop(undo_id, None)
+            self.journal.record('undo_log', undo_id, 'remove')
+        self.undo_ids.discard(len(undo_ids), self.undo_logs)
+
+    def remove_row_undo_logs(self, row_id: int) -> int:
+        """删除某行的整条Undo链，返回删除的Undo日志数"""
+        undo_ids = self.row_undo_chains.pop(row_id, {})
+        for undo_id in undo_ids:
+            self.undo_logs.pop(undo_id, None)
+            self.journal.record('undo_log', undo_id, 'remove')
+        self.undo_ids.discard(len(undo_ids), self.undo_logs)
+        return len(undo_ids)
+
+    def truncate_chain(self, undo_id: int):
+        """截断Undo链：将指定Undo日志的roll_pointer置空（purge使用）"""
+        undo_log = self.undo_logs.get(undo_id)
+        if undo_log is not None and undo_log.roll_pointer is not None:
+            undo_log.roll_pointer = None
+            self.journal.record('undo_log', undo_id)
+            # 行展示的DB_ROLL_PTR取自其当前Undo日志的roll_pointer，一并标记变更
+            self.journal.record('row', undo_log.row_id)
+
+    def _orphan_to_dict(self, undo_log: UndoLog) -> Dict:
+        """无法从行数据回溯到的Undo日志（行已不存在或链已断开），只能展示增量本身"""
+        old_value = apply_delta(None, undo_log.delta) if undo_log.delta else None
+        return undo_log.to_dict(old_value, None)
+
+    def _chain_images(self, row) -> Dict[int, Tuple[Optional[Dict], Optional[Dict]]]:
+        """重建某行Undo链上每条Undo日志的 (修改前镜像, 修改后镜像)"""
+        return {
+            undo_log.undo_id: (before_image, after_image)
+            for undo_log, after_image, before_image in iter_undo_images(row.data, row.roll_pointer, self.undo_logs)
+        }
+
+    def undo_log_to_dict(self, undo_log: UndoLog, row, images_cache: Optional[Dict] = None) -> Dict:
+        """
+        单条Undo日志的字典格式（从行数据回溯重建完整镜像）
+        依次转换多条Undo日志时可传入images_cache：缓存最近一行整条Undo链的镜像，
+        同一行的后续Undo日志不再从头回溯，行变更后（mutation_count变化）重新重建
+        """
+        if row is not None:
+            if images_cache is None:
+                for candidate, after_image, before_image in iter_undo_images(row.data, row.roll_pointer,
+                                                                             self.undo_logs):
+                    if candidate is undo_log:
+                        return undo_log.to_dict(before_image, after_image)
+            else:
+                cached = images_cache.get(row.row_id)
+                if cached is None or cached[0] != row.mutation_count:
+                    images_cache.clear()
+                    cached = images_cache[row.row_id] = (row.mutation_count, self._chain_images(row))
+                images = cached[1].get(undo_log.undo_id)
+                if images is not None:
+                    return undo_log.to_dict(*images)
+        return self._orphan_to_dict(undo_log)
+
+    def get_all_undo_logs(self, rows: Dict[int, Any]) -> List[Dict]:
+        """获取所有Undo日志（按undo_id顺序，old_value / new_value为重建的完整镜像）"""
+        images: Dict[int, Tuple[Optional[Dict], Optional[Dict]]] = {}
+        for row_id in self.row_undo_chains:
+            row = rows.get(row_id)
+            if row is not None:
+                images.update(self._chain_images(row))
+
+        result = []
+        for undo_id, undo_log in self.undo_logs.items():
+            if undo_id in images:
+                result.append(undo_log.to_dict(*images[undo_id]))
+            else:
+                result.append(self._orphan_to_dict(undo_log))
+        return result
 
-    def get_undo_chain_dict(self, row_id: int) -> List[Dict]:
+    def get_undo_chain_dict(self, row) -> List[Dict]:
         """获取某行的Undo链（字典格式）"""
-        chain = self.get_undo_chain(row_id)
-        return [undo.to_dict() for undo in chain]
+        images = self._chain_images(row)
+        return [
+            undo_log.to_dict(*images[undo_log.undo_id]) if undo_log.undo_id in images
+            else self._orphan_to_dict(undo_log)
+            for undo_log in self.get_undo_chain(row.row_id)
+        ]
@@ -0,0 +1,383 @@
+"""
+InnoDB MVCC 工作区模块
+每个学习者（会话）拥有独立的MVCCSystem，工作区池按LRU、空闲超时与内存预算淘汰，
+淘汰的工作区可以休眠为磁盘上的紧凑快照，再次访问时透明恢复
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from mvcc_system import MVCCSystem
+
+WORKSPACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+SNAPSHOT_SUFFIX = '.snap'
+PRUNE_INTERVAL = 60  # 清理过期休眠快照的最小间隔（秒）
+
+logger = logging.getLogger(__name__)
+
+# 内存估算使用的单条记录字节数（含数据字典，参考benchmarks/memory_footprint.py的结果取整）
+ROW_BYTES = 400
+UNDO_LOG_BYTES = 300
+TRANSACTION_BYTES = 600
+OPERATION_BYTES = 400
+
+
+def estimate_memory(system: MVCCSystem) -> int:
+    """
+    粗略估算一个MVCCSystem占用的内存字节数，只统计记录数量，不遍历数据内容
+    已结束事务的操作记录数由事务管理器累计，只需遍历活跃事务，每次归还工作区的开销与事务历史长度无关
+    """
+    transaction_manager = system.transaction_manager
+    operations = transaction_manager.finished_operations + sum(
+        len(trx.operations) for trx in list(transaction_manager.active_transactions.values()))
+    return (len(system.data_row_manager.rows) * ROW_BYTES
+            + len(system.undo_log_manager.undo_logs) * UNDO_LOG_BYTES
+            + len(transaction_manager.transactions) * TRANSACTION_BYTES
+            + operations * OPERATION_BYTES)
+
+
+class Workspace:
+    """一个工作区：独立的MVCCSystem及其使用情况"""
+
+    __slots__ = ('workspace_id', 'system', 'last_access', 'leases', 'memory')
+
+    def __init__(self, workspace_id: str, system: MVCCSystem):
+        self.workspace_id = workspace_id
+        self.system = system
+        self.last_access = time.monotonic()
+        self.leases = 0  # 正在处理的请求数，大于0时不会被淘汰
+        self.memory = estimate_memory(system)  # 最近一次请求结束时的内存估算
+
+    def is_busy(self) -> bool:
+        """有请求正在使用，或有事件流订阅者时不淘汰"""
+        return self.leases > 0 or self.system.event_bus.has_subscribers()
+
+
+class WorkspacePool:
+    """
+    工作区池
+
+    - acquire / release：请求开始时取得工作区（不存在时创建，已休眠时从快照恢复），结束时归还
+    - 工作区数超过max_workspaces或内存估算之和超过memory_budget时，按LRU顺序淘汰空闲工作区
+    - 超过idle_timeout秒未访问的工作区在下一次acquire时淘汰
+    - hibernate_dir不为None时，淘汰的工作区保存为快照文件；否则直接丢弃。
+      超过hibernate_ttl秒未恢复的快照被删除，快照数超过max_hibernated时从最旧的开始删除
+      （被遗弃的会话Cookie不会让快照目录无限增长）
+    - 保存失败（磁盘已满、没有权限等）时记录日志，工作区放回池中继续使用，不丢失状态
+    - data_dir不为None时每个工作区是以 data_dir/<工作区ID> 为数据目录的持久化系统（MVCCSystem.open），
+      提交即写入Redo日志，服务重启后从检查点与日志恢复；淘汰时写检查点并关闭日志，不再另存快照
+
+    池锁只保护工作区表与计数，快照的编码、解码与文件读写都在池锁之外进行：
+    淘汰时在池锁内选出并摘除工作区、把其ID登记为进行中，释放池锁后再写快照；
+    恢复同样先登记再读快照。其他请求取得进行中的工作区时等待该操作完成后重新查找，
+    一个大工作区的休眠或恢复不会阻塞其他工作区的请求
+    """
+
+    def __init__(self, factory: Callable[[], MVCCSystem] = MVCCSystem, max_workspaces: int = 200,
+                 idle_timeout: Optional[float] = 1800, memory_budget: Optional[int] = 512 * 1024 * 1024,
+                 hibernate_dir: Optional[str] = None, data_dir: Optional[str] = None,
+                 hibernate_ttl: Optional[float] = 7 * 24 * 3600, max_hibernated: Optional[int] = 10000):
+        self.factory = factory
+        self.max_workspaces = max_workspaces
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget
+        self.hibernate_dir = hibernate_dir
+        if hibernate_dir is not None:
+            os.makedirs(hibernate_dir, exist_ok=True)
+        self.hibernate_ttl = hibernate_ttl
+        self.max_hibernated = max_hibernated
+        self.data_dir = data_dir
+        if data_dir is not None:
+            os.makedirs(data_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.workspaces: 'OrderedDict[str, Workspace]' = OrderedDict()  # 最近使用的在末尾
+        self.pending: Dict[str, threading.Event] = {}  # 正在休眠或恢复的工作区ID -> 完成事件
+        self.memory = 0  # 所有工作区内存估算之和
+        self.created_count = 0
+        self.evicted_count = 0
+        self.hibernated_count = 0
+        self.restored_count = 0
+        self.hibernate_failures = 0
+        self.pruned_count = 0  # 因过期或超出数量上限删除的休眠快照数
+        self.last_prune = float('-inf')
+
+    @staticmethod
+    def is_valid_id(workspace_id: str) -> bool:
+        """工作区ID只允许字母、数字、下划线与连字符（同时用作快照文件名）"""
+        return bool(WORKSPACE_ID_PATTERN.match(workspace_id))
+
+    def acquire(self, workspace_id: str) -> Workspace:
+        """取得工作区并标记为使用中，调用方处理完请求后必须调用release"""
+        if not self.is_valid_id(workspace_id):
+            raise ValueError(f'Invalid workspace id: {workspace_id}')
+        while True:
+            with self.lock:
+                workspace = self.workspaces.get(workspace_id)
+                if workspace is not None:
+                    self.workspaces.move_to_end(workspace_id)
+                    workspace.leases += 1
+                    workspace.last_access = time.monotonic()
+                    victims = self._enforce_limits()
+                    break
+                done = self.pending.get(workspace_id)
+                if done is None:
+                    done = self.pending[workspace_id] = threading.Event()
+                    workspace = None
+                    break
+            done.wait()  # 该工作区正在休眠或由其他请求恢复，完成后重新查找
+
+        if workspace is None:
+            try:
+                system, restored = self._load(workspace_id)
+                workspace = Workspace(workspace_id, system)
+                workspace.leases = 1
+                with self.lock:
+                    if restored:
+                        self.restored_count += 1
+                    else:
+                        self.created_count += 1
+                    self.workspaces[workspace_id] = workspace
+                    self.memory += workspace.memory
+                    victims = self._enforce_limits()
+            finally:
+                with self.lock:
+                    del self.pending[workspace_id]
+                done.set()
+        self._hibernate_all(victims)
+        return workspace
+
+    def release(self, workspace: Workspace):
+        """归还工作区，更新其内存估算"""
+        memory = estimate_memory(workspace.system)
+        with self.lock:
+            workspace.leases -= 1
+            workspace.last_access = time.monotonic()
+            if self.workspaces.get(workspace.workspace_id) is workspace:
+                self.memory += memory - workspace.memory
+            workspace.memory = memory
+            victims = self._enforce_limits()
+        self._hibernate_all(victims)
+
+    def evict_idle(self) -> int:
+        """淘汰所有超过空闲时间的工作区，返回淘汰数量"""
+        with self.lock:
+            victims = []
+            evicted = self._evict_idle(victims)
+        self._hibernate_all(victims)
+        return evicted
+
+    def close(self):
+        """关闭所有已加载工作区的Redo日志（服务退出时调用）"""
+        with self.lock:
+            systems = [workspace.system for workspace in self.workspaces.values()]
+        for system in systems:
+            system.close()
+
+    def _load(self, workspace_id: str) -> Tuple[MVCCSystem, bool]:
+        """
+        创建或恢复工作区的系统，返回 (系统, 是否从磁盘恢复)
+        调用方已登记该ID为进行中，不持有池锁
+        """
+        if self.data_dir is not None:
+            path = os.path.join(self.data_dir, workspace_id)
+            restored = os.path.isdir(path) and bool(os.listdir(path))
+            return MVCCSystem.open(path), restored
+        system = self._restore(workspace_id)
+        if system is not None:
+            return system, True
+        return self.factory(), False
+
+    def _snapshot_path(self, workspace_id: str) -> str:
+        return os.path.join(self.hibernate_dir, workspace_id + SNAPSHOT_SUFFIX)
+
+    def _restore(self, workspace_id: str) -> Optional[MVCCSystem]:
+        """从休眠快照恢复工作区，恢复后删除快照文件（调用方已登记该ID为进行中，不持有池锁）"""
+        if self.hibernate_dir is None:
+            return None
+        path = self._snapshot_path(workspace_id)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        system = MVCCSystem.import_snapshot(data)
+        os.remove(path)
+        return system
+
+    def _hibernate(self, workspace: Workspace):
+        """
+        把工作区保存为快照文件（先写临时文件再替换，避免留下不完整的快照）
+        持久化的工作区已经写入Redo日志，只写检查点（下次打开时无需重放）并关闭日志
+        """
+        if self.data_dir is not None:
+            workspace.system.checkpoint()
+            workspace.system.close()
+            return
+        data = workspace.system.export_snapshot()
+        path = self._snapshot_path(workspace.workspace_id)
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _hibernate_all(self, victims: List[Tuple[Workspace, threading.Event]]):
+        """
+        在池锁之外保存_evict选出的工作区，完成后唤醒等待这些工作区的请求
+        保存失败的工作区放回池中（作为最近使用的工作区，不会被立即再次选中），状态不丢失
+        """
+        for workspace, done in victims:
+            try:
+                self._hibernate(workspace)
+            except Exception:
+                logger.exception('Failed to hibernate workspace %s; keeping it in memory', workspace.workspace_id)
+                with self.lock:
+                    self.hibernate_failures += 1
+                    self.evicted_count -= 1
+                    self.workspaces[workspace.workspace_id] = workspace
+                    self.memory += workspace.memory
+                    del self.pending[workspace.workspace_id]
+            else:
+                with self.lock:
+                    self.hibernated_count += 1
+                    del self.pending[workspace.workspace_id]
+            done.set()
+        if victims:
+            self._prune_hibernated()
+
+    def _prune_hibernated(self):
+        """
+        删除超过hibernate_ttl的休眠快照，快照数仍超过max_hibernated时从最旧的开始删除
+        在池锁之外执行，每PRUNE_INTERVAL秒最多一次；正在恢复的工作区的快照不删除
+        """
+        if self.hibernate_dir is None or (self.hibernate_ttl is None and self.max_hibernated is None):
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_prune < PRUNE_INTERVAL:
+                return
+            self.last_prune = now
+
+        try:
+            snapshots = []
+            for entry in os.scandir(self.hibernate_dir):
+                if entry.name.endswith(SNAPSHOT_SUFFIX):
+                    try:
+                        snapshots.append((entry.stat().st_mtime, entry.name[:-len(SNAPSHOT_SUFFIX)]))
+                    except FileNotFoundError:
+                        pass  # 同时被恢复并删除
+            snapshots.sort()
+            expired = 0
+            if self.hibernate_ttl is not None:
+                deadline = time.time() - self.hibernate_ttl
+                expired = sum(1 for mtime, _ in snapshots if mtime < deadline)
+            if self.max_hibernated is not None:
+                expired = max(expired, len(snapshots) - self.max_hibernated)
+            for _, workspace_id in snapshots[:expired]:
+                self._remove_snapshot(workspace_id)
+        except OSError:
+            logger.exception('Failed to prune hibernated workspaces in %s', self.hibernate_dir)
+
+    def _remove_snapshot(self, workspace_id: str):
+        """删除一个休眠快照；与恢复一样先登记为进行中，正在休眠或恢复的工作区跳过"""
+        with self.lock:
+            if workspace_id in self.pending or workspace_id in self.workspaces:
+                return
+            done = self.pending[workspace_id] = threading.Event()
+        try:
+            os.remove(self._snapshot_path(workspace_id))
+            with self.lock:
+                self.pruned_count += 1
+        except FileNotFoundError:
+            pass
+        finally:
+            with self.lock:
+                del self.pending[workspace_id]
+            done.set()
+
+    def _evict(self, workspace: Workspace, victims: List[Tuple[Workspace, threading.Event]]):
+        """把工作区移出池（调用方持有池锁），需要休眠时登记为进行中并加入victims，由调用方释放池锁后保存"""
+        del self.workspaces[workspace.workspace_id]
+        self.memory -= workspace.memory
+        self.evicted_count += 1
+        if self.hibernate_dir is not None or self.data_dir is not None:
+            done = self.pending[workspace.workspace_id] = threading.Event()
+            victims.append((workspace, done))
+
+    def _evict_idle(self, victims: List[Tuple[Workspace, threading.Event]]) -> int:
+        if self.idle_timeout is None:
+            return 0
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [workspace for workspace in self.workspaces.values()
+                if workspace.last_access < deadline and not workspace.is_busy()]
+        for workspace in idle:
+            self._evict(workspace, victims)
+        return len(idle)
+
+    def _over_limits(self) -> bool:
+        if len(self.workspaces) > self.max_workspaces:
+            return True
+        return self.memory_budget is not None and self.memory > self.memory_budget
+
+    def _enforce_limits(self) -> List[Tuple[Workspace, threading.Event]]:
+        """
+        先淘汰空闲超时的工作区，仍超出上限时从最久未使用的开始淘汰（使用中的工作区跳过）
+        调用方持有池锁，返回需要休眠的工作区，由调用方释放池锁后交给_hibernate_all
+        """
+        victims: List[Tuple[Workspace, threading.Event]] = []
+        self._evict_idle(victims)
+        if not self._over_limits():
+            return victims
+        for workspace in list(self.workspaces.values()):
+            if not workspace.is_busy():
+                self._evict(workspace, victims)
+                if not self._over_limits():
+                    break
+        return victims
+
+    def get_status(self) -> Dict:
+        """获取工作区池状态"""
+        hibernated = 0
+        if self.hibernate_dir is not None:
+            hibernated = sum(1 for name in os.listdir(self.hibernate_dir) if name.endswith(SNAPSHOT_SUFFIX))
+        with self.lock:
+            return {
+                'workspaces': len(self.workspaces),
+                'max_workspaces': self.max_workspaces,
+                'memory_estimate': self.memory,
+                'memory_budget': self.memory_budget,
+                'idle_timeout': self.idle_timeout,
+                'persistent': self.data_dir is not None,
+                'hibernated': hibernated,
+                'created': self.created_count,
+                'evicted': self.evicted_count,
+                'hibernated_total': self.hibernated_count,
+                'hibernate_failures': self.hibernate_failures,
+                'pruned': self.pruned_count,
+                'restored': self.restored_count
+            }
+
+    def collect_metrics(self):
+        """
+        导出时计算的监控状态量（metrics.Registry的收集函数），按已加载的工作区汇总
+        只读取各容器的长度，不持有工作区的闩锁
+        """
+        with self.lock:
+            systems = [workspace.system for workspace in self.workspaces.values()]
+        active = history = undo_logs = 0
+        for system in systems:
+            active += len(system.transaction_manager.active_transactions)
+            history += system.purge_system.history_list_length()
+            undo_logs += len(system.undo_log_manager.undo_logs)
+        yield ('mvcc_workspaces_loaded', 'Workspaces currently loaded in memory', (), [((), len(systems))])
+        yield ('mvcc_active_transactions', 'Active transactions across loaded workspaces', (), [((), active)])
+        yield ('mvcc_history_list_length', 'Committed transactions waiting for purge', (), [((), history)])
+        yield ('mvcc_undo_log_bytes', 'Estimated memory held by undo logs', (), [((), undo_logs * UNDO_LOG_BYTES)])